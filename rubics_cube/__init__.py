@@ -1,5 +1,37 @@
 from .cube import Cube
-from .heuristics import AStarSolver, same_color_amount
+from .heuristics import (
+    AStarSolver,
+    AnytimeAStarSolver,
+    IDAStarSolver,
+    ParallelIDAStarSolver,
+    MaxHeuristic,
+    batch_heuristic,
+    default_heuristic,
+    manhattan_distance,
+    misplaced_cubies,
+    same_color_amount,
+)
+from .beam import BeamSearchSolver
+from .bidirectional import BidirectionalSolver
+from .batch import CubeBatch
+from .cubie import CubieCube
+from .encoding import ZobristHasher, pack_states, unpack_states
+from .serialization import PackedStates, load_states, save_states
+from .symmetry import Symmetry
+from .stats import SearchStats, print_progress
+from .cache import SolutionCache
+from .moves import MoveSequence
+from .two_phase import TwoPhaseSolver
+from .reduction import ReductionSolver
+from .parallel import solve_many
+from .aio import SolverPool
+from .dataset import dataset_moves, load_shards, scramble_batches, write_dataset
+from .pattern_database import (
+    PatternDatabase,
+    PatternDatabaseHeuristic,
+    build_pattern_databases,
+    load_pattern_databases,
+)
 
 # make sure that the version is available in the package namespace
 module_path = __file__.split("__init__.py", maxsplit=1)[0]
@@ -0,0 +1,167 @@
+import os
+import time
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Optional
+
+from .cube import Cube
+from .heuristics import AStarSolver, AnytimeAStarSolver, default_heuristic
+from .beam import BeamSearchSolver
+from .cache import SolutionCache
+
+# solvers with a time and node budget and anytime results
+ANYTIME_SOLVERS: Dict[str, Callable] = {
+    "astar": AStarSolver,
+    "anytime-astar": AnytimeAStarSolver,
+    "beam": BeamSearchSolver,
+}
+
+
+def _after(cube: Cube, moves) -> Cube:
+    """A copy of the cube after the moves."""
+    state = Cube(cube.size)
+    state.combinations = cube.combinations.copy()
+    state.make_moves(list(moves))
+    return state
+
+
+class SolverPool:
+    def __init__(self, max_workers: Optional[int] = None, cache: Optional[SolutionCache] = None):
+        """Run searches for asyncio code on a bounded pool of threads.
+
+        Every request waits for a free worker, so the number of searches
+        running at once never grows with the load. Time spent waiting counts
+        against the deadline of a request, and a request that runs out of
+        time returns the best state its search found instead of nothing. The
+        searches share the GIL, so the pool bounds latency rather than adding
+        throughput, use `parallel.solve_many` for large batches.
+
+        Args:
+            max_workers (int, optional): Number of threads, all cores by default.
+            cache (SolutionCache, optional): Cache shared by all requests, see
+                `cache.SolutionCache`.
+        """
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.cache = cache
+        self.executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="rubics-cube")
+        # the cache is not thread safe
+        self._cache_lock = threading.Lock()
+        # cancellation events of the requests that are not finished
+        self._requests = set()
+
+    async def __aenter__(self) -> "SolverPool":
+        return self
+
+    async def __aexit__(self, *exception):
+        self.shutdown()
+
+    def shutdown(self, wait: bool = True):
+        """Stop the workers, queued requests are dropped and running searches cancelled."""
+        for cancelled in list(self._requests):
+            cancelled.set()
+        self.executor.shutdown(wait=wait, cancel_futures=True)
+
+    def _run(
+        self,
+        cube: Cube,
+        heuristic: Callable,
+        solver: str,
+        deadline: Optional[float],
+        max_nodes: Optional[int],
+        cancelled: threading.Event,
+    ) -> dict:
+        start = time.perf_counter()
+        cached = None
+        if self.cache is not None:
+            with self._cache_lock:
+                cached = self.cache.get(cube)
+        search = None
+        if cached is not None:
+            path = cached
+        else:
+            search = ANYTIME_SOLVERS[solver](cube, heuristic)
+            search.should_stop = cancelled.is_set
+            time_limit = None if deadline is None else max(0.0, deadline - time.perf_counter())
+            path = search.solve(time_limit=time_limit, max_nodes=max_nodes, anytime=True)
+
+        state = _after(cube, path)
+        solved = state.is_solved()
+        if solved and cached is None and self.cache is not None:
+            with self._cache_lock:
+                self.cache.put(cube, path)
+        return {
+            "solution": tuple(path),
+            "solved": solved,
+            "cached": cached is not None,
+            "state": state,
+            "value": 0 if solved else search.best_value,
+            "nodes_expanded": 0 if search is None else search.stats.nodes_expanded,
+            "seconds": round(time.perf_counter() - start, 6),
+        }
+
+    async def solve(
+        self,
+        cube: Cube,
+        deadline: Optional[float] = None,
+        max_nodes: Optional[int] = None,
+        heuristic: Optional[Callable] = None,
+        solver: str = "astar",
+    ) -> dict:
+        """Solve a cube on a worker, without blocking the event loop.
+
+        Cancelling the awaiting task cancels the search, it stops at its next
+        check. Solutions found in time are the same as the solver's.
+
+        Args:
+            cube (Cube): The cube, it is copied so it can change meanwhile.
+            deadline (float, optional): Seconds from now, including the time
+                waiting for a worker.
+            max_nodes (int, optional): Node budget, see the `solve` method of the solver.
+            heuristic (Callable, optional): Heuristic function of the solver,
+                `default_heuristic(cube.size)` by default.
+            solver (str): One of `ANYTIME_SOLVERS`.
+
+        Returns:
+            dict: "solution" (the moves, a solution or the path to the best
+                state found), "solved", "cached", "state" (the cube after the
+                moves), "value" (its heuristic value), "nodes_expanded" and
+                "seconds" (time on the worker).
+        """
+        assert solver in ANYTIME_SOLVERS, f"Solver {solver} is invalid."
+        if heuristic is None:
+            heuristic = default_heuristic(cube.size)
+        copy = Cube(cube.size)
+        copy.combinations = cube.combinations.copy()
+        # an absolute deadline, so waiting in the queue counts
+        absolute = None if deadline is None else time.perf_counter() + deadline
+        cancelled = threading.Event()
+        self._requests.add(cancelled)
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(self.executor, self._run, copy, heuristic, solver, absolute, max_nodes, cancelled)
+        try:
+            return await future
+        except asyncio.CancelledError:
+            # a queued request is dropped, a running search stops at its next check
+            cancelled.set()
+            raise
+        finally:
+            self._requests.discard(cancelled)
+
+
+# made on the first call of `solve`
+_default_pool: Optional[SolverPool] = None
+
+
+async def solve(
+    cube: Cube,
+    deadline: Optional[float] = None,
+    max_nodes: Optional[int] = None,
+    heuristic: Optional[Callable] = None,
+    solver: str = "astar",
+) -> dict:
+    """`SolverPool.solve` on a pool shared by the whole process, with one thread per core."""
+    global _default_pool
+    if _default_pool is None:
+        _default_pool = SolverPool()
+    return await _default_pool.solve(cube, deadline, max_nodes, heuristic, solver)
@@ -0,0 +1,127 @@
+import numpy as np
+from functools import lru_cache
+from typing import List, Sequence, Union
+
+from .cube import Cube, COLORS, get_move_table, _possible_moves, encode_combinations, decode_combinations
+from .heuristics import same_color_amount
+
+
+@lru_cache(maxsize=None)
+def get_move_matrix(size: int) -> np.ndarray:
+    """Stack the move table of a cube size into a single array.
+
+    Row `i` is the permutation of the i-th move of `Cube.get_possible_moves()`.
+
+    Args:
+        size (int): Size of the cube.
+
+    Returns:
+        np.ndarray: Permutations. shape: (num_moves, 6*size*size)
+    """
+    move_table = get_move_table(size)
+    matrix = np.stack([move_table[move] for move in _possible_moves(size)])
+    matrix.setflags(write=False)
+    return matrix
+
+
+class CubeBatch:
+    def __init__(self, size: int = 3, count: int = 1):
+        """A batch of cubes of the same size stored in a single array.
+
+        Colors are encoded as uint8 indices into `COLORS`, so the whole batch
+        is one contiguous (N, 6, n, n) array and every operation is vectorized
+        over the cubes.
+
+        Args:
+            size (int): Size of the cubes.
+            count (int): Number of solved cubes in the batch.
+        """
+        self.size = size
+        self.possible_moves = list(_possible_moves(size))
+        self.move_to_index = {move: index for index, move in enumerate(self.possible_moves)}
+        solved = np.repeat(np.arange(6, dtype=np.uint8), size * size).reshape(6, size, size)
+        self.states = np.broadcast_to(solved, (count, 6, size, size)).copy()
+
+    @classmethod
+    def from_states(cls, states: np.ndarray) -> "CubeBatch":
+        """Make a batch from color letters or already encoded states.
+
+        Args:
+            states (np.array): States of the cubes. shape: (N, 6, n, n)
+
+        Returns:
+            CubeBatch: The batch, the states are copied.
+        """
+        states = np.asarray(states)
+        assert states.ndim == 4 and states.shape[1] == 6, "States should have the shape (N, 6, n, n)."
+        assert states.shape[2] == states.shape[3], "The cubes should be cubic."
+        codes = encode_combinations(states)
+        assert np.all(codes < len(COLORS)), "Every element should be in [w, o, g, r, b, y]."
+
+        batch = cls(size=states.shape[2], count=0)
+        batch.states = np.ascontiguousarray(codes).copy()
+        return batch
+
+    @classmethod
+    def from_cubes(cls, cubes: Sequence[Cube]) -> "CubeBatch":
+        """Make a batch from a list of cubes of the same size.
+
+        Args:
+            cubes (list): Cubes to copy into the batch.
+
+        Returns:
+            CubeBatch: The batch.
+        """
+        return cls.from_states(np.stack([cube.combinations for cube in cubes]))
+
+    def to_cubes(self) -> List[Cube]:
+        """Convert the batch to a list of `Cube` objects.
+
+        Returns:
+            list: One cube per row, made with `Cube.from_combinations`.
+        """
+        return [Cube.from_combinations(decode_combinations(state)) for state in self.states]
+
+    def __len__(self) -> int:
+        return self.states.shape[0]
+
+    def __getitem__(self, index: int) -> Cube:
+        return Cube.from_combinations(decode_combinations(self.states[index]))
+
+    def make_move(self, move: Union[str, Sequence[str], np.ndarray]):
+        """Apply a move to every cube in the batch.
+
+        Args:
+            move (str | list | np.array): Either a single move applied to all
+                cubes, or one move per cube given as move strings or as indices
+                into `self.possible_moves`.
+        """
+        count = len(self)
+        flat = self.states.reshape(count, -1)
+        if isinstance(move, str):
+            move_table = get_move_table(self.size)
+            assert move in move_table, f"Move {move} is invalid."
+            flat = flat[:, move_table[move]]
+        else:
+            move_indices = np.asarray(move)
+            if move_indices.dtype.kind == "U":
+                move_indices = np.array([self.move_to_index[m] for m in move_indices], dtype=np.intp)
+            assert move_indices.shape == (count,), "There should be one move per cube."
+            flat = np.take_along_axis(flat, get_move_matrix(self.size)[move_indices], axis=1)
+        self.states = flat.reshape(self.states.shape)
+
+    def is_solved(self) -> np.ndarray:
+        """Check which cubes are solved.
+
+        Returns:
+            np.array: Boolean array. shape: (N,)
+        """
+        return np.all(self.states == self.states[:, :, :1, :1], axis=(1, 2, 3))
+
+    def same_color_amount(self) -> np.ndarray:
+        """Batched version of `heuristics.same_color_amount`.
+
+        Returns:
+            np.array: Value of the heuristic for every cube. shape: (N,)
+        """
+        return same_color_amount(self.states)
@@ -0,0 +1,250 @@
+import time
+import numpy as np
+from typing import Callable, List, Optional, Tuple
+
+from .cube import Cube, get_move_table, encode_combinations, decode_combinations
+from .encoding import ZobristHasher
+from .heuristics import evaluate_batch
+from .moves import get_move_pruning
+from .stats import SearchStats
+
+# stickers of the children made at a time when no `chunk_size` is given, the heuristic and
+# the hashes need several times as much
+_CHUNK_BYTES = 1 << 22
+
+
+class BeamSearchSolver:
+    def __init__(self, cube: Cube, heuristic: Callable, beam_width: int = 1024, chunk_size: Optional[int] = None):
+        """Greedy breadth first search that keeps the best `beam_width` states of every depth.
+
+        The children of the beam are made in chunks, with one gather per
+        move, and every chunk is scored with one call of the heuristic. The
+        best children seen so far are kept between chunks and become the
+        next beam. Duplicates inside a depth and states of the previous depth
+        are dropped by their Zobrist hash. Only the beam, one chunk and one
+        (parent, move) pair per kept state and depth are stored, so memory
+        and the time per depth are bounded by the beam width and the chunk
+        size, not by the size of the search space. Solutions are not optimal
+        and a too narrow beam can miss them.
+
+        Args:
+            cube (Cube): The cube to solve.
+            heuristic (Callable): Heuristic function, same as for `AStarSolver`.
+                Smaller is better, a solved cube is recognized on its own.
+            beam_width (int): Number of states kept at every depth.
+            chunk_size (int, optional): Children made and scored at a time, by
+                default as many as have 4 MiB of stickers, at most 65536.
+        """
+        self.cube = cube
+        self.size = cube.size
+        self.heuristic = heuristic
+        self.beam_width = beam_width
+        self.chunk_size = chunk_size or max(1, min(1 << 16, _CHUNK_BYTES // (6 * self.size * self.size)))
+
+        self.possible_moves = [move for move in cube.get_possible_moves() if move[0] not in "xyz"]
+        move_table = get_move_table(self.size)
+        self.permutations = np.stack([move_table[move] for move in self.possible_moves])
+        # allowed[last move, next move], the last row is for the first move
+        self.allowed = get_move_pruning(tuple(self.possible_moves))
+        self.hasher = ZobristHasher(self.size)
+        # counters of the last search, replace it for progress reports, see `stats.SearchStats`
+        self.stats = SearchStats()
+        # checked after every chunk, the search is cancelled when it returns True
+        self.should_stop: Optional[Callable[[], bool]] = None
+
+        # best state seen so far, kept for anytime results
+        self.best_value = np.inf
+        self.best_state: Optional[Cube] = None
+        self.best_path: tuple = ()
+
+    @property
+    def nodes_generated(self) -> int:
+        return self.stats.nodes_generated
+
+    def evaluate_many(self, states: np.array) -> np.array:
+        """Evaluate the heuristic on flat encoded states. shape: (N, 6*n*n) -> (N,)"""
+        with self.stats.timer("heuristic"):
+            return evaluate_batch(self.heuristic, states.reshape(-1, 6, self.size, self.size))
+
+    @staticmethod
+    def solved_states(states: np.array) -> np.array:
+        """Which flat encoded states are solved. shape: (N, 6*n*n) -> (N,)"""
+        faces = states.reshape(len(states), 6, -1)
+        return np.all(faces == faces[:, :, :1], axis=(1, 2))
+
+    @staticmethod
+    def reconstruct_path(steps: List[Tuple[np.array, np.array]], possible_moves: List[str], index: int) -> tuple:
+        """Follow the (parent, move) pairs of every depth back to the initial state.
+
+        Args:
+            steps (list): For every depth, the index of the parent in the
+                previous beam and the move index of every state of the beam.
+            possible_moves (list): The moves of the move indices.
+            index (int): Index of the last state in the beam of the last depth.
+
+        Returns:
+            tuple: The moves from the initial state to the state.
+        """
+        path = []
+        for parents, moves in reversed(steps):
+            path.append(possible_moves[moves[index]])
+            index = parents[index]
+        return tuple(reversed(path))
+
+    def _update_best(self, steps: list, states: np.array, values: np.array):
+        index = int(np.argmin(values))
+        if values[index] < self.best_value:
+            self.best_value = values[index].item()
+            self.best_path = self.reconstruct_path(steps, self.possible_moves, index)
+            self.best_state = Cube(self.size)
+            self.best_state.combinations = decode_combinations(states[index]).reshape(6, self.size, self.size)
+
+    def solve(
+        self,
+        max_depth: int = 100,
+        time_limit: Optional[float] = None,
+        max_nodes: Optional[int] = None,
+        anytime: bool = False,
+    ) -> tuple:
+        """Solve the cube.
+
+        The search stops at the first solved state, after `max_depth` depths,
+        when the time or node budget runs out or when `self.should_stop`
+        returns True. The budgets are checked
+        after every chunk, so a search overshoots them by at most one chunk.
+
+        Args:
+            max_depth (int): Give up on solutions longer than this.
+            time_limit (float, optional): Seconds to search.
+            max_nodes (int, optional): Number of children to generate.
+            anytime (bool): Return the path to the best state found instead of
+                raising when no solution is found, `best_state` and
+                `best_value` tell how close it got.
+
+        Progress is reported through `self.stats` after every depth, the
+        frontier is the beam and there is no closed set. Every state of a
+        beam counts as expanded.
+
+        Returns:
+            tuple: The solution, or the path to the best state found with `anytime`.
+        """
+        self.stats.start()
+        try:
+            return self._search(max_depth, time_limit, max_nodes, anytime)
+        finally:
+            self.stats.stop()
+
+    def _chunks(self, beam: np.array, beam_hashes: np.array, last_moves: np.array):
+        """The children of the beam, at most `chunk_size` at a time.
+
+        A move is made on all of its parents with a single gather through
+        its permutation, which is shared by the rows, and the hashes of the
+        children are updated from the stickers the move changes.
+
+        Yields:
+            tuple: The children, their hashes, the indices of their parents
+                and moves, and the order of every child among all (parent,
+                move) pairs, which breaks ties between equal values.
+        """
+        num_moves = len(self.possible_moves)
+        pieces, count = [], 0
+        for move_index, move in enumerate(self.possible_moves):
+            parents = np.flatnonzero(self.allowed[last_moves, move_index])
+            start = 0
+            while start < len(parents):
+                piece = parents[start : start + self.chunk_size - count]
+                start += len(piece)
+                with self.stats.timer("moves"):
+                    children = beam[np.ix_(piece, self.permutations[move_index])]
+                with self.stats.timer("hashing"):
+                    hashes = self.hasher.update_states(beam_hashes[piece], beam, move, piece)
+                pieces.append((children, hashes, piece, np.full(len(piece), move_index), piece * num_moves + move_index))
+                count += len(piece)
+                if count == self.chunk_size:
+                    yield tuple(np.concatenate(arrays) for arrays in zip(*pieces))
+                    pieces, count = [], 0
+        if pieces:
+            yield tuple(np.concatenate(arrays) for arrays in zip(*pieces))
+
+    def _select(self, best: Optional[tuple], candidates: tuple) -> tuple:
+        """The best `beam_width` children of both, one per hash, best values first and ties in their order.
+
+        Both are tuples of (states, values, hashes, parents, moves, order).
+        """
+        if best is not None:
+            candidates = tuple(np.concatenate(arrays) for arrays in zip(best, candidates))
+        _, values, hashes, _, _, order = candidates
+        if len(hashes) == 0:
+            return candidates
+        # the first child of every hash
+        first = np.lexsort((order, hashes))
+        first = first[np.r_[True, hashes[first][1:] != hashes[first][:-1]]]
+        kept = first[np.lexsort((order[first], values[first]))[: self.beam_width]]
+        return tuple(array[kept] for array in candidates)
+
+    def _search(self, max_depth: int, time_limit: Optional[float], max_nodes: Optional[int], anytime: bool) -> tuple:
+        stats = self.stats
+        self.best_value = np.inf
+        self.best_state = None
+        self.best_path = ()
+        if self.cube.is_solved():
+            stats.improve(0)
+            self.best_value = 0
+            self.best_state = self.cube
+            return ()
+
+        deadline = None if time_limit is None else time.perf_counter() + time_limit
+        num_moves = len(self.possible_moves)
+
+        beam = encode_combinations(self.cube.combinations).reshape(1, -1)
+        last_moves = np.array([num_moves])
+        beam_hashes = self.hasher.hash_states(beam)
+        steps = []
+        self._update_best(steps, beam, self.evaluate_many(beam))
+        stats.improve(self.best_value)
+
+        out_of_budget = False
+        for depth in range(1, max_depth + 1):
+            stats.nodes_expanded += len(beam)
+            # the best children so far, only `beam_width` of them are kept between chunks
+            best = None
+            for chunk, hashes, parents, moves, order in self._chunks(beam, beam_hashes, last_moves):
+                stats.nodes_generated += len(chunk)
+
+                solved = self.solved_states(chunk)
+                if solved.any():
+                    steps.append((parents, moves))
+                    self.best_value = np.inf
+                    self._update_best(steps, chunk, np.where(solved, 0, np.inf))
+                    stats.improve(0)
+                    return self.best_path
+
+                # states of the previous depth are dropped
+                with stats.timer("hashing"):
+                    new = ~np.isin(hashes, beam_hashes)
+                chunk, hashes, parents, moves, order = chunk[new], hashes[new], parents[new], moves[new], order[new]
+                best = self._select(best, (chunk, self.evaluate_many(chunk), hashes, parents, moves, order))
+                if (
+                    (deadline is not None and time.perf_counter() > deadline)
+                    or (max_nodes is not None and stats.nodes_generated >= max_nodes)
+                    or (self.should_stop is not None and self.should_stop())
+                ):
+                    out_of_budget = True
+                    break
+
+            if best is None or len(best[0]) == 0:
+                # every child was seen at the previous depth
+                break
+            beam, values, beam_hashes, parents, last_moves, _ = best
+            steps.append((parents, last_moves))
+            self._update_best(steps, beam, values)
+            stats.improve(values[0].item())
+            stats.tick(len(beam), 0)
+            if out_of_budget:
+                break
+
+        if anytime:
+            return self.best_path
+        if out_of_budget:
+            raise ValueError("No solution found within the budget.")
+        raise ValueError(f"No solution found within {max_depth} moves.")
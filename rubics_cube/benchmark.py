@@ -0,0 +1,412 @@
+import sys
+import json
+import random
+import time
+import argparse
+import platform
+import tracemalloc
+import numpy as np
+from typing import Callable, Dict, List, Optional, Sequence
+
+from .cube import Cube, FACES, encode_combinations
+from .dataset import scramble_batches, dataset_moves, _scramble_tables
+from .heuristics import AStarSolver, IDAStarSolver, manhattan_distance, misplaced_cubies, same_color_amount
+from .reduction import ReductionSolver
+from .two_phase import TwoPhaseSolver
+
+DEFAULT_SIZES = (3, 5, 10, 20, 50, 100, 200, 500)
+SUITE_MOVE_SIZES = (2, 3, 4, 5, 10, 20, 50)
+REDUCTION_SIZES = (4, 5, 6, 8, 10, 12, 14, 16, 18, 20)
+
+HEURISTICS: Dict[str, Callable] = {
+    "same_color_amount": same_color_amount,
+    "misplaced_cubies": misplaced_cubies,
+    "manhattan_distance": manhattan_distance,
+}
+# heuristics that only know the pieces of the 3x3
+_HEURISTICS_3X3 = {"misplaced_cubies", "manhattan_distance"}
+
+SOLVERS: Dict[str, Callable[[Cube], object]] = {
+    "astar": lambda cube: AStarSolver(cube, manhattan_distance),
+    "idastar": lambda cube: IDAStarSolver(cube, manhattan_distance),
+    "two-phase": lambda cube: TwoPhaseSolver(cube),
+}
+
+# metrics compared against a baseline, 1 if larger is better and -1 if smaller is better
+METRICS = {
+    "moves_per_second": 1,
+    "microseconds_per_move": -1,
+    "evals_per_second": 1,
+    "million_states_per_minute": 1,
+    "seconds": -1,
+    "nodes_expanded": -1,
+    "solution_length": -1,
+    "length": -1,
+    "peak_memory_bytes": -1,
+}
+
+
+def _move_families(size: int) -> Dict[str, List[str]]:
+    """Moves of a cube size grouped by the kind of layer they turn."""
+    families = {"face": [], "slice": [], "rotation": []}
+    for move in Cube(size).get_possible_moves():
+        layer = move.rstrip("'2")
+        if layer in FACES:
+            families["face"].append(move)
+        elif layer[0] == "m":
+            families["slice"].append(move)
+        else:
+            families["rotation"].append(move)
+    return families
+
+
+def move_scaling(sizes: Sequence[int] = DEFAULT_SIZES, num_moves: int = 2000, seed: int = 0) -> List[dict]:
+    """Time `Cube.make_move` per move family for growing cube sizes.
+
+    Every move is made once before timing so the sparse layer turns are
+    cached, the timed pass then only measures the moves themselves. Slice
+    moves should grow linearly with the size, face moves also rotate their
+    n*n face and rotations move all 6*n*n stickers.
+
+    Args:
+        sizes (list): Cube sizes, a 2x2 has no slice moves to time.
+        num_moves (int): Random moves timed per family and size.
+        seed (int): Seed of the random moves.
+
+    Returns:
+        list: One dict per size and family with "size", "family", "moves",
+            "seconds", "moves_per_second" and "microseconds_per_move".
+    """
+    rng = random.Random(seed)
+    results = []
+    for size in sizes:
+        cube = Cube(size)
+        for family, possible_moves in _move_families(size).items():
+            if not possible_moves:
+                continue
+            moves = [rng.choice(possible_moves) for _ in range(num_moves)]
+            for move in moves:
+                cube.make_move(move)
+            start = time.perf_counter()
+            for move in moves:
+                cube.make_move(move)
+            seconds = time.perf_counter() - start
+            results.append({
+                "size": size,
+                "family": family,
+                "moves": num_moves,
+                "seconds": round(seconds, 6),
+                "moves_per_second": round(num_moves / seconds, 1),
+                "microseconds_per_move": round(seconds / num_moves * 1e6, 3),
+            })
+    return results
+
+
+def reduction_scaling(
+    sizes: Sequence[int] = REDUCTION_SIZES, scrambles: int = 3, scramble_moves: int = 200, seed: int = 0
+) -> List[dict]:
+    """Time `ReductionSolver` on random scrambles for growing cube sizes.
+
+    Args:
+        sizes (list): Cube sizes, 3 or more.
+        scrambles (int): Scrambles solved per size.
+        scramble_moves (int): Random face and slice moves of a scramble.
+        seed (int): Seed of the scrambles.
+
+    Returns:
+        list: One dict per size with "size", "scrambles", "seconds" (mean per
+            solve) and "length" (mean solution length).
+    """
+    rng = random.Random(seed)
+    results = []
+    for size in sizes:
+        possible_moves = [move for move in Cube(size).get_possible_moves() if move[0] not in "xyz"]
+        seconds = 0.0
+        length = 0
+        for _ in range(scrambles):
+            cube = Cube(size)
+            cube.make_moves([rng.choice(possible_moves) for _ in range(scramble_moves)])
+            start = time.perf_counter()
+            solution = ReductionSolver(cube).solve()
+            seconds += time.perf_counter() - start
+            length += len(solution)
+        results.append({
+            "size": size,
+            "scrambles": scrambles,
+            "seconds": round(seconds / scrambles, 6),
+            "length": round(length / scrambles, 1),
+        })
+    return results
+
+
+def dataset_throughput(
+    sizes: Sequence[int] = (3, 4, 5), num_states: int = 1 << 20, batch_size: int = 1 << 14, max_depth: int = 20
+) -> List[dict]:
+    """Scrambled states per minute of `dataset.scramble_batches`.
+
+    Args:
+        sizes (list): Cube sizes.
+        num_states (int): States generated per size.
+        batch_size (int): States per batch.
+        max_depth (int): Longest scramble.
+
+    Returns:
+        list: One dict per size with "size", "states", "seconds" and
+            "million_states_per_minute".
+    """
+    results = []
+    for size in sizes:
+        num_batches = max(1, num_states // batch_size)
+        start = time.perf_counter()
+        for _ in scramble_batches(size, batch_size, max_depth, seed=0, num_batches=num_batches):
+            pass
+        seconds = time.perf_counter() - start
+        states = num_batches * batch_size
+        results.append({
+            "size": size,
+            "states": states,
+            "seconds": round(seconds, 6),
+            "million_states_per_minute": round(states / seconds * 60 / 1e6, 3),
+        })
+    return results
+
+
+def _scramble(size: int, depth: int, rng: np.random.Generator) -> List[str]:
+    """A random walk of `depth` face and slice moves without cancelling moves."""
+    _, _, choices, counts = _scramble_tables(size)
+    moves = dataset_moves(size)
+    last = len(moves)
+    scramble = []
+    for _ in range(depth):
+        last = int(choices[last, rng.integers(counts[last])])
+        scramble.append(moves[last])
+    return scramble
+
+
+def heuristic_throughput(
+    sizes: Sequence[int] = (3, 4, 5), num_states: int = 4096, seed: int = 0
+) -> List[dict]:
+    """Evaluations per second of the heuristics and `Cube.is_solved`.
+
+    Every heuristic is timed called once per state ("single") and once on
+    the whole batch ("batch"). The 3x3 only heuristics are skipped on other
+    sizes.
+
+    Args:
+        sizes (list): Cube sizes.
+        num_states (int): Scrambled states evaluated per size.
+        seed (int): Seed of the scrambles.
+
+    Returns:
+        list: One dict per size, function and mode with "size", "function",
+            "mode", "evals", "seconds" and "evals_per_second".
+    """
+    results = []
+
+    def record(size, function, mode, evals, seconds):
+        results.append({
+            "size": size,
+            "function": function,
+            "mode": mode,
+            "evals": evals,
+            "seconds": round(seconds, 6),
+            "evals_per_second": round(evals / seconds, 1),
+        })
+
+    for size in sizes:
+        states, _, _ = next(scramble_batches(size, num_states, 20, seed=seed, num_batches=1))
+        states = states.reshape(-1, 6, size, size)
+        for name, heuristic in HEURISTICS.items():
+            if size != 3 and name in _HEURISTICS_3X3:
+                continue
+            # single states are timed on a slice, a call per state is much slower
+            single = states[: max(1, num_states // 16)]
+            start = time.perf_counter()
+            for state in single:
+                heuristic(state)
+            record(size, name, "single", len(single), time.perf_counter() - start)
+            start = time.perf_counter()
+            heuristic(states)
+            record(size, name, "batch", num_states, time.perf_counter() - start)
+
+        cubes = [Cube(size) for _ in range(max(1, num_states // 16))]
+        for cube, state in zip(cubes, states):
+            cube.combinations = encode_combinations(state).astype(np.uint8)
+        start = time.perf_counter()
+        for cube in cubes:
+            cube.is_solved()
+        record(size, "is_solved", "single", len(cubes), time.perf_counter() - start)
+    return results
+
+
+def solver_benchmark(
+    depths: Sequence[int] = (1, 2, 3, 4, 5),
+    solvers: Sequence[str] = tuple(SOLVERS),
+    scrambles: int = 3,
+    seed: int = 0,
+) -> List[dict]:
+    """Wall time, expanded nodes and peak memory of the 3x3 solvers by scramble depth.
+
+    Every solve runs twice, once timed and once under `tracemalloc` for the
+    peak memory, since tracing slows the search down. The tables of the
+    two-phase solver are loaded before timing.
+
+    Args:
+        depths (list): Scramble depths, random walks that never cancel a move.
+        solvers (list): Names of `SOLVERS`.
+        scrambles (int): Scrambles per depth, the results are their mean.
+        seed (int): Seed of the scrambles.
+
+    Returns:
+        list: One dict per solver and depth with "solver", "depth",
+            "scrambles", "seconds", "nodes_expanded", "solution_length" and
+            "peak_memory_bytes". Solvers that do not count nodes report None.
+    """
+    rng = np.random.default_rng(seed)
+    cases = {depth: [_scramble(3, depth, rng) for _ in range(scrambles)] for depth in depths}
+    results = []
+    # load the tables of the two-phase solver once
+    warm_up = Cube(3)
+    warm_up.make_moves(["R", "U"])
+    TwoPhaseSolver(warm_up).solve()
+
+    for name in solvers:
+        make_solver = SOLVERS[name]
+        for depth, scrambled in cases.items():
+            seconds = 0.0
+            nodes = []
+            length = 0
+            peak = 0
+            for scramble in scrambled:
+                cube = Cube(3)
+                cube.make_moves(scramble)
+                solver = make_solver(cube)
+                start = time.perf_counter()
+                solution = solver.solve()
+                seconds += time.perf_counter() - start
+                nodes.append(getattr(solver, "nodes_expanded", None))
+                length += len(solution)
+
+                tracemalloc.start()
+                make_solver(cube).solve()
+                peak = max(peak, tracemalloc.get_traced_memory()[1])
+                tracemalloc.stop()
+            results.append({
+                "solver": name,
+                "depth": depth,
+                "scrambles": scrambles,
+                "seconds": round(seconds / scrambles, 6),
+                "nodes_expanded": None if None in nodes else round(sum(nodes) / scrambles, 1),
+                "solution_length": round(length / scrambles, 2),
+                "peak_memory_bytes": peak,
+            })
+    return results
+
+
+def run_suite(quick: bool = False, seed: int = 0) -> dict:
+    """Run every benchmark with fixed seeds.
+
+    Args:
+        quick (bool): Smaller workloads, for a fast check.
+        seed (int): Seed of every benchmark.
+
+    Returns:
+        dict: "metadata" (versions and settings) and "results", the list of
+            every benchmark by name.
+    """
+    from . import __version__
+
+    results = {
+        "moves": move_scaling(SUITE_MOVE_SIZES, num_moves=200 if quick else 2000, seed=seed),
+        "heuristics": heuristic_throughput(num_states=512 if quick else 4096, seed=seed),
+        "solvers": solver_benchmark(depths=(1, 2, 3) if quick else (1, 2, 3, 4, 5), scrambles=1 if quick else 3, seed=seed),
+        "reduction": reduction_scaling((4, 5, 6) if quick else REDUCTION_SIZES, scrambles=1 if quick else 3, seed=seed),
+        "dataset": dataset_throughput(num_states=1 << 16 if quick else 1 << 20),
+    }
+    metadata = {
+        "version": __version__,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "quick": quick,
+        "seed": seed,
+    }
+    return {"metadata": metadata, "results": results}
+
+
+def compare(results: dict, baseline: dict, tolerance: float = 0.25) -> List[dict]:
+    """Find the metrics of `results` that got worse than in `baseline`.
+
+    Entries are matched by benchmark name and their non metric fields (size,
+    family, solver, depth, ...). Entries missing from either side are
+    ignored.
+
+    Args:
+        results (dict): Output of `run_suite`.
+        baseline (dict): Output of `run_suite` stored earlier.
+        tolerance (float): Relative change allowed before a metric counts as
+            a regression, timings are noisy.
+
+    Returns:
+        list: One dict per regression with "benchmark", "entry", "metric",
+            "baseline", "value" and "change" (relative, positive is worse).
+    """
+    def key(entry: dict) -> tuple:
+        return tuple(sorted((name, value) for name, value in entry.items() if name not in METRICS))
+
+    regressions = []
+    for benchmark, entries in results["results"].items():
+        stored = {key(entry): entry for entry in baseline.get("results", {}).get(benchmark, [])}
+        for entry in entries:
+            before = stored.get(key(entry))
+            if before is None:
+                continue
+            for metric, direction in METRICS.items():
+                if entry.get(metric) is None or before.get(metric) in (None, 0):
+                    continue
+                change = (before[metric] - entry[metric]) / before[metric] * direction
+                if change > tolerance:
+                    regressions.append({
+                        "benchmark": benchmark,
+                        "entry": dict(key(entry)),
+                        "metric": metric,
+                        "baseline": before[metric],
+                        "value": entry[metric],
+                        "change": round(change, 3),
+                    })
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(prog="python -m rubics_cube.benchmark", description="Benchmarks of the simulator and solvers.")
+    parser.add_argument("-o", "--output", default="-", help="Where the JSON results are written, stdout by default.")
+    parser.add_argument("--compare", help="Baseline JSON to compare the results with, regressions exit with 1.")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Relative change counted as a regression.")
+    parser.add_argument("--quick", action="store_true", help="Smaller workloads.")
+    parser.add_argument("--seed", type=int, default=0)
+    arguments = parser.parse_args(argv)
+
+    suite = run_suite(quick=arguments.quick, seed=arguments.seed)
+    text = json.dumps(suite, indent=2)
+    if arguments.output == "-":
+        print(text)
+    else:
+        with open(arguments.output, "w", encoding="utf-8") as file:
+            file.write(text + "\n")
+
+    if arguments.compare:
+        with open(arguments.compare, encoding="utf-8") as file:
+            baseline = json.load(file)
+        regressions = compare(suite, baseline, arguments.tolerance)
+        for regression in regressions:
+            print(
+                f"regression in {regression['benchmark']} {regression['entry']}: {regression['metric']} "
+                f"{regression['baseline']} -> {regression['value']} ({regression['change']:+.0%})",
+                file=sys.stderr,
+            )
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,323 @@
+import os
+import shutil
+import tempfile
+import numpy as np
+from typing import Iterator, List, Optional, Tuple
+
+from .cube import Cube, get_move_table, encode_combinations
+from .encoding import pack_states, unpack_states, packed_length
+from .moves import get_move_pruning
+from .symmetry import Symmetry
+from .stats import SearchStats
+
+_NO_MOVE = 255
+
+
+class _Layer:
+    def __init__(self):
+        """States at the same distance from one side of the search.
+
+        The states are stored as disjoint runs of packed keys sorted by their
+        bytes. Every state also keeps the move that reached it and the
+        rotation that normalized it, see `BidirectionalSolver`. A run is a
+        tuple of numpy arrays in memory, or of memory mapped `.npy` files
+        after a spill.
+        """
+        self.runs: List[Tuple[np.ndarray, np.ndarray, np.ndarray]] = []
+
+    def __len__(self) -> int:
+        return sum(len(keys) for keys, _, _ in self.runs)
+
+    def add(self, keys: np.ndarray, moves: np.ndarray, rotations: np.ndarray):
+        if len(keys):
+            self.runs.append((keys, moves, rotations))
+
+    def find(self, keys: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Which keys are in the layer, with their moves and rotations."""
+        found = np.zeros(len(keys), dtype=bool)
+        moves = np.full(len(keys), _NO_MOVE, dtype=np.uint8)
+        rotations = np.zeros(len(keys), dtype=np.uint8)
+        for run_keys, run_moves, run_rotations in self.runs:
+            index = np.minimum(np.searchsorted(run_keys, keys), len(run_keys) - 1)
+            match = run_keys[index] == keys
+            found |= match
+            moves[match] = run_moves[index[match]]
+            rotations[match] = run_rotations[index[match]]
+        return found, moves, rotations
+
+    def chunks(self, chunk_size: int) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+        """Keys and moves of the layer, `chunk_size` states at a time."""
+        for keys, moves, _ in self.runs:
+            for start in range(0, len(keys), chunk_size):
+                yield np.asarray(keys[start : start + chunk_size]), np.asarray(moves[start : start + chunk_size])
+
+    def memory_usage(self) -> int:
+        return sum(sum(array.nbytes for array in run) for run in self.runs if not isinstance(run[0], np.memmap))
+
+
+class BidirectionalSolver:
+    def __init__(
+        self,
+        cube: Cube,
+        memory_limit: int = 1 << 30,
+        spill_directory: Optional[str] = None,
+        chunk_size: int = 1 << 16,
+    ):
+        """Optimal solver that searches from the cube and from the solved cube at once.
+
+        Both sides are expanded breadth first, one layer at a time, always
+        the side with the smaller newest layer. The solution is found when
+        the newest layers of the two sides share a state, so only about the
+        square root of the states of a one sided search are visited. The
+        backward side applies the inverse of every move.
+
+        Slice moves turn the centers, so the same position shows up in 24
+        orientations. On odd sized cubes every state is rotated so that its
+        centers are in place before it is stored, which makes the solved
+        cube a single state and shrinks both sides. On even sized cubes the
+        backward side starts from all 24 rotations of the solved cube. The
+        moves are translated back to the orientation of the cube at the end.
+
+        Args:
+            cube (Cube): The cube to solve.
+            memory_limit (int): Bytes of layers kept in memory, the largest
+                runs of the side using the most memory are written to disk
+                when it is exceeded.
+            spill_directory (str, optional): Where spilled runs are written, a
+                temporary directory by default. The files are removed after
+                the search.
+            chunk_size (int): Number of states expanded at a time.
+        """
+        self.cube = cube
+        self.size = cube.size
+        self.memory_limit = memory_limit
+        self.spill_directory = spill_directory
+        self.chunk_size = chunk_size
+
+        self.possible_moves = [move for move in cube.get_possible_moves() if move[0] not in "xyz"]
+        move_table = get_move_table(self.size)
+        self.permutations = np.stack([move_table[move] for move in self.possible_moves])
+        self.inverse_permutations = np.argsort(self.permutations, axis=1)
+
+        num_moves = len(self.possible_moves)
+        assert num_moves < _NO_MOVE, "Too many moves to store a move index in a byte."
+        allowed = get_move_pruning(tuple(self.possible_moves))
+        # successors[last move, next move], the row of the first move is indexed with _NO_MOVE
+        self.forward_successors = _pad_rows(allowed)
+        # the backward side prepends moves, a move is tried before the first move of the known path
+        self.backward_successors = _pad_rows(np.vstack([allowed[:num_moves].T, np.ones((1, num_moves), dtype=bool)]))
+
+        # rotation k turns a state into state[rotations[k]], the identity is 0
+        self.symmetry = Symmetry(self.size)
+        self.rotations = self.symmetry.permutations
+        self.inverse_rotations = np.argsort(self.rotations, axis=1)
+        self._rotation_index = {rotation.tobytes(): k for k, rotation in enumerate(self.rotations)}
+        move_index = {move: i for i, move in enumerate(self.possible_moves)}
+        # move i on a state rotated by k is the move from_rotated[k, i] on the state, to_rotated is the inverse
+        self.from_rotated = np.array(
+            [[move_index[self.symmetry.conjugate_moves([move], k)[0]] for move in self.possible_moves] for k in range(24)],
+            dtype=np.uint8,
+        )
+        self.to_rotated = np.argsort(self.from_rotated, axis=1).astype(np.uint8)
+
+        # the centers decide the orientation of odd sized cubes
+        self.centers = None
+        if self.size % 2:
+            middle = self.size // 2
+            self.centers = np.arange(6) * self.size * self.size + middle * self.size + middle
+            solved = np.repeat(np.arange(6, dtype=np.uint8), self.size * self.size)
+            # orientation[color of U center, color of F center] is the rotation that puts the centers in place
+            self.orientation = np.zeros((6, 6), dtype=np.uint8)
+            for k in range(24):
+                rotated_solved = solved[self.inverse_rotations[k]]
+                self.orientation[rotated_solved[self.centers[0]], rotated_solved[self.centers[2]]] = k
+
+        self.key_length = packed_length(self.size)
+        self.key_dtype = np.dtype((np.void, self.key_length))
+        # counters of the last search, replace it for progress reports, see `stats.SearchStats`
+        self.stats = SearchStats()
+
+    @property
+    def nodes_generated(self) -> int:
+        return self.stats.nodes_generated
+
+    def _keys(self, states: np.ndarray) -> np.ndarray:
+        return np.ascontiguousarray(pack_states(states)).view(self.key_dtype).reshape(-1)
+
+    def _states(self, keys: np.ndarray) -> np.ndarray:
+        return unpack_states(keys.view(np.uint8).reshape(-1, self.key_length), self.size)
+
+    def _normalize(self, states: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Rotate states so that their centers are in place, and the rotations used."""
+        if self.centers is None:
+            return states, np.zeros(len(states), dtype=np.uint8)
+        rotations = self.orientation[states[:, self.centers[0]], states[:, self.centers[2]]]
+        return np.take_along_axis(states, self.rotations[rotations], axis=1), rotations
+
+    def _layer(self, states: np.ndarray) -> _Layer:
+        states, rotations = self._normalize(states)
+        keys, index = np.unique(self._keys(states), return_index=True)
+        layer = _Layer()
+        layer.add(keys, np.full(len(keys), _NO_MOVE, dtype=np.uint8), rotations[index])
+        return layer
+
+    def _expand(self, layers: List[_Layer], forward: bool) -> _Layer:
+        """Add the next layer of one side, without the states of its last two layers."""
+        successors = self.forward_successors if forward else self.backward_successors
+        permutations = self.permutations if forward else self.inverse_permutations
+        previous = layers[-2:]
+        # added first so its runs count towards the memory limit while it grows
+        layer = _Layer()
+        layers.append(layer)
+        stats = self.stats
+        for keys, moves in previous[-1].chunks(self.chunk_size):
+            stats.nodes_expanded += len(keys)
+            with stats.timer("hashing"):
+                states = self._states(keys)
+            child_states = []
+            child_moves = []
+            with stats.timer("moves"):
+                for move_index, permutation in enumerate(permutations):
+                    rows = successors[moves, move_index]
+                    if not rows.any():
+                        continue
+                    child_states.append(states[rows][:, permutation])
+                    child_moves.append(np.full(len(child_states[-1]), move_index, dtype=np.uint8))
+                if not child_states:
+                    continue
+                child_states, child_rotations = self._normalize(np.concatenate(child_states))
+            # the move as seen from the normalized child
+            child_moves = self.to_rotated[child_rotations, np.concatenate(child_moves)]
+            stats.nodes_generated += len(child_states)
+            with stats.timer("hashing"):
+                child_keys, index = np.unique(self._keys(child_states), return_index=True)
+
+            # neighbors of a layer can only be in the layer before it, itself or the next one
+            new = np.ones(child_keys.size, dtype=bool)
+            for other in (*previous, layer):
+                new &= ~other.find(child_keys)[0]
+            index = index[new]
+            layer.add(child_keys[new], child_moves[index], child_rotations[index])
+            self._limit_memory()
+            stats.tick(len(layer), sum(len(other) for other in (*self.forward, *self.backward)) - len(layer))
+        return layer
+
+    def _limit_memory(self):
+        """Write the largest runs of the side using the most memory to disk until the limit is met."""
+        while True:
+            usage = [sum(layer.memory_usage() for layer in side) for side in (self.forward, self.backward)]
+            if sum(usage) <= self.memory_limit:
+                return
+            side = self.forward if usage[0] >= usage[1] else self.backward
+            runs = [
+                (run[0].nbytes, layer, i)
+                for layer in side
+                for i, run in enumerate(layer.runs)
+                if not isinstance(run[0], np.memmap)
+            ]
+            if not runs:
+                return
+            _, layer, i = max(runs, key=lambda run: run[0])
+            if self._directory is None:
+                self._directory = tempfile.mkdtemp(prefix="rubics_cube_", dir=self.spill_directory)
+            spilled = []
+            for name, array in zip(("keys", "moves", "rotations"), layer.runs[i]):
+                path = os.path.join(self._directory, f"run_{self._spilled}_{name}.npy")
+                np.save(path, array)
+                spilled.append(np.load(path, mmap_mode="r"))
+            self._spilled += 1
+            layer.runs[i] = tuple(spilled)
+
+    def _meeting_state(self) -> Optional[np.ndarray]:
+        """A key in the newest layers of both sides, if there is one."""
+        smaller, larger = sorted((self.forward[-1], self.backward[-1]), key=len)
+        for keys, _ in smaller.chunks(self.chunk_size):
+            found = larger.find(keys)[0]
+            if found.any():
+                return keys[np.argmax(found)]
+        return None
+
+    def _path(self, meeting: np.ndarray) -> tuple:
+        """Moves from the cube to the solved cube through the meeting state."""
+        # walk back to the start, every step is a move made on a normalized
+        # state and the rotation that normalized the state it reached
+        steps = []
+        state = self._states(meeting[None])
+        for layer in self.forward[:0:-1]:
+            _, moves, rotations = layer.find(self._keys(state))
+            move_index = self.from_rotated[rotations[0], moves[0]]
+            steps.append((move_index, rotations[0]))
+            state = state[:, self.inverse_rotations[rotations[0]]][:, self.inverse_permutations[move_index]]
+        steps.reverse()
+
+        # the normalized states are the cube rotated by `rotation`
+        rotation = self.rotations[self.forward[0].runs[0][2][0]]
+        moves = []
+        for move_index, step_rotation in steps:
+            moves.append(self._unrotated_move(move_index, rotation))
+            rotation = rotation[self.rotations[step_rotation]]
+
+        state = self._states(meeting[None])
+        for layer in self.backward[:0:-1]:
+            _, step_moves, step_rotations = layer.find(self._keys(state))
+            move_index, step_rotation = step_moves[0], step_rotations[0]
+            moves.append(self._unrotated_move(move_index, rotation))
+            state = state[:, self.permutations[move_index]][:, self.inverse_rotations[step_rotation]]
+            rotation = rotation[self.inverse_rotations[step_rotation]]
+        return tuple(moves)
+
+    def _unrotated_move(self, move_index: int, rotation: np.ndarray) -> str:
+        """The move on the cube that is `move_index` on the cube rotated by `rotation`."""
+        return self.possible_moves[self.from_rotated[self._rotation_index[rotation.tobytes()], move_index]]
+
+    def solve(self, max_depth: int = 14) -> tuple:
+        """Solve the cube with as few moves as possible.
+
+        Progress is reported through `self.stats` while a layer is made,
+        the frontier is the layer and the closed set all other layers. There
+        is no heuristic, so there is no best value either.
+
+        Args:
+            max_depth (int): Give up on solutions longer than this.
+
+        Returns:
+            tuple: The solution.
+        """
+        self.stats.start()
+        self._directory = None
+        self._spilled = 0
+        try:
+            return self._search(max_depth)
+        finally:
+            self.stats.stop()
+            if self._directory is not None:
+                shutil.rmtree(self._directory, ignore_errors=True)
+
+    def _search(self, max_depth: int) -> tuple:
+        if self.cube.is_solved():
+            return ()
+
+        start = encode_combinations(self.cube.combinations).reshape(1, -1)
+        solved = np.repeat(np.arange(6, dtype=np.uint8), self.size * self.size)
+        self.forward = [self._layer(start)]
+        self.backward = [self._layer(solved[self.rotations])]
+        while len(self.forward) + len(self.backward) - 2 < max_depth:
+            forward = len(self.forward[-1]) <= len(self.backward[-1])
+            layer = self._expand(self.forward if forward else self.backward, forward)
+            if len(layer) == 0:
+                # one side saw every state it can reach without meeting the other
+                raise ValueError("Invalid cube!")
+
+            meeting = self._meeting_state()
+            if meeting is not None:
+                return self._path(meeting)
+
+        raise ValueError(f"No solution found within {max_depth} moves.")
+
+
+def _pad_rows(successors: np.ndarray) -> np.ndarray:
+    """Move the row of the first move to index _NO_MOVE so stored moves can index the table directly."""
+    padded = np.zeros((_NO_MOVE + 1, successors.shape[1]), dtype=bool)
+    padded[: successors.shape[0] - 1] = successors[:-1]
+    padded[_NO_MOVE] = successors[-1]
+    return padded
@@ -0,0 +1,220 @@
+import sqlite3
+import numpy as np
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from .cube import Cube, encode_combinations, turn_layer
+from .symmetry import Symmetry
+
+# keys looked up per query, sqlite before 3.32 allows at most 999 parameters
+_QUERY_KEYS = 900
+# version of the entries in a database, older databases can hold moves of the wrong rotation
+_VERSION = 1
+
+
+class SolutionCache:
+    def __init__(self, size: int, max_entries: int = 1 << 16, path: Optional[str] = None):
+        """Solutions of states seen before, shared by every rotation of a state.
+
+        States are keyed by their canonical packed encoding under the 24
+        whole cube rotations (`Symmetry.canonical`), 3 bits per sticker, and
+        the solution of the canonical state is stored. A rotated scramble
+        gets the stored solution translated to its own orientation, so the
+        24 orientations of a scramble share one entry.
+
+        Recently used entries are kept in memory and the least recently used
+        one is evicted when there are more than `max_entries`. With a `path`
+        every entry is also written to a sqlite database, which outlives the
+        process and can be shared by several processes. Entries evicted from
+        memory are read back from it.
+
+        Args:
+            size (int): Size of the cubes.
+            max_entries (int): Entries kept in memory.
+            path (str, optional): The sqlite database, made if missing.
+        """
+        assert max_entries > 0, "The cache needs room for at least one entry."
+        self.size = size
+        self.max_entries = max_entries
+        self.path = path
+        self.symmetry = Symmetry(size)
+        self._memory: "OrderedDict[bytes, str]" = OrderedDict()
+        # translates moves on the original state to moves on the canonical state, by symmetry
+        self._to_canonical: Dict[int, Dict[str, str]] = {}
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        self._connection = None
+        if path is not None:
+            # the connection can move between threads, callers serialize the calls
+            self._connection = sqlite3.connect(path, check_same_thread=False)
+            with self._connection:
+                # several processes can read while one of them writes
+                self._connection.execute("PRAGMA journal_mode=WAL")
+                self._connection.execute("PRAGMA synchronous=NORMAL")
+                self._connection.execute("CREATE TABLE IF NOT EXISTS metadata (name TEXT PRIMARY KEY, value INTEGER)")
+                self._connection.execute(
+                    "CREATE TABLE IF NOT EXISTS solutions (key BLOB PRIMARY KEY, length INTEGER NOT NULL, moves TEXT NOT NULL)"
+                )
+                self._connection.execute("INSERT OR IGNORE INTO metadata VALUES ('size', ?)", (size,))
+                # only a new database gets the version, one without it is older
+                self._connection.execute(
+                    "INSERT OR IGNORE INTO metadata SELECT 'version', ? WHERE NOT EXISTS (SELECT 1 FROM solutions)",
+                    (_VERSION,),
+                )
+            stored_size = self._connection.execute("SELECT value FROM metadata WHERE name = 'size'").fetchone()[0]
+            assert stored_size == size, f"{path} caches {stored_size}x{stored_size} cubes, not {size}x{size}."
+            version = self._connection.execute("SELECT value FROM metadata WHERE name = 'version'").fetchone()
+            assert version is not None and version[0] == _VERSION, f"{path} was written by another version, delete it."
+
+    def __reduce__(self):
+        # every process opens its own connection to the database
+        return (SolutionCache, (self.size, self.max_entries, self.path))
+
+    def __len__(self) -> int:
+        """Number of entries, in the database if there is one."""
+        if self._connection is not None:
+            return self._connection.execute("SELECT COUNT(*) FROM solutions").fetchone()[0]
+        return len(self._memory)
+
+    @property
+    def hits(self) -> int:
+        return self.memory_hits + self.disk_hits
+
+    def stats(self) -> dict:
+        """Hit and miss counters."""
+        lookups = self.hits + self.misses
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "memory_entries": len(self._memory),
+        }
+
+    def close(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    def _from_canonical(self, moves: Sequence[str], index: int) -> Tuple[str, ...]:
+        return self.symmetry.conjugate_moves(moves, index)
+
+    def _to_canonical_moves(self, moves: Sequence[str], index: int) -> Tuple[str, ...]:
+        if index not in self._to_canonical:
+            # conjugating is a bijection of the moves, so it can be inverted
+            self._to_canonical[index] = {
+                original: move for move, original in self.symmetry._move_map(index).items()
+            }
+        move_map = self._to_canonical[index]
+        return tuple(move_map[move] for move in moves)
+
+    def _remember(self, key: bytes, moves: str):
+        self._memory[key] = moves
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def get_states(self, states: np.ndarray) -> List[Optional[Tuple[str, ...]]]:
+        """Cached solutions of encoded flat states.
+
+        States missing from memory are looked up in the database, 900 of
+        them per query. Every state counts as a memory hit, a disk hit or a
+        miss.
+
+        Args:
+            states (np.array): Encoded flat states. shape: (N, 6*n*n)
+
+        Returns:
+            list: The solution of every state, None for the states that are
+                not in the cache.
+        """
+        keys, indices = self.symmetry.canonical_states(states)
+        keys = [key.tobytes() for key in keys]
+        found = [self._memory.get(key) for key in keys]
+        for key, moves in zip(keys, found):
+            if moves is not None:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+
+        missing = list(dict.fromkeys(key for key, moves in zip(keys, found) if moves is None))
+        if missing and self._connection is not None:
+            rows = {}
+            for start in range(0, len(missing), _QUERY_KEYS):
+                chunk = missing[start : start + _QUERY_KEYS]
+                rows.update(
+                    self._connection.execute(
+                        f"SELECT key, moves FROM solutions WHERE key IN ({', '.join('?' * len(chunk))})", chunk
+                    ).fetchall()
+                )
+            for key, moves in rows.items():
+                self._remember(key, moves)
+            self.disk_hits += sum(moves is None and key in rows for key, moves in zip(keys, found))
+            found = [rows.get(key) if moves is None else moves for key, moves in zip(keys, found)]
+        self.misses += sum(moves is None for moves in found)
+
+        return [
+            None if moves is None else self._from_canonical(moves.split(), int(index))
+            for moves, index in zip(found, indices)
+        ]
+
+    def get(self, cube: Cube) -> Optional[Tuple[str, ...]]:
+        """Cached solution of a cube, None if it is not in the cache."""
+        return self.get_states(encode_combinations(cube.combinations).reshape(1, -1))[0]
+
+    def put(self, cube: Cube, solution: Sequence[str]):
+        """Store the solution of a cube and of every state on the way.
+
+        The state after the first k moves of the solution is solved by the
+        remaining moves, so a solution of m moves adds m entries. A state
+        that is already cached keeps its solution when it is not longer
+        than the new one.
+
+        Args:
+            cube (Cube): The cube, before the solution.
+            solution (list): Moves that solve it.
+        """
+        if len(solution) == 0:
+            return
+        state = np.ascontiguousarray(encode_combinations(cube.combinations))
+        states = [state.reshape(-1).copy()]
+        for move in solution:
+            turn_layer(state, move)
+            states.append(state.reshape(-1).copy())
+        # the solved state needs no entry
+        keys, indices = self.symmetry.canonical_states(np.stack(states[:-1]))
+        rows = []
+        for step, (key, index) in enumerate(zip(keys, indices)):
+            key = key.tobytes()
+            moves = " ".join(self._to_canonical_moves(solution[step:], int(index)))
+            known = self._memory.get(key)
+            if known is not None and len(known.split()) <= len(solution) - step:
+                continue
+            self._remember(key, moves)
+            rows.append((key, len(solution) - step, moves))
+
+        if self._connection is not None and rows:
+            with self._connection:
+                # a shorter solution stored by another process is kept
+                self._connection.executemany(
+                    "INSERT INTO solutions VALUES (?, ?, ?) ON CONFLICT(key) DO UPDATE "
+                    "SET length = excluded.length, moves = excluded.moves WHERE excluded.length < solutions.length",
+                    rows,
+                )
+
+    def solve(self, cube: Cube, solver) -> Tuple[str, ...]:
+        """The cached solution of a cube, otherwise `solver.solve()` and cache its solution.
+
+        Args:
+            cube (Cube): The cube.
+            solver: A solver of `cube`, only used on a miss.
+
+        Returns:
+            tuple: The solution.
+        """
+        solution = self.get(cube)
+        if solution is None:
+            solution = tuple(solver.solve())
+            self.put(cube, solution)
+        return solution
@@ -0,0 +1,55 @@
+import sys
+import json
+import argparse
+from typing import List, Optional
+
+from .parallel import SOLVERS, solve_many
+
+
+def _solve(arguments: argparse.Namespace):
+    scrambles = sys.stdin if arguments.input == "-" else open(arguments.input, encoding="utf-8")
+    output = sys.stdout if arguments.output == "-" else open(arguments.output, "w", encoding="utf-8")
+    try:
+        results = solve_many(
+            scrambles,
+            size=arguments.size,
+            solver=arguments.solver,
+            pattern_directory=arguments.pattern_directory,
+            workers=arguments.workers,
+            timeout=arguments.timeout,
+            chunk_size=arguments.chunk_size,
+            cache_path=arguments.cache,
+        )
+        for result in results:
+            output.write(json.dumps(result) + "\n")
+            output.flush()
+    finally:
+        if scrambles is not sys.stdin:
+            scrambles.close()
+        if output is not sys.stdout:
+            output.close()
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(prog="rubics-cube", description="Rubics cube simulator and solvers.")
+    commands = parser.add_subparsers(dest="command")
+    commands.required = True
+
+    solve = commands.add_parser("solve", help="Solve scrambles, one per line, and write JSON lines.")
+    solve.add_argument("input", nargs="?", default="-", help="File of scrambles, stdin by default.")
+    solve.add_argument("-o", "--output", default="-", help="Output file, stdout by default.")
+    solve.add_argument("--size", type=int, default=3, help="Size of the cubes.")
+    solve.add_argument("--solver", choices=sorted(SOLVERS), default="two-phase")
+    solve.add_argument("--pattern-directory", help="Pattern databases to use as the heuristic of astar and idastar.")
+    solve.add_argument("--workers", type=int, help="Number of processes, all cores by default.")
+    solve.add_argument("--timeout", type=float, help="Seconds to solve a single scramble.")
+    solve.add_argument("--chunk-size", type=int, default=1, help="Scrambles sent to a worker at once.")
+    solve.add_argument("--cache", help="Sqlite database of solutions, reused across runs.")
+    solve.set_defaults(function=_solve)
+
+    arguments = parser.parse_args(argv)
+    arguments.function(arguments)
+
+
+if __name__ == "__main__":
+    main()
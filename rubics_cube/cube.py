@@ -1,11 +1,25 @@
-import random
 import numpy as np
 import matplotlib.pyplot as plt
+from functools import lru_cache
 from mpl_toolkits.mplot3d import Axes3D
 from mpl_toolkits.mplot3d.art3d import Poly3DCollection
 from typing import List, Tuple, Dict, Union, Optional
 
 
+FACE_TO_INDEX = {
+    "U": 0,
+    "L": 1,
+    "F": 2,
+    "R": 3,
+    "B": 4,
+    "D": 5,
+}
+FACES = list(FACE_TO_INDEX.keys())
+COLORS = ["w", "o", "g", "r", "b", "y"]
+# Cube.make_moves compiles sequences into full sticker permutations up to this size
+MAX_COMPILED_SIZE = 16
+
+
 class Pipes:
     top_left = "╔"
     top_right = "╗"
@@ -19,6 +33,465 @@ class Pipes:
     horizontal_top = "╦"
     horizontal_bottom = "╩"
 
+
+@lru_cache(maxsize=None)
+def _possible_moves(size: int) -> Tuple[str, ...]:
+    # get moves that are possible for any sized cube
+    # i am going to implement my own notation to work with higher sized cubes
+    # but for 3x3x3 cube, it will be the same as rubiks cube notation
+    # there wont be any way to turn more than 1 slice at a time
+    # https://ruwix.com/the-rubiks-cube/notation/
+
+    # actually, reverse and double moves is kinda redundant
+
+    rotational_moves = [*"xyz", "x'", "y'", "z'"]
+    # copy of FACES
+    face_moves = FACES.copy()
+    face_moves.extend([move + "2" for move in FACES])
+    face_moves.extend([move + "'" for move in FACES])
+
+    # m1F means we will be rotating the slice of the cube that 1 layer away from the front face
+    # m1R means we will be rotating the slice of the cube that 1 layer away from the right face
+    # for a 3x3x3 cube, the 3 slices are m1F, m1R, and m1U
+
+    # for a 4x4x4 cube, the 4 slices are m1F, m2F, m1R, m2R, m1U, m2U
+    middle_layer_moves = []
+    for i in range(1, size - 1):
+        for face in ["F", "R", "U"]:
+            move = f"m{i}{face}"
+            middle_layer_moves.extend([move, move + "'", move + "2"])
+            # move, move reverse, move double
+
+    return (
+        *rotational_moves,
+        *face_moves,
+        *middle_layer_moves,
+    )
+
+
+def _rotate_face(combinations: np.ndarray, face: str, direction: int):
+    """
+    Rotate a face of the cube in place
+
+    Arguments:
+        combinations: array of shape (6, n, n)
+        face: can be F, R, U, L, B, D
+        direction: 1 for clockwise, -1 for counter clockwise
+    """
+    face_idx = FACE_TO_INDEX[face]
+    # lets use numpy to rotate the face 90 degrees
+    combinations[face_idx] = np.rot90(combinations[face_idx], direction)
+
+
+def _apply_base_move(combinations: np.ndarray, move: str):
+    """
+    Apply a single quarter turn in place.
+
+    This is the reference implementation of the moves. It is used to
+    compile the permutation tables in `get_move_table`, `Cube.make_move`
+    only calls it for whole cube rotations, which move every sticker anyway.
+
+    Arguments:
+        combinations: array of shape (6, n, n), any dtype
+        move: a move without the ' or 2 suffix, e.g. R, x or m1F
+    """
+    # first lets deal with the rotational moves
+    if move in FACES:
+        _rotate_face(combinations, move, -1)
+        # also we should rotate the slice
+        if move == "F":
+            # L -> U -> R -> D
+            copy_of_combinations = combinations.copy()
+            rows = [
+                copy_of_combinations[FACE_TO_INDEX["L"]][:, -1],  #
+                copy_of_combinations[FACE_TO_INDEX["U"]][-1],
+                copy_of_combinations[FACE_TO_INDEX["R"]][:, 0],  #
+                copy_of_combinations[FACE_TO_INDEX["D"]][0],
+            ]
+            combinations[FACE_TO_INDEX["L"]][:, -1] = rows[3]
+            combinations[FACE_TO_INDEX["U"]][-1] = rows[0][::-1]
+            combinations[FACE_TO_INDEX["R"]][:, 0] = rows[1]
+            combinations[FACE_TO_INDEX["D"]][0] = rows[2][::-1]
+
+        elif move == "R":
+            # F -> U -> B -> D
+            copy_of_combinations = combinations.copy()
+            rows = [
+                copy_of_combinations[FACE_TO_INDEX["F"]][:, -1],
+                copy_of_combinations[FACE_TO_INDEX["U"]][:, -1],
+                copy_of_combinations[FACE_TO_INDEX["B"]][:, 0],
+                copy_of_combinations[FACE_TO_INDEX["D"]][:, -1],
+            ]
+            combinations[FACE_TO_INDEX["F"]][:, -1] = rows[3]
+            combinations[FACE_TO_INDEX["U"]][:, -1] = rows[0]
+            combinations[FACE_TO_INDEX["B"]][:, 0] = rows[1][::-1]
+            combinations[FACE_TO_INDEX["D"]][:, -1] = rows[2][::-1]
+
+        elif move == "U":
+            # F -> L -> B -> R
+            copy_of_combinations = combinations.copy()
+            rows = [
+                copy_of_combinations[FACE_TO_INDEX["F"]][0],
+                copy_of_combinations[FACE_TO_INDEX["L"]][0],
+                copy_of_combinations[FACE_TO_INDEX["B"]][0],
+                copy_of_combinations[FACE_TO_INDEX["R"]][0],
+            ]
+            combinations[FACE_TO_INDEX["F"]][0] = rows[3]
+            combinations[FACE_TO_INDEX["L"]][0] = rows[0]
+            combinations[FACE_TO_INDEX["B"]][0] = rows[1]
+            combinations[FACE_TO_INDEX["R"]][0] = rows[2]
+
+        elif move == "L":
+            # B -> U -> F -> D
+            copy_of_combinations = combinations.copy()
+            rows = [
+                copy_of_combinations[FACE_TO_INDEX["B"]][:, -1],  #
+                copy_of_combinations[FACE_TO_INDEX["U"]][:, 0],
+                copy_of_combinations[FACE_TO_INDEX["F"]][:, 0],
+                copy_of_combinations[FACE_TO_INDEX["D"]][:, 0],  #
+            ]
+            combinations[FACE_TO_INDEX["B"]][:, -1] = rows[3][::-1]
+            combinations[FACE_TO_INDEX["U"]][:, 0] = rows[0][::-1]
+            combinations[FACE_TO_INDEX["F"]][:, 0] = rows[1]
+            combinations[FACE_TO_INDEX["D"]][:, 0] = rows[2]
+
+        elif move == "B":
+            # R -> U -> L -> D
+            copy_of_combinations = combinations.copy()
+            rows = [
+                copy_of_combinations[FACE_TO_INDEX["R"]][:, -1],
+                copy_of_combinations[FACE_TO_INDEX["U"]][0],
+                copy_of_combinations[FACE_TO_INDEX["L"]][:, 0],
+                copy_of_combinations[FACE_TO_INDEX["D"]][-1],
+            ]
+            combinations[FACE_TO_INDEX["R"]][:, -1] = rows[3][::-1]
+            combinations[FACE_TO_INDEX["U"]][0] = rows[0]
+            combinations[FACE_TO_INDEX["L"]][:, 0] = rows[1][::-1]
+            combinations[FACE_TO_INDEX["D"]][-1] = rows[2]
+
+        elif move == "D":
+            # F -> R -> B -> L
+            copy_of_combinations = combinations.copy()
+            rows = [
+                copy_of_combinations[FACE_TO_INDEX["F"]][-1],
+                copy_of_combinations[FACE_TO_INDEX["R"]][-1],
+                copy_of_combinations[FACE_TO_INDEX["B"]][-1],
+                copy_of_combinations[FACE_TO_INDEX["L"]][-1],
+            ]
+            combinations[FACE_TO_INDEX["F"]][-1] = rows[3]
+            combinations[FACE_TO_INDEX["R"]][-1] = rows[0]
+            combinations[FACE_TO_INDEX["B"]][-1] = rows[1]
+            combinations[FACE_TO_INDEX["L"]][-1] = rows[2]
+
+    # then lets deal with the rotations
+    # in rotations 2 faces are rotated
+    # and rest of the faces are moved in a certain direction
+    elif move == "x":
+        # L and R are rotated
+        _rotate_face(combinations, "L", 1)
+        _rotate_face(combinations, "R", -1)
+        ...
+        # F -> U -> B -> D
+        copy_of_combinations = combinations.copy()
+        faces = [
+            copy_of_combinations[FACE_TO_INDEX["F"]],
+            copy_of_combinations[FACE_TO_INDEX["U"]],
+            copy_of_combinations[FACE_TO_INDEX["B"]],
+            copy_of_combinations[FACE_TO_INDEX["D"]],
+        ]
+        combinations[FACE_TO_INDEX["F"]] = faces[3]
+        combinations[FACE_TO_INDEX["U"]] = faces[0]
+        combinations[FACE_TO_INDEX["B"]] = faces[1]
+        combinations[FACE_TO_INDEX["D"]] = faces[2]
+
+        _rotate_face(combinations, "D", 1)
+        _rotate_face(combinations, "D", 1)
+
+        _rotate_face(combinations, "B", 1)
+        _rotate_face(combinations, "B", 1)
+
+    elif move == "y":
+        # U and D are rotated
+        _rotate_face(combinations, "U", -1)
+        _rotate_face(combinations, "D", 1)
+        ...
+        # F -> L -> B -> R
+        copy_of_combinations = combinations.copy()
+        faces = [
+            copy_of_combinations[FACE_TO_INDEX["F"]],
+            copy_of_combinations[FACE_TO_INDEX["L"]],
+            copy_of_combinations[FACE_TO_INDEX["B"]],
+            copy_of_combinations[FACE_TO_INDEX["R"]],
+        ]
+        combinations[FACE_TO_INDEX["F"]] = faces[3]
+        combinations[FACE_TO_INDEX["L"]] = faces[0]
+        combinations[FACE_TO_INDEX["B"]] = faces[1]
+        combinations[FACE_TO_INDEX["R"]] = faces[2]
+
+    elif move == "z":
+        # F and B are rotated
+        _rotate_face(combinations, "F", -1)
+        _rotate_face(combinations, "B", 1)
+        ...
+        # U -> R -> D -> L
+        copy_of_combinations = combinations.copy()
+        faces = [
+            copy_of_combinations[FACE_TO_INDEX["U"]],
+            copy_of_combinations[FACE_TO_INDEX["R"]],
+            copy_of_combinations[FACE_TO_INDEX["D"]],
+            copy_of_combinations[FACE_TO_INDEX["L"]],
+        ]
+        combinations[FACE_TO_INDEX["U"]] = faces[3]
+        combinations[FACE_TO_INDEX["R"]] = faces[0]
+        combinations[FACE_TO_INDEX["D"]] = faces[1]
+        combinations[FACE_TO_INDEX["L"]] = faces[2]
+
+        _rotate_face(combinations, "L", -1)
+        _rotate_face(combinations, "D", -1)
+        _rotate_face(combinations, "R", -1)
+        _rotate_face(combinations, "U", -1)
+
+    # move is slicing move
+    # lets get the face and the direction
+    # the number between m and F, R, U
+    else:
+        face = move[-1]
+        index = int(move[1:-1])
+
+        if face == "F":
+            # U -> R -> D -> L
+            copy_of_combinations = combinations.copy()
+            slices = [
+                copy_of_combinations[FACE_TO_INDEX["U"]][-index - 1],
+                copy_of_combinations[FACE_TO_INDEX["R"]][:, index],
+                copy_of_combinations[FACE_TO_INDEX["D"]][index],
+                copy_of_combinations[FACE_TO_INDEX["L"]][:, -index - 1],
+            ]
+            combinations[FACE_TO_INDEX["U"]][-index - 1] = slices[3][::-1]
+            combinations[FACE_TO_INDEX["R"]][:, index] = slices[0]
+            combinations[FACE_TO_INDEX["D"]][index] = slices[1][::-1]
+            combinations[FACE_TO_INDEX["L"]][:, -index - 1] = slices[2]
+
+        elif face == "R":
+            # U -> B -> D -> F
+            copy_of_combinations = combinations.copy()
+            slices = [
+                copy_of_combinations[FACE_TO_INDEX["U"]][:, -index-1],
+                copy_of_combinations[FACE_TO_INDEX["B"]][:, index],
+                copy_of_combinations[FACE_TO_INDEX["D"]][:, -index-1],
+                copy_of_combinations[FACE_TO_INDEX["F"]][:, -index-1],
+            ]
+            combinations[FACE_TO_INDEX["U"]][:, -index-1] = slices[3]
+            combinations[FACE_TO_INDEX["B"]][:, index] = slices[0][::-1]
+            combinations[FACE_TO_INDEX["D"]][:, -index-1] = slices[1][::-1]
+            combinations[FACE_TO_INDEX["F"]][:, -index-1] = slices[2]
+
+        elif face == "U":
+            # F -> L -> B -> R
+            copy_of_combinations = combinations.copy()
+            slices = [
+                copy_of_combinations[FACE_TO_INDEX["F"]][index],
+                copy_of_combinations[FACE_TO_INDEX["L"]][index],
+                copy_of_combinations[FACE_TO_INDEX["B"]][index],
+                copy_of_combinations[FACE_TO_INDEX["R"]][index],
+            ]
+            combinations[FACE_TO_INDEX["F"]][index] = slices[3]
+            combinations[FACE_TO_INDEX["L"]][index] = slices[0]
+            combinations[FACE_TO_INDEX["B"]][index] = slices[1]
+            combinations[FACE_TO_INDEX["R"]][index] = slices[2]
+
+
+@lru_cache(maxsize=None)
+def get_move_table(size: int) -> Dict[str, np.ndarray]:
+    """
+    Compile every move of a cube into a flat sticker permutation.
+
+    For a flattened sticker array `flat` of shape (6 * size * size,),
+    `flat[table[move]]` is the state after `move`. The table is built once
+    per cube size by running the reference implementation on an array of
+    sticker indices, so it matches the original move semantics exactly.
+
+    Arguments:
+        size: size of the cube
+
+    Returns:
+        dict mapping every move of `Cube.get_possible_moves()` to its permutation
+    """
+    identity = np.arange(6 * size * size, dtype=np.intp).reshape(6, size, size)
+    quarter_turns = {}
+    table = {}
+    for move in _possible_moves(size):
+        base = move.rstrip("'2")
+        if base not in quarter_turns:
+            permutation = identity.copy()
+            _apply_base_move(permutation, base)
+            quarter_turns[base] = permutation.reshape(-1)
+
+        permutation = quarter_turns[base]
+        # applying p and then q is the same as applying p[q]
+        if move[-1] == "2":
+            permutation = permutation[permutation]
+        elif move[-1] == "'":
+            permutation = permutation[permutation[permutation]]
+        permutation.setflags(write=False)
+        table[move] = permutation
+    return table
+
+
+@lru_cache(maxsize=None)
+def _possible_move_set(size: int) -> frozenset:
+    return frozenset(_possible_moves(size))
+
+
+@lru_cache(maxsize=None)
+def _sticker_grid(size: int) -> np.ndarray:
+    # flat index of every sticker, the lines of a layer are views into it
+    grid = np.arange(6 * size * size, dtype=np.intp).reshape(6, size, size)
+    grid.setflags(write=False)
+    return grid
+
+
+def _layer_lines(grid: np.ndarray, layer: str) -> List[Tuple[np.ndarray, np.ndarray]]:
+    """
+    The 4 rows and columns around a face or slice quarter turn
+
+    Same assignments as `_apply_base_move`, on an array of sticker indices.
+
+    Arguments:
+        grid: flat sticker indices, shape (6, n, n)
+        layer: a face or slice move without the ' or 2 suffix, e.g. R or m1F
+
+    Returns:
+        list of (target, source) pairs, the stickers at source move to target
+    """
+    U, L, F, R, B, D = (grid[FACE_TO_INDEX[face]] for face in "ULFRBD")
+    if layer == "F":
+        return [(L[:, -1], D[0]), (U[-1], L[:, -1][::-1]), (R[:, 0], U[-1]), (D[0], R[:, 0][::-1])]
+    if layer == "R":
+        return [(F[:, -1], D[:, -1]), (U[:, -1], F[:, -1]), (B[:, 0], U[:, -1][::-1]), (D[:, -1], B[:, 0][::-1])]
+    if layer == "U":
+        return [(F[0], R[0]), (L[0], F[0]), (B[0], L[0]), (R[0], B[0])]
+    if layer == "L":
+        return [(B[:, -1], D[:, 0][::-1]), (U[:, 0], B[:, -1][::-1]), (F[:, 0], U[:, 0]), (D[:, 0], F[:, 0])]
+    if layer == "B":
+        return [(R[:, -1], D[-1][::-1]), (U[0], R[:, -1]), (L[:, 0], U[0][::-1]), (D[-1], L[:, 0])]
+    if layer == "D":
+        return [(F[-1], L[-1]), (R[-1], F[-1]), (B[-1], R[-1]), (L[-1], B[-1])]
+
+    face = layer[-1]
+    index = int(layer[1:-1])
+    if face == "F":
+        return [
+            (U[-index - 1], L[:, -index - 1][::-1]),
+            (R[:, index], U[-index - 1]),
+            (D[index], R[:, index][::-1]),
+            (L[:, -index - 1], D[index]),
+        ]
+    if face == "R":
+        return [
+            (U[:, -index - 1], F[:, -index - 1]),
+            (B[:, index], U[:, -index - 1][::-1]),
+            (D[:, -index - 1], B[:, index][::-1]),
+            (F[:, -index - 1], D[:, -index - 1]),
+        ]
+    return [(F[index], R[index]), (L[index], F[index]), (B[index], L[index]), (R[index], B[index])]
+
+
+@lru_cache(maxsize=4096)
+def get_layer_turn(size: int, move: str) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Sparse form of a face or slice move, only the 4*n stickers around the layer
+
+    `flat[targets] = flat[sources]` makes the move on a flattened sticker
+    array in place. Face moves also rotate the stickers of the face itself,
+    which `turn_layer` does separately. Nothing of size 6*n*n is built, so
+    this works for cubes far too large for `get_move_table`.
+
+    Arguments:
+        size: size of the cube
+        move: a face or slice move, e.g. R, U2 or m1F'
+
+    Returns:
+        (targets, sources) flat sticker indices, read only
+    """
+    lines = _layer_lines(_sticker_grid(size), move.rstrip("'2"))
+    targets = np.concatenate([target for target, _ in lines])
+    sources = np.concatenate([source for _, source in lines])
+    if move[-1] == "'":
+        # the inverse sends every sticker back
+        targets, sources = sources, targets
+    elif move[-1] == "2":
+        # where the source of every source came from
+        order = np.argsort(targets)
+        sources = sources[order[np.searchsorted(targets, sources, sorter=order)]]
+    targets.setflags(write=False)
+    sources.setflags(write=False)
+    return targets, sources
+
+
+def turn_layer(combinations: np.ndarray, move: str):
+    """
+    Make a move in place, touching only the stickers it moves
+
+    Slice moves copy 4*n stickers, face moves also rotate their face in
+    place and whole cube rotations move all stickers.
+
+    Arguments:
+        combinations: C contiguous array of shape (6, n, n), any dtype
+        move: any move of `Cube.get_possible_moves()`
+    """
+    layer = move.rstrip("'2")
+    turns = 2 if move[-1] == "2" else 3 if move[-1] == "'" else 1
+    if layer in "xyz":
+        for _ in range(turns):
+            _apply_base_move(combinations, layer)
+        return
+    if layer in FACE_TO_INDEX:
+        face = combinations[FACE_TO_INDEX[layer]]
+        face[...] = np.rot90(face, -turns)
+    targets, sources = get_layer_turn(combinations.shape[1], move)
+    flat = combinations.reshape(-1)
+    flat[targets] = flat[sources]
+
+
+# lookup table from the unicode code point of a color letter to its index in COLORS
+_COLOR_CODES = np.full(128, 255, dtype=np.uint8)
+for _index, _color in enumerate(COLORS):
+    _COLOR_CODES[ord(_color)] = _index
+del _index, _color
+
+
+def encode_combinations(combinations: np.ndarray) -> np.ndarray:
+    """
+    Encode color letters as uint8 indices into COLORS
+
+    Arguments:
+        combinations: array of color letters of any shape, e.g. (6, n, n)
+
+    Returns:
+        uint8 array of the same shape, already encoded arrays are returned as uint8
+    """
+    combinations = np.asarray(combinations)
+    if combinations.dtype.kind != "U":
+        return combinations.astype(np.uint8, copy=False)
+    # a one letter unicode array is just an array of uint32 code points
+    code_points = combinations.astype("<U1").view(np.uint32)
+    return _COLOR_CODES[np.minimum(code_points, 127)]
+
+
+def decode_combinations(codes: np.ndarray) -> np.ndarray:
+    """
+    Decode uint8 color indices back to color letters
+
+    Arguments:
+        codes: array of indices into COLORS of any shape
+
+    Returns:
+        array of color letters with the same shape
+    """
+    return np.array(COLORS)[codes]
+
+
 class Cube:
     def __init__(
         self,
@@ -30,6 +503,8 @@ class Cube:
     ):
         self.size = size
         self.seed = seed
+        # shuffles draw from the cube's own generator, so equal seeds give equal scrambles
+        self.rng = np.random.default_rng(seed)
         self.show_letter = show_letter
         # self.add_reverse_and_double_moves = add_reverse_and_double_moves TODO
         self.console_colors = {
@@ -52,23 +527,26 @@ class Cube:
             "b": "blue",
             "y": "yellow",
         }
-        self.colors = ["w", "o", "g", "r", "b", "y"]
-        self.face_to_index = {
-            "U": 0,
-            "L": 1,
-            "F": 2,
-            "R": 3,
-            "B": 4,
-            "D": 5,
-        }
-        self.faces = list(self.face_to_index.keys())
+        self.colors = COLORS.copy()
+        self.face_to_index = FACE_TO_INDEX.copy()
+        self.faces = FACES.copy()
         self.combinations = self.generate_solved_cube(size)
         if scrambled:
-            self.scramble()
+            self.shuffle()
 
     # make from_combinations function to initialize the cube from a given combination
     @classmethod
-    def from_combinations(cls, combinations):
+    def from_combinations(cls, combinations, validate: bool = False):
+        """Make a cube from its stickers.
+
+        Arguments:
+            combinations (np.array): Stickers of the cube. shape: (6, n, n)
+            validate (bool): Reject 3x3 states no sequence of moves can
+                solve, instead of letting a solver search forever.
+
+        Raises:
+            ValueError: If `validate` and the 3x3 cube is not solvable.
+        """
         # sanity checks for the combinations
         assert combinations.shape[0] == 6, "There should be 6 faces."
         assert combinations.shape[1] == combinations.shape[2], "The cube should be cubic."
@@ -76,12 +554,41 @@ class Cube:
         assert np.all(
             np.isin(combinations, ["w", "o", "g", "r", "b", "y"])
         ), "Every element should be in [w, o, g, r, b, y]."
+        if validate and combinations.shape[1] == 3:
+            from .cubie import CubieCube
 
+            if not CubieCube.from_combinations(combinations).is_solvable():
+                raise ValueError("The cube is not solvable.")
 
         cube = cls(size=combinations.shape[1], scrambled=False)
         cube.combinations = combinations
         return cube
 
+    def pack(self) -> bytes:
+        """Pack the stickers into 3 bits each, 21 bytes for a 3x3.
+
+        The result is hashable and compares equal only for identical
+        combinations, so it can be used as a key of sets and dicts.
+        """
+        from .encoding import pack_state
+
+        return pack_state(encode_combinations(self.combinations))
+
+    @classmethod
+    def unpack(cls, data: bytes, size: int):
+        """Make a cube from the output of `pack`.
+
+        Arguments:
+            data (bytes): The packed stickers.
+            size (int): Size of the packed cube.
+        """
+        from .encoding import packed_length, unpack_state
+
+        assert len(data) == packed_length(size), f"Packed data does not match a cube of size {size}."
+        cube = cls(size=size, scrambled=False)
+        cube.combinations = decode_combinations(unpack_state(data, size)).reshape(6, size, size)
+        return cube
+
     def is_solved(self):
         for face_index in range(6):
             first_color = self.combinations[face_index][0][0]
@@ -104,291 +611,65 @@ class Cube:
 
     def make_move(self, move: str, print_move: bool = False, print_cube: bool = False):
         # sanity check
-        assert move in self.get_possible_moves(), f"Move {move} is invalid."
+        assert move in _possible_move_set(self.size), f"Move {move} is invalid."
 
         if print_move:
             print("Making move:", move)
 
-        if move[-1] == "'":
-            self.make_move(move[:-1], print_move=False, print_cube=False)
-            self.make_move(move[:-1], print_move=False, print_cube=False)
-            self.make_move(move[:-1], print_move=False, print_cube=False)
-
-            if print_cube:
-                self.print()
-            return
-        elif move[-1] == "2":
-            self.make_move(move[:-1], print_move=False, print_cube=False)
-            self.make_move(move[:-1], print_move=False, print_cube=False)
-
-            if print_cube:
-                self.print()
-            return
-
-        # print("Apply move: ", move)
-        # first lets deal with the rotational moves
-        if move in self.faces:
-            self._rotate_face(move, -1)
-            # also we should rotate the slice
-            if move == "F":
-                # L -> U -> R -> D
-                copy_of_combinations = self.combinations.copy()
-                rows = [
-                    copy_of_combinations[self.face_to_index["L"]][:, -1],  #
-                    copy_of_combinations[self.face_to_index["U"]][-1],
-                    copy_of_combinations[self.face_to_index["R"]][:, 0],  #
-                    copy_of_combinations[self.face_to_index["D"]][0],
-                ]
-                self.combinations[self.face_to_index["L"]][:, -1] = rows[3]
-                self.combinations[self.face_to_index["U"]][-1] = rows[0][::-1]
-                self.combinations[self.face_to_index["R"]][:, 0] = rows[1]
-                self.combinations[self.face_to_index["D"]][0] = rows[2][::-1]
-
-            elif move == "R":
-                # F -> U -> B -> D
-                copy_of_combinations = self.combinations.copy()
-                rows = [
-                    copy_of_combinations[self.face_to_index["F"]][:, -1],
-                    copy_of_combinations[self.face_to_index["U"]][:, -1],
-                    copy_of_combinations[self.face_to_index["B"]][:, 0],
-                    copy_of_combinations[self.face_to_index["D"]][:, -1],
-                ]
-                self.combinations[self.face_to_index["F"]][:, -1] = rows[3]
-                self.combinations[self.face_to_index["U"]][:, -1] = rows[0]
-                self.combinations[self.face_to_index["B"]][:, 0] = rows[1][::-1]
-                self.combinations[self.face_to_index["D"]][:, -1] = rows[2][::-1]
-
-            elif move == "U":
-                # F -> L -> B -> R
-                copy_of_combinations = self.combinations.copy()
-                rows = [
-                    copy_of_combinations[self.face_to_index["F"]][0],
-                    copy_of_combinations[self.face_to_index["L"]][0],
-                    copy_of_combinations[self.face_to_index["B"]][0],
-                    copy_of_combinations[self.face_to_index["R"]][0],
-                ]
-                self.combinations[self.face_to_index["F"]][0] = rows[3]
-                self.combinations[self.face_to_index["L"]][0] = rows[0]
-                self.combinations[self.face_to_index["B"]][0] = rows[1]
-                self.combinations[self.face_to_index["R"]][0] = rows[2]
-
-            elif move == "L":
-                # B -> U -> F -> D
-                copy_of_combinations = self.combinations.copy()
-                rows = [
-                    copy_of_combinations[self.face_to_index["B"]][:, -1],  #
-                    copy_of_combinations[self.face_to_index["U"]][:, 0],
-                    copy_of_combinations[self.face_to_index["F"]][:, 0],
-                    copy_of_combinations[self.face_to_index["D"]][:, 0],  #
-                ]
-                self.combinations[self.face_to_index["B"]][:, -1] = rows[3][::-1]
-                self.combinations[self.face_to_index["U"]][:, 0] = rows[0][::-1]
-                self.combinations[self.face_to_index["F"]][:, 0] = rows[1]
-                self.combinations[self.face_to_index["D"]][:, 0] = rows[2]
-
-            elif move == "B":
-                # R -> U -> L -> D
-                copy_of_combinations = self.combinations.copy()
-                rows = [
-                    copy_of_combinations[self.face_to_index["R"]][:, -1],
-                    copy_of_combinations[self.face_to_index["U"]][0],
-                    copy_of_combinations[self.face_to_index["L"]][:, 0],
-                    copy_of_combinations[self.face_to_index["D"]][-1],
-                ]
-                self.combinations[self.face_to_index["R"]][:, -1] = rows[3][::-1]
-                self.combinations[self.face_to_index["U"]][0] = rows[0]
-                self.combinations[self.face_to_index["L"]][:, 0] = rows[1][::-1]
-                self.combinations[self.face_to_index["D"]][-1] = rows[2]
-
-            elif move == "D":
-                # F -> R -> B -> L
-                copy_of_combinations = self.combinations.copy()
-                rows = [
-                    copy_of_combinations[self.face_to_index["F"]][-1],
-                    copy_of_combinations[self.face_to_index["R"]][-1],
-                    copy_of_combinations[self.face_to_index["B"]][-1],
-                    copy_of_combinations[self.face_to_index["L"]][-1],
-                ]
-                self.combinations[self.face_to_index["F"]][-1] = rows[3]
-                self.combinations[self.face_to_index["R"]][-1] = rows[0]
-                self.combinations[self.face_to_index["B"]][-1] = rows[1]
-                self.combinations[self.face_to_index["L"]][-1] = rows[2]
-
-        # then lets deal with the rotations
-        # in rotations 2 faces are rotated
-        # and rest of the faces are moved in a certain direction
-        elif move == "x":
-            # L and R are rotated
-            self._rotate_face("L", 1)
-            self._rotate_face("R", -1)
-            ...
-            # F -> U -> B -> D
-            copy_of_combinations = self.combinations.copy()
-            faces = [
-                copy_of_combinations[self.face_to_index["F"]],
-                copy_of_combinations[self.face_to_index["U"]],
-                copy_of_combinations[self.face_to_index["B"]],
-                copy_of_combinations[self.face_to_index["D"]],
-            ]
-            self.combinations[self.face_to_index["F"]] = faces[3]
-            self.combinations[self.face_to_index["U"]] = faces[0]
-            self.combinations[self.face_to_index["B"]] = faces[1]
-            self.combinations[self.face_to_index["D"]] = faces[2]
-
-            self._rotate_face("D", 1)
-            self._rotate_face("D", 1)
-
-            self._rotate_face("B", 1)
-            self._rotate_face("B", 1)
-
-        elif move == "y":
-            # U and D are rotated
-            self._rotate_face("U", -1)
-            self._rotate_face("D", 1)
-            ...
-            # F -> L -> B -> R
-            copy_of_combinations = self.combinations.copy()
-            faces = [
-                copy_of_combinations[self.face_to_index["F"]],
-                copy_of_combinations[self.face_to_index["L"]],
-                copy_of_combinations[self.face_to_index["B"]],
-                copy_of_combinations[self.face_to_index["R"]],
-            ]
-            self.combinations[self.face_to_index["F"]] = faces[3]
-            self.combinations[self.face_to_index["L"]] = faces[0]
-            self.combinations[self.face_to_index["B"]] = faces[1]
-            self.combinations[self.face_to_index["R"]] = faces[2]
-
-        elif move == "z":
-            # F and B are rotated
-            self._rotate_face("F", -1)
-            self._rotate_face("B", 1)
-            ...
-            # U -> R -> D -> L
-            copy_of_combinations = self.combinations.copy()
-            faces = [
-                copy_of_combinations[self.face_to_index["U"]],
-                copy_of_combinations[self.face_to_index["R"]],
-                copy_of_combinations[self.face_to_index["D"]],
-                copy_of_combinations[self.face_to_index["L"]],
-            ]
-            self.combinations[self.face_to_index["U"]] = faces[3]
-            self.combinations[self.face_to_index["R"]] = faces[0]
-            self.combinations[self.face_to_index["D"]] = faces[1]
-            self.combinations[self.face_to_index["L"]] = faces[2]
-
-            self._rotate_face("L", -1)
-            self._rotate_face("D", -1)
-            self._rotate_face("R", -1)
-            self._rotate_face("U", -1)
-
-        # move is slicing move
-        # lets get the face and the direction
-        # the number between m and F, R, U
-        else:
-            face = move[-1]
-            index = int(move[1:-1])
-
-            if face == "F":
-                # U -> R -> D -> L
-                copy_of_combinations = self.combinations.copy()
-                slices = [
-                    copy_of_combinations[self.face_to_index["U"]][-index - 1],
-                    copy_of_combinations[self.face_to_index["R"]][:, index],
-                    copy_of_combinations[self.face_to_index["D"]][index],
-                    copy_of_combinations[self.face_to_index["L"]][:, -index - 1],
-                ]
-                self.combinations[self.face_to_index["U"]][-index - 1] = slices[3][::-1]
-                self.combinations[self.face_to_index["R"]][:, index] = slices[0]
-                self.combinations[self.face_to_index["D"]][index] = slices[1][::-1]
-                self.combinations[self.face_to_index["L"]][:, -index - 1] = slices[2]
-
-            elif face == "R":
-                # U -> B -> D -> F
-                copy_of_combinations = self.combinations.copy()
-                slices = [
-                    copy_of_combinations[self.face_to_index["U"]][:, -index-1],
-                    copy_of_combinations[self.face_to_index["B"]][:, index],
-                    copy_of_combinations[self.face_to_index["D"]][:, -index-1],
-                    copy_of_combinations[self.face_to_index["F"]][:, -index-1],
-                ]
-                self.combinations[self.face_to_index["U"]][:, -index-1] = slices[3]
-                self.combinations[self.face_to_index["B"]][:, index] = slices[0][::-1]
-                self.combinations[self.face_to_index["D"]][:, -index-1] = slices[1][::-1]
-                self.combinations[self.face_to_index["F"]][:, -index-1] = slices[2]
-
-            elif face == "U":
-                # F -> L -> B -> R
-                copy_of_combinations = self.combinations.copy()
-                slices = [
-                    copy_of_combinations[self.face_to_index["F"]][index],
-                    copy_of_combinations[self.face_to_index["L"]][index],
-                    copy_of_combinations[self.face_to_index["B"]][index],
-                    copy_of_combinations[self.face_to_index["R"]][index],
-                ]
-                self.combinations[self.face_to_index["F"]][index] = slices[3]
-                self.combinations[self.face_to_index["L"]][index] = slices[0]
-                self.combinations[self.face_to_index["B"]][index] = slices[1]
-                self.combinations[self.face_to_index["R"]][index] = slices[2]
+        # turn_layer works on the flat view of the stickers
+        if not self.combinations.flags.c_contiguous:
+            self.combinations = np.ascontiguousarray(self.combinations)
+        # only the stickers around the layer are copied, O(n) for slice moves
+        turn_layer(self.combinations, move)
 
         if print_cube:
             self.print()
 
-    def _rotate_face(self, face: str, direction: int):
-        """
-        Rotate a face of the cube
+    def make_moves(self, moves, print_cube: bool = False):
+        """Make a sequence of moves with a single gather.
+
+        Cubes larger than `MAX_COMPILED_SIZE` make the simplified moves one
+        by one instead, every move only touches the stickers it moves.
 
         Arguments:
-            face: can be F, R, U, L, B, D
-            direction: 1 for clockwise, -1 for counter clockwise
+            moves (str | list | MoveSequence): Moves separated by whitespace, or a list of moves.
+            print_cube (bool): Print the cube after the moves.
         """
-        face_idx = self.face_to_index[face]
-        face = self.combinations[face_idx]
-        # lets use numpy to rotate the face 90 degrees
-        rotated_face = np.rot90(face, direction)
-        self.combinations[face_idx] = rotated_face
+        from .moves import MoveSequence, parse_moves
+
+        if isinstance(moves, str):
+            moves = parse_moves(moves)
+        elif not isinstance(moves, MoveSequence):
+            moves = MoveSequence(moves)
+        if self.size > MAX_COMPILED_SIZE:
+            # a compiled sequence has an index for each of the 6*n*n stickers
+            for move in moves.simplify():
+                self.make_move(move)
+        else:
+            self.combinations[...] = moves.apply(self.combinations.reshape(-1), self.size).reshape(
+                self.combinations.shape
+            )
 
-    def get_possible_moves(self):
-        # get moves that are possible for any sized cube
-        # i am going to implement my own notation to work with higher sized cubes
-        # but for 3x3x3 cube, it will be the same as rubiks cube notation
-        # there wont be any way to turn more than 1 slice at a time
-        # https://ruwix.com/the-rubiks-cube/notation/
-
-        # actually, reverse and double moves is kinda redundant
-
-        rotational_moves = [*"xyz", "x'", "y'", "z'"]
-        # copy of self.faces
-        face_moves = self.faces.copy()
-        face_moves.extend([move + "2" for move in self.faces])
-        face_moves.extend([move + "'" for move in self.faces])
-
-        # m1F means we will be rotating the slice of the cube that 1 layer away from the front face
-        # m1R means we will be rotating the slice of the cube that 1 layer away from the right face
-        # for a 3x3x3 cube, the 3 slices are m1F, m1R, and m1U
-
-        # for a 4x4x4 cube, the 4 slices are m1F, m2F, m1R, m2R, m1U, m2U
-        middle_layer_moves = []
-        for i in range(1, self.size - 1):
-            for face in ["F", "R", "U"]:
-                move = f"m{i}{face}"
-                middle_layer_moves.extend([move, move + "'", move + "2"])
-                # move, move reverse, move double
+        if print_cube:
+            self.print()
 
-        return [
-            *rotational_moves,
-            *face_moves,
-            *middle_layer_moves,
-        ]
+    def get_possible_moves(self):
+        # the notation is explained in _possible_moves
+        return list(_possible_moves(self.size))
 
-    def shuffle(self, num_moves: int = 20):
+    def shuffle(self, num_moves: int = 20, rng: Optional[np.random.Generator] = None):
         """
         Shuffle the cube
+
+        Arguments:
+            num_moves: number of random moves
+            rng: generator to draw the moves from, the generator seeded with
+                `seed` when the cube was made by default
         """
+        rng = self.rng if rng is None else rng
         possible_moves = self.get_possible_moves()
-        for _ in range(num_moves):
-            move = random.choice(possible_moves)
-            self.make_move(move, print_cube=False)
+        moves = [possible_moves[index] for index in rng.integers(len(possible_moves), size=num_moves)]
+        self.make_moves(moves)
 
     def _print_letter(self, letter: str, color: bool = True):
         if color:
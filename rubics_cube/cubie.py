@@ -0,0 +1,322 @@
+import numpy as np
+from functools import lru_cache
+from typing import Dict, Optional, Tuple
+
+from .cube import FACE_TO_INDEX, get_move_table, encode_combinations, decode_combinations, _possible_moves
+
+# corner and edge positions of a 3x3, the faces of every piece are listed
+# clockwise starting from the U or D face (corners) or the reference face (edges)
+CORNERS = ["URF", "UFL", "ULB", "UBR", "DFR", "DLF", "DBL", "DRB"]
+EDGES = ["UR", "UF", "UL", "UB", "DR", "DF", "DL", "DB", "FR", "FL", "BL", "BR"]
+
+_U = FACE_TO_INDEX["U"]
+_D = FACE_TO_INDEX["D"]
+
+
+def sticker_positions(size: int) -> np.ndarray:
+    """Position of the piece every sticker belongs to.
+
+    The cube is placed in a coordinate system where x goes from L to R,
+    y from D to U and z from F to B, so stickers of the same piece share
+    the same (x, y, z).
+
+    Args:
+        size (int): Size of the cube.
+
+    Returns:
+        np.array: Coordinates of the flattened stickers. shape: (6*size*size, 3)
+    """
+    last = size - 1
+    i, j = np.meshgrid(np.arange(size), np.arange(size), indexing="ij")
+    zeros = np.zeros_like(i)
+    full = np.full_like(i, last)
+    # (x, y, z) of the sticker at row i and column j of every face
+    faces = {
+        "U": (j, full, last - i),
+        "L": (zeros, last - i, last - j),
+        "F": (j, last - i, zeros),
+        "R": (full, last - i, j),
+        "B": (last - j, last - i, full),
+        "D": (j, zeros, i),
+    }
+    positions = np.empty((6, size, size, 3), dtype=np.intp)
+    for face, coordinates in faces.items():
+        positions[FACE_TO_INDEX[face]] = np.stack(coordinates, axis=-1)
+    return positions.reshape(-1, 3)
+
+
+def _piece_facelets(size: int, pieces) -> np.ndarray:
+    """Flat sticker indices of the given pieces, in the order of their faces."""
+    positions = sticker_positions(size)
+    sticker_faces = np.repeat(np.arange(6), size * size)
+    middle = size // 2
+    facelets = []
+    for piece in pieces:
+        # coordinate along each axis, pieces without a face on an axis sit in the middle
+        x = size - 1 if "R" in piece else 0 if "L" in piece else middle
+        y = size - 1 if "U" in piece else 0 if "D" in piece else middle
+        z = 0 if "F" in piece else size - 1 if "B" in piece else middle
+        at_position = np.all(positions == (x, y, z), axis=1)
+        facelets.append(
+            [int(np.flatnonzero(at_position & (sticker_faces == FACE_TO_INDEX[face]))[0]) for face in piece]
+        )
+    return np.array(facelets, dtype=np.intp)
+
+
+CORNER_FACELETS = _piece_facelets(3, CORNERS)
+EDGE_FACELETS = _piece_facelets(3, EDGES)
+CENTER_FACELETS = np.arange(6) * 9 + 4
+
+# lookup from the faces of a corner, read clockwise from its U/D sticker, to the corner
+_CORNER_LOOKUP = np.full(6 * 6 * 6, 255, dtype=np.uint8)
+for _piece, _faces in enumerate(CORNERS):
+    _a, _b, _c = (FACE_TO_INDEX[face] for face in _faces)
+    _CORNER_LOOKUP[_a * 36 + _b * 6 + _c] = _piece
+
+# lookup from the two faces of an edge to the edge and its orientation
+_EDGE_LOOKUP = np.full(6 * 6, 255, dtype=np.uint8)
+_EDGE_ORIENTATION = np.zeros(6 * 6, dtype=np.uint8)
+for _piece, _faces in enumerate(EDGES):
+    _a, _b = (FACE_TO_INDEX[face] for face in _faces)
+    _EDGE_LOOKUP[_a * 6 + _b] = _EDGE_LOOKUP[_b * 6 + _a] = _piece
+    _EDGE_ORIENTATION[_b * 6 + _a] = 1
+del _piece, _faces, _a, _b, _c
+
+
+def read_cubies(states: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Read the corners and edges of encoded 3x3 states.
+
+    Pieces are identified by their colors in the solved cube (white is U,
+    orange is L and so on), so every move, including slice moves and whole
+    cube rotations, is a fixed permutation of the positions. Pieces that can
+    not be identified (invalid colorings) are reported as 255.
+
+    Args:
+        states (np.array): Encoded states. shape: (..., 54) or (..., 6, 3, 3)
+
+    Returns:
+        tuple: (corner_permutation, corner_orientation, edge_permutation, edge_orientation)
+            where corner_permutation[..., i] is the corner at position i.
+            shapes: (..., 8), (..., 8), (..., 12), (..., 12)
+    """
+    states = np.asarray(states)
+    batch_shape = states.shape[:-3] if states.shape[-3:] == (6, 3, 3) else states.shape[:-1]
+    flat = states.reshape(-1, 54).astype(np.intp)
+    count = flat.shape[0]
+
+    # color i is the color of face i in the solved cube
+    corner_faces = flat[:, CORNER_FACELETS].reshape(count, 8, 3)
+    edge_faces = flat[:, EDGE_FACELETS].reshape(count, 12, 2)
+
+    corner_orientation = np.argmax((corner_faces == _U) | (corner_faces == _D), axis=2)
+    rotation = (corner_orientation[:, :, None] + np.arange(3)) % 3
+    corner_faces = np.take_along_axis(corner_faces, rotation, axis=2)
+    corner_codes = corner_faces[:, :, 0] * 36 + corner_faces[:, :, 1] * 6 + corner_faces[:, :, 2]
+    corner_permutation = _CORNER_LOOKUP[corner_codes]
+
+    edge_codes = edge_faces[:, :, 0] * 6 + edge_faces[:, :, 1]
+    edge_permutation = _EDGE_LOOKUP[edge_codes]
+    edge_orientation = _EDGE_ORIENTATION[edge_codes]
+
+    return (
+        corner_permutation.reshape(*batch_shape, 8),
+        corner_orientation.astype(np.uint8).reshape(*batch_shape, 8),
+        edge_permutation.reshape(*batch_shape, 12),
+        edge_orientation.reshape(*batch_shape, 12),
+    )
+
+
+@lru_cache(maxsize=None)
+def get_cubie_moves() -> Dict[str, Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]]:
+    """Effect of every 3x3 move on the pieces.
+
+    Applying move `m` with tables (cp, co, ep, eo) to a state moves the piece
+    at position cp[i] to position i and adds co[i] (eo[i]) to its orientation.
+
+    Returns:
+        dict: Maps a move to (corner_permutation, corner_orientation, edge_permutation,
+            edge_orientation) of the state reached from the solved cube.
+    """
+    move_table = get_move_table(3)
+    solved = np.repeat(np.arange(6, dtype=np.uint8), 9)
+    return {move: read_cubies(solved[move_table[move]]) for move in _possible_moves(3)}
+
+
+def _parity(permutation: np.ndarray) -> int:
+    """0 for even permutations, 1 for odd ones."""
+    seen = np.zeros(len(permutation), dtype=bool)
+    parity = 0
+    for start in range(len(permutation)):
+        length = 0
+        position = start
+        while not seen[position]:
+            seen[position] = True
+            position = permutation[position]
+            length += 1
+        if length:
+            parity ^= (length - 1) & 1
+    return parity
+
+
+class CubieCube:
+    def __init__(
+        self,
+        centers: Optional[np.ndarray] = None,
+        corner_permutation: Optional[np.ndarray] = None,
+        corner_orientation: Optional[np.ndarray] = None,
+        edge_permutation: Optional[np.ndarray] = None,
+        edge_orientation: Optional[np.ndarray] = None,
+    ):
+        """A 3x3 described by its pieces instead of its stickers.
+
+        `centers[f]` is the color of the center on face f, `corner_permutation[i]`
+        is the corner at position i and `corner_orientation[i]` its twist (the
+        same for edges). Every move of the 3x3, including slice moves and whole
+        cube rotations, is a multiplication with a fixed `CubieCube`.
+
+        Args:
+            centers (np.array, optional): shape: (6,), solved if not given.
+            corner_permutation (np.array, optional): shape: (8,)
+            corner_orientation (np.array, optional): shape: (8,)
+            edge_permutation (np.array, optional): shape: (12,)
+            edge_orientation (np.array, optional): shape: (12,)
+        """
+        self.centers = np.arange(6, dtype=np.uint8) if centers is None else np.asarray(centers, dtype=np.uint8)
+        self.corner_permutation = (
+            np.arange(8, dtype=np.uint8) if corner_permutation is None else np.asarray(corner_permutation, dtype=np.uint8)
+        )
+        self.corner_orientation = (
+            np.zeros(8, dtype=np.uint8) if corner_orientation is None else np.asarray(corner_orientation, dtype=np.uint8)
+        )
+        self.edge_permutation = (
+            np.arange(12, dtype=np.uint8) if edge_permutation is None else np.asarray(edge_permutation, dtype=np.uint8)
+        )
+        self.edge_orientation = (
+            np.zeros(12, dtype=np.uint8) if edge_orientation is None else np.asarray(edge_orientation, dtype=np.uint8)
+        )
+
+    @classmethod
+    def from_combinations(cls, combinations: np.ndarray) -> "CubieCube":
+        """Read the pieces of a 3x3, the colors can be letters or encoded.
+
+        Args:
+            combinations (np.array): shape: (6, 3, 3)
+
+        Returns:
+            CubieCube: The pieces, unidentifiable pieces are 255.
+        """
+        state = encode_combinations(combinations).reshape(-1)
+        assert state.shape == (54,), "Only the 3x3 cube has a cubie representation."
+        return cls(state[CENTER_FACELETS], *read_cubies(state))
+
+    def to_combinations(self) -> np.ndarray:
+        """Stickers of the cube, the inverse of `from_combinations`.
+
+        Returns:
+            np.array: Color letters. shape: (6, 3, 3)
+        """
+        state = np.empty(54, dtype=np.uint8)
+        state[CENTER_FACELETS] = self.centers
+        corner_faces = np.array([[FACE_TO_INDEX[face] for face in corner] for corner in CORNERS], dtype=np.uint8)
+        edge_faces = np.array([[FACE_TO_INDEX[face] for face in edge] for edge in EDGES], dtype=np.uint8)
+        # facelet k of a corner twisted by o shows the face (k - o) % 3 of the piece
+        twist = (np.arange(3) - self.corner_orientation[:, None].astype(np.intp)) % 3
+        state[CORNER_FACELETS] = np.take_along_axis(corner_faces[self.corner_permutation], twist, axis=1)
+        flip = (np.arange(2) + self.edge_orientation[:, None].astype(np.intp)) % 2
+        state[EDGE_FACELETS] = np.take_along_axis(edge_faces[self.edge_permutation], flip, axis=1)
+        return decode_combinations(state).reshape(6, 3, 3)
+
+    def multiply(self, other: "CubieCube") -> "CubieCube":
+        """The state reached by applying `other` after `self`."""
+        return CubieCube(
+            self.centers[other.centers],
+            self.corner_permutation[other.corner_permutation],
+            (self.corner_orientation[other.corner_permutation] + other.corner_orientation) % 3,
+            self.edge_permutation[other.edge_permutation],
+            (self.edge_orientation[other.edge_permutation] + other.edge_orientation) % 2,
+        )
+
+    def make_move(self, move: str):
+        """Apply a move of `Cube.get_possible_moves()` in place."""
+        move_cubes = get_move_cubes()
+        assert move in move_cubes, f"Move {move} is invalid."
+        moved = self.multiply(move_cubes[move])
+        self.centers = moved.centers
+        self.corner_permutation = moved.corner_permutation
+        self.corner_orientation = moved.corner_orientation
+        self.edge_permutation = moved.edge_permutation
+        self.edge_orientation = moved.edge_orientation
+
+    def is_solvable(self) -> bool:
+        """Check if the cube can be solved.
+
+        The centers have to be a rotation of the solved cube and every piece
+        has to appear once. Corner twists add up to 0 mod 3, edge flips to
+        0 mod 2, and the corner, edge and center permutations together are
+        even, since every move keeps all of these.
+
+        Returns:
+            bool: True if some sequence of moves solves the cube.
+        """
+        if tuple(self.centers.tolist()) not in _valid_centers():
+            return False
+        if sorted(self.corner_permutation.tolist()) != list(range(8)):
+            return False
+        if sorted(self.edge_permutation.tolist()) != list(range(12)):
+            return False
+        if int(self.corner_orientation.sum()) % 3 or int(self.edge_orientation.sum()) % 2:
+            return False
+        parity = _parity(self.corner_permutation) ^ _parity(self.edge_permutation) ^ _parity(self.centers)
+        return parity == 0
+
+    def to_bytes(self) -> bytes:
+        """Compact key of the state, 46 bytes."""
+        return b"".join(
+            array.tobytes()
+            for array in (
+                self.centers,
+                self.corner_permutation,
+                self.corner_orientation,
+                self.edge_permutation,
+                self.edge_orientation,
+            )
+        )
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, CubieCube) and self.to_bytes() == other.to_bytes()
+
+    def __hash__(self) -> int:
+        return hash(self.to_bytes())
+
+    def __repr__(self) -> str:
+        return (
+            f"CubieCube(centers={self.centers.tolist()}, "
+            f"corner_permutation={self.corner_permutation.tolist()}, "
+            f"corner_orientation={self.corner_orientation.tolist()}, "
+            f"edge_permutation={self.edge_permutation.tolist()}, "
+            f"edge_orientation={self.edge_orientation.tolist()})"
+        )
+
+
+@lru_cache(maxsize=None)
+def get_move_cubes() -> Dict[str, CubieCube]:
+    """Every 3x3 move as the `CubieCube` it turns the solved cube into."""
+    move_table = get_move_table(3)
+    solved = np.repeat(np.arange(6, dtype=np.uint8), 9)
+    return {move: CubieCube.from_combinations(solved[move_table[move]]) for move in _possible_moves(3)}
+
+
+@lru_cache(maxsize=None)
+def _valid_centers() -> frozenset:
+    """Centers of the 24 whole cube rotations of the solved cube."""
+    move_cubes = get_move_cubes()
+    centers = {tuple(range(6))}
+    frontier = list(centers)
+    while frontier:
+        current = np.array(frontier.pop(), dtype=np.uint8)
+        for move in ("x", "y"):
+            child = tuple(current[move_cubes[move].centers].tolist())
+            if child not in centers:
+                centers.add(child)
+                frontier.append(child)
+    return frozenset(centers)
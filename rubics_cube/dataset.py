@@ -0,0 +1,185 @@
+import os
+import glob
+import numpy as np
+from functools import lru_cache
+from typing import Iterator, List, Optional, Tuple, Union
+
+from .cube import get_move_table, _possible_moves
+from .moves import MoveSequence, get_move_pruning
+
+Seed = Union[None, int, np.random.SeedSequence, np.random.Generator]
+
+
+@lru_cache(maxsize=None)
+def dataset_moves(size: int) -> Tuple[str, ...]:
+    """Moves that scramble a cube, the labels of a dataset are indices into them.
+
+    Whole cube rotations do not scramble a cube, so they are left out.
+    """
+    return tuple(move for move in _possible_moves(size) if move[0] not in "xyz")
+
+
+@lru_cache(maxsize=None)
+def _scramble_tables(size: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Permutations, inverse move indices and the allowed next moves of `dataset_moves`.
+
+    Returns:
+        tuple: (permutations, inverses, choices, counts) where the moves allowed
+            after move i (the last row is for the first move) are
+            choices[i, :counts[i]].
+    """
+    moves = dataset_moves(size)
+    move_table = get_move_table(size)
+    permutations = np.stack([move_table[move] for move in moves])
+    inverses = np.array([moves.index(MoveSequence([move]).inverse()[0]) for move in moves], dtype=np.intp)
+    allowed = get_move_pruning(moves)
+    counts = allowed.sum(axis=1)
+    choices = np.zeros(allowed.shape, dtype=np.intp)
+    for row, mask in enumerate(allowed):
+        choices[row, : counts[row]] = np.flatnonzero(mask)
+    for table in (permutations, inverses, choices, counts):
+        table.setflags(write=False)
+    return permutations, inverses, choices, counts
+
+
+def scramble_batches(
+    size: int = 3,
+    batch_size: int = 4096,
+    max_depth: int = 20,
+    seed: Seed = None,
+    avoid_cancelling: bool = True,
+    num_batches: Optional[int] = None,
+) -> Iterator[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+    """Yield batches of randomly scrambled states.
+
+    Every state is a random walk of 1 to `max_depth` moves from the solved
+    cube, the depth is drawn uniformly for every state. All states of a
+    batch are scrambled together, one vectorized gather per depth. The
+    stream only depends on `seed`, so separate streams (e.g. one per
+    worker, from `np.random.SeedSequence(seed).spawn(workers)`) never share
+    random numbers.
+
+    Args:
+        size (int): Size of the cubes.
+        batch_size (int): States per batch.
+        max_depth (int): Longest scramble.
+        seed (int | SeedSequence | Generator, optional): Seed of the stream,
+            a generator is used as it is.
+        avoid_cancelling (bool): Never follow a move with a move of the same
+            layer or with a commuting move out of order, see
+            `moves.get_move_pruning`, so the depth is closer to the real
+            distance from the solved cube.
+        num_batches (int, optional): Stop after this many batches, endless by default.
+
+    Yields:
+        tuple: (states, depths, moves) where states are encoded colors
+            (batch_size, 6*size*size) uint8, depths the scramble lengths
+            (batch_size,) uint8 and moves the index into `dataset_moves(size)`
+            of the move that undoes the last scramble move (batch_size,) uint16.
+    """
+    assert 1 <= max_depth < 256, "Depths are stored in a byte."
+    rng = seed if isinstance(seed, np.random.Generator) else np.random.default_rng(seed)
+    permutations, inverses, choices, counts = _scramble_tables(size)
+    num_moves = len(permutations)
+    solved = np.repeat(np.arange(6, dtype=np.uint8), size * size)
+
+    batches = 0
+    while num_batches is None or batches < num_batches:
+        # deepest first, so the states still being scrambled are always a prefix
+        depths = np.sort(rng.integers(1, max_depth + 1, size=batch_size))[::-1]
+        active = np.searchsorted(-depths, -np.arange(max_depth), side="left")
+        states = np.broadcast_to(solved, (batch_size, solved.size)).copy()
+        last = np.full(batch_size, num_moves, dtype=np.intp)
+        for step in range(max_depth):
+            count = active[step]
+            if avoid_cancelling:
+                row = last[:count]
+                moves = choices[row, (rng.random(count) * counts[row]).astype(np.intp)]
+            else:
+                moves = rng.integers(num_moves, size=count)
+            states[:count] = np.take_along_axis(states[:count], permutations[moves], axis=1)
+            last[:count] = moves
+
+        order = rng.permutation(batch_size)
+        yield states[order], depths[order].astype(np.uint8), inverses[last[order]].astype(np.uint16)
+        batches += 1
+
+
+def write_dataset(
+    directory: str,
+    num_states: int,
+    size: int = 3,
+    max_depth: int = 20,
+    seed: Seed = None,
+    avoid_cancelling: bool = True,
+    shard_size: int = 1 << 20,
+    batch_size: int = 1 << 14,
+) -> List[str]:
+    """Write scrambled states and their labels to sharded `.npy` files.
+
+    Every shard `states_00000.npy`, `depths_00000.npy` and `moves_00000.npy`
+    (see `scramble_batches` for their contents) is filled batch by batch
+    through a memory map, so memory use only depends on `batch_size` and
+    not on `num_states`. The files can be opened with
+    `np.load(path, mmap_mode="r")` or `load_shards`.
+
+    Args:
+        directory (str): Where the shards are written, made if missing.
+        num_states (int): Number of states in total.
+        size (int): Size of the cubes.
+        max_depth (int): Longest scramble.
+        seed (int | SeedSequence | Generator, optional): Seed of the stream.
+        avoid_cancelling (bool): See `scramble_batches`.
+        shard_size (int): States per shard, the last shard can be smaller.
+        batch_size (int): States generated at a time.
+
+    Returns:
+        list: Paths of the state shards.
+    """
+    os.makedirs(directory, exist_ok=True)
+    batch_size = min(batch_size, shard_size)
+    batches = scramble_batches(size, batch_size, max_depth, seed, avoid_cancelling)
+    num_stickers = 6 * size * size
+    paths = []
+    pending = None
+    for shard, start in enumerate(range(0, num_states, shard_size)):
+        count = min(shard_size, num_states - start)
+        name = f"{shard:05d}.npy"
+        arrays = [
+            np.lib.format.open_memmap(
+                os.path.join(directory, f"{kind}_{name}"), mode="w+", dtype=dtype, shape=shape
+            )
+            for kind, dtype, shape in (
+                ("states", np.uint8, (count, num_stickers)),
+                ("depths", np.uint8, (count,)),
+                ("moves", np.uint16, (count,)),
+            )
+        ]
+        filled = 0
+        while filled < count:
+            # what is left of a batch goes to the next shard
+            if pending is None:
+                pending = next(batches)
+            taken = min(count - filled, len(pending[0]))
+            for array, values in zip(arrays, pending):
+                array[filled : filled + taken] = values[:taken]
+            pending = tuple(values[taken:] for values in pending) if taken < len(pending[0]) else None
+            filled += taken
+        for array in arrays:
+            array.flush()
+        paths.append(arrays[0].filename)
+        del arrays
+    return paths
+
+
+def load_shards(directory: str) -> Iterator[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+    """Memory map the shards written by `write_dataset`, in order.
+
+    Yields:
+        tuple: (states, depths, moves) of every shard, read only memory maps.
+    """
+    for path in sorted(glob.glob(os.path.join(directory, "states_*.npy"))):
+        name = os.path.basename(path)[len("states_") :]
+        yield tuple(
+            np.load(os.path.join(directory, f"{kind}_{name}"), mmap_mode="r") for kind in ("states", "depths", "moves")
+        )
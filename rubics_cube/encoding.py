@@ -0,0 +1,127 @@
+import numpy as np
+from typing import Dict, Optional, Tuple
+
+from .cube import get_move_table
+
+# every color index (0-5) fits in 3 bits
+BITS_PER_STICKER = 3
+_BIT_WEIGHTS = np.array([4, 2, 1], dtype=np.uint8)
+
+
+def packed_length(size: int) -> int:
+    """Number of bytes of a packed state of a cube of the given size."""
+    return (6 * size * size * BITS_PER_STICKER + 7) // 8
+
+
+def pack_states(states: np.ndarray) -> np.ndarray:
+    """Pack encoded states into 3 bits per sticker.
+
+    Args:
+        states (np.array): Encoded colors. shape: (..., 6, n, n) or (..., 6*n*n)
+
+    Returns:
+        np.array: Packed bytes. shape: (..., packed_length(n))
+    """
+    states = np.asarray(states, dtype=np.uint8)
+    if states.ndim >= 3 and states.shape[-3] == 6 and states.shape[-2] == states.shape[-1]:
+        states = states.reshape(*states.shape[:-3], -1)
+    bits = (states[..., None] & _BIT_WEIGHTS) != 0
+    return np.packbits(bits.reshape(*states.shape[:-1], -1), axis=-1)
+
+
+def unpack_states(packed: np.ndarray, size: int) -> np.ndarray:
+    """Inverse of `pack_states`.
+
+    Args:
+        packed (np.array): Packed bytes. shape: (..., packed_length(size))
+        size (int): Size of the cube.
+
+    Returns:
+        np.array: Encoded colors. shape: (..., 6*size*size)
+    """
+    packed = np.asarray(packed, dtype=np.uint8)
+    num_stickers = 6 * size * size
+    bits = np.unpackbits(packed, axis=-1, count=num_stickers * BITS_PER_STICKER)
+    return bits.reshape(*packed.shape[:-1], num_stickers, BITS_PER_STICKER) @ _BIT_WEIGHTS
+
+
+def pack_state(state: np.ndarray) -> bytes:
+    """Pack a single encoded state into a hashable key."""
+    return pack_states(state).tobytes()
+
+
+def unpack_state(key: bytes, size: int) -> np.ndarray:
+    """Encoded flat state of a key made by `pack_state`."""
+    return unpack_states(np.frombuffer(key, dtype=np.uint8), size)
+
+
+class ZobristHasher:
+    def __init__(self, size: int, seed: int = 0):
+        """64 bit Zobrist hashes of encoded states.
+
+        The hash is the XOR of one random number per (sticker, color) pair.
+        A move only changes the stickers it moves, so `update` recomputes the
+        hash from those instead of all 6*n*n stickers.
+
+        Args:
+            size (int): Size of the cube.
+            seed (int): Seed of the random numbers, hashes are only comparable
+                between hashers with the same size and seed.
+        """
+        self.size = size
+        rng = np.random.default_rng(seed)
+        self.table = rng.integers(0, np.iinfo(np.uint64).max, size=(6 * size * size, 6), dtype=np.uint64, endpoint=True)
+        self._stickers = np.arange(6 * size * size)
+        self._flat_table = self.table.reshape(-1)
+        self._moved: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+
+    def _moved_stickers(self, move: str) -> Tuple[np.ndarray, np.ndarray]:
+        """Stickers a move reads before and after it, and their rows in the flat table."""
+        if move not in self._moved:
+            permutation = get_move_table(self.size)[move]
+            moved = np.flatnonzero(permutation != self._stickers)
+            # the old color of a moved sticker is removed and the color it receives is added
+            stickers = np.concatenate([moved, permutation[moved]])
+            self._moved[move] = (stickers, np.concatenate([moved, moved]) * 6)
+        return self._moved[move]
+
+    def hash(self, state: np.ndarray) -> int:
+        """Hash of an encoded flat state. shape: (6*n*n,)"""
+        return int(np.bitwise_xor.reduce(self._flat_table[self._stickers * 6 + state]))
+
+    def hash_states(self, states: np.ndarray) -> np.ndarray:
+        """Hashes of encoded flat states. shape: (N, 6*n*n) -> (N,)"""
+        return np.bitwise_xor.reduce(self._flat_table[self._stickers * 6 + states], axis=1)
+
+    def update(self, hash_value: int, state: np.ndarray, move: str) -> int:
+        """Hash of the state after a move.
+
+        Args:
+            hash_value (int): Hash of `state`.
+            state (np.array): Encoded flat state before the move.
+            move (str): The move.
+
+        Returns:
+            int: Hash of the state after the move.
+        """
+        stickers, rows = self._moved_stickers(move)
+        return hash_value ^ int(np.bitwise_xor.reduce(self._flat_table[rows + state[stickers]]))
+
+    def update_states(
+        self, hash_values: np.ndarray, states: np.ndarray, move: str, index: Optional[np.ndarray] = None
+    ) -> np.ndarray:
+        """Hashes of the states after the same move, see `update`.
+
+        Args:
+            hash_values (np.array): Hashes of the states. shape: (N,)
+            states (np.array): Encoded flat states before the move. shape: (M, 6*n*n)
+            move (str): The move.
+            index (np.array, optional): Rows of `states` to move, all of them
+                by default. Only the moved stickers of the rows are read.
+
+        Returns:
+            np.array: Hashes of the states after the move. shape: (N,)
+        """
+        stickers, rows = self._moved_stickers(move)
+        moved = states[:, stickers] if index is None else states[np.ix_(index, stickers)]
+        return hash_values ^ np.bitwise_xor.reduce(self._flat_table[rows + moved], axis=1)
@@ -1,45 +1,292 @@
+import os
+import time
+import heapq
+import itertools
+import multiprocessing
 import numpy as np
-from .cube import Cube
-from typing import Callable
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from functools import lru_cache
+from .cube import Cube, COLORS, get_move_table, encode_combinations, decode_combinations
+from .cubie import read_cubies, get_cubie_moves
+from .encoding import pack_state, unpack_state
+from .symmetry import Symmetry, _rotation_permutations
+from .moves import get_successor_moves
+from .stats import SearchStats
+from .cache import SolutionCache
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
 
-def same_color_amount(combinations: np.array) -> int:
+def batch_heuristic(function: Callable) -> Callable:
+    """Mark a heuristic that evaluates a batch of states in a single call.
+
+    Marked heuristics get encoded states, (6, n, n) or (N, 6, n, n), and
+    return an int for a single state and an array for a batch. Solvers score
+    all children of a node with one call to them. Unmarked heuristics are
+    called once per state with color letters, like before.
+    """
+    function.supports_batches = True
+    return function
+
+
+def evaluate_batch(heuristic: Callable, states: np.array) -> np.array:
+    """Evaluate a heuristic on a batch of states, one call if it supports batches.
+
+    Args:
+        heuristic (Callable): Heuristic function.
+        states (np.array): Encoded states. shape: (N, 6, n, n)
+
+    Returns:
+        np.array: Value of the heuristic for every state. shape: (N,)
+    """
+    if getattr(heuristic, "supports_batches", False):
+        return np.asarray(heuristic(states))
+    return np.array([heuristic(decode_combinations(state)) for state in states])
+
+
+def _as_batch(combinations: np.array) -> Tuple[np.array, bool]:
+    """Encoded states as a batch (N, 6, n, n) and whether a single state was given."""
+    codes = encode_combinations(combinations)
+    if codes.ndim == 3:
+        return codes[None], True
+    return codes, False
+
+
+@batch_heuristic
+def same_color_amount(combinations: np.array):
     """Sum of the largest amount of same colors on a face.
     On a 5x5x5 cube largest possible amount is 6*5*5 = 150.
     *bigger the better*
 
     Args:
-        combinations (np.array): A combination of a cube. shape: (6, n, n)
+        combinations (np.array): Color letters or encoded colors of a cube
+            (6, n, n) or a batch of cubes (N, 6, n, n).
 
     Returns:
-        int: Value of the heuristic.
+        int | np.array: Value of the heuristic.
     """
-    
-    # check if the colors are the same on the same face
-    same_color_amount = 0
-    for face in combinations:
-        value_counts = np.unique(face, return_counts=True)[1]
-        same_color_amount += np.max(value_counts)
+    codes, single = _as_batch(combinations)
+    count, _, rows, columns = codes.shape
+
+    # count every color on every face with a single bincount
+    faces = np.arange(count * 6, dtype=np.intp).reshape(count, 6, 1, 1)
+    counts = np.bincount(
+        (faces * len(COLORS) + codes).ravel(),
+        minlength=count * 6 * len(COLORS),
+    ).reshape(count, 6, len(COLORS))
+    same_color_amount = counts.max(axis=2).sum(axis=1)
 
     # but we need a function that returns a smaller value for a better solution
     # so we subtract the value from the maximum possible value
-    max_possible_value = 6*combinations.shape[1]*combinations.shape[2]
-    return max_possible_value - same_color_amount
+    max_possible_value = 6 * rows * columns
+    value = max_possible_value - same_color_amount
+    return int(value[0]) if single else value
+
+
+@lru_cache(maxsize=None)
+def _piece_distances() -> Tuple[np.array, np.array]:
+    """Fewest moves that bring a single 3x3 piece home, ignoring all other pieces.
+
+    Returns:
+        tuple: distance[piece, position, orientation] of the corners (8, 8, 3)
+            and of the edges (12, 12, 2).
+    """
+    moves = [tables for move, tables in get_cubie_moves().items() if move[0] not in "xyz"]
+    distances = []
+    for count, twists, table_index in ((8, 3, 0), (12, 2, 2)):
+        # where every move sends a piece and how much it twists it
+        targets = [np.argsort(tables[table_index]) for tables in moves]
+        twists_by_move = [tables[table_index + 1] for tables in moves]
+        distance = np.full((count, count, twists), 255, dtype=np.uint8)
+        for piece in range(count):
+            # moves are closed under inverses, so searching from home gives the distance to home
+            distance[piece, piece, 0] = 0
+            frontier = [(piece, 0)]
+            depth = 0
+            while frontier:
+                depth += 1
+                next_frontier = []
+                for position, orientation in frontier:
+                    for target, twist in zip(targets, twists_by_move):
+                        new_position = target[position]
+                        new_orientation = (orientation + twist[new_position]) % twists
+                        if distance[piece, new_position, new_orientation] == 255:
+                            distance[piece, new_position, new_orientation] = depth
+                            next_frontier.append((new_position, new_orientation))
+                frontier = next_frontier
+        distance.setflags(write=False)
+        distances.append(distance)
+    return tuple(distances)
+
 
+def _read_rotated_cubies(combinations: np.array):
+    """Cubies of every state seen from all 24 orientations, the goal is any rotation of the solved cube."""
+    codes, single = _as_batch(combinations)
+    assert codes.shape[-3:] == (6, 3, 3), "Cubie heuristics only support the 3x3 cube."
+    states = codes.reshape(-1, 54)[:, _rotation_permutations(3)]
+    return read_cubies(states), single
+
+
+@batch_heuristic
+def misplaced_cubies(combinations: np.array):
+    """Lower bound of the moves from the corners and edges that are not home.
+
+    A move changes at most 4 corners and 4 edges, so a cube with c wrong
+    corners and e wrong edges needs at least max(c / 4, e / 4) moves. The
+    value is the smallest over the 24 orientations of the cube. Admissible,
+    only for the 3x3.
+
+    Args:
+        combinations (np.array): Color letters or encoded colors of a cube
+            (6, 3, 3) or a batch of cubes (N, 6, 3, 3).
+
+    Returns:
+        int | np.array: Value of the heuristic.
+    """
+    (corner_permutation, corner_orientation, edge_permutation, edge_orientation), single = _read_rotated_cubies(combinations)
+    wrong_corners = ((corner_permutation != np.arange(8)) | (corner_orientation != 0)).sum(axis=-1)
+    wrong_edges = ((edge_permutation != np.arange(12)) | (edge_orientation != 0)).sum(axis=-1)
+    # ceil(x / 4)
+    value = np.maximum((wrong_corners + 3) // 4, (wrong_edges + 3) // 4).min(axis=-1)
+    return int(value[0]) if single else value
+
+
+@batch_heuristic
+def manhattan_distance(combinations: np.array):
+    """Lower bound of the moves from the distance of every piece to its home.
+
+    Every corner and edge is looked up in a table of the fewest moves that
+    bring it home with the right orientation. A move moves at most 4 corners
+    and 4 edges one step, so the sums divided by 4 are lower bounds. The
+    value is the smallest over the 24 orientations of the cube. Admissible,
+    at least as large as `misplaced_cubies`, only for the 3x3.
+
+    Args:
+        combinations (np.array): Color letters or encoded colors of a cube
+            (6, 3, 3) or a batch of cubes (N, 6, 3, 3).
+
+    Returns:
+        int | np.array: Value of the heuristic.
+    """
+    (corner_permutation, corner_orientation, edge_permutation, edge_orientation), single = _read_rotated_cubies(combinations)
+    corner_distances, edge_distances = _piece_distances()
+    corners = corner_distances[corner_permutation, np.arange(8), corner_orientation].sum(axis=-1, dtype=np.intp)
+    edges = edge_distances[edge_permutation, np.arange(12), edge_orientation].sum(axis=-1, dtype=np.intp)
+    value = np.maximum((corners + 3) // 4, (edges + 3) // 4).min(axis=-1)
+    return int(value[0]) if single else value
+
+
+def default_heuristic(size: int) -> Callable:
+    """Heuristic for cubes of the given size, `manhattan_distance` for the 3x3
+    and `same_color_amount`, which works on every size, otherwise."""
+    return manhattan_distance if size == 3 else same_color_amount
+
+
+class MaxHeuristic:
+    # batches are split up for the heuristics that do not support them
+    supports_batches = True
+
+    def __init__(self, *heuristics: Callable):
+        """Maximum of several heuristics.
+
+        The maximum of admissible heuristics is admissible and at least as
+        good as each of them, e.g. `MaxHeuristic(manhattan_distance,
+        load_pattern_databases(directory))`. Every heuristic is evaluated on
+        the whole batch at once when it supports batches.
+
+        Args:
+            heuristics (Callable): The heuristics.
+        """
+        assert len(heuristics) > 0, "At least one heuristic is needed."
+        self.heuristics = heuristics
+
+    def __call__(self, combinations: np.array):
+        """Evaluate a state (6, n, n) or a batch of states (N, 6, n, n).
+
+        Args:
+            combinations (np.array): Color letters or encoded colors.
+
+        Returns:
+            int | np.array: Largest value of the heuristics.
+        """
+        codes, single = _as_batch(combinations)
+        value = np.max([evaluate_batch(heuristic, codes) for heuristic in self.heuristics], axis=0)
+        return value[0].item() if single else value
+
+
+# rough bytes per state of a 3x3 search, for `AStarSolver(memory_limit=...)`
+_FRONTIER_NODE_BYTES = 400
+_CLOSED_NODE_BYTES = 300
 
 
 class AStarSolver():
-    def __init__(self, cube: Cube, heuristic: Callable):
+    def __init__(
+        self,
+        cube: Cube,
+        heuristic: Callable,
+        symmetry: Optional[Symmetry] = None,
+        weight: float = 1.0,
+        max_frontier: Optional[int] = None,
+        memory_limit: Optional[int] = None,
+    ):
         """Initialize the solver.
 
+        With an admissible heuristic like `manhattan_distance` the solution
+        of the default mode is the shortest. A `weight` above 1 orders the
+        search by f = g + weight * h, which expands far fewer nodes and
+        finds solutions at most `weight` times longer than the shortest. With
+        `max_frontier` or `memory_limit` the worst half of the frontier is
+        dropped whenever the budget is exceeded, so memory stays bounded but
+        the bound of the solution can get worse. `suboptimality_bound` is
+        the bound of the last solution, it is only valid for admissible
+        heuristics.
+
         Args:
-            combinations (np.array): A combination of a cube.
+            cube (Cube): The cube to solve.
+            heuristic (Callable): Heuristic function.
+            symmetry (Symmetry, optional): Treat symmetric states as the same
+                state in the closed set, see `symmetry.Symmetry`.
+            weight (float): Weight of the heuristic, at least 1.
+            max_frontier (int, optional): Number of states on the frontier.
+            memory_limit (int, optional): Estimated bytes of the frontier and
+                the closed set together.
         """
+        assert weight >= 1, "The weight should be at least 1."
         self.cube = cube
         self.heuristic = heuristic
+        self.symmetry = symmetry
+        self.weight = weight
+        self.max_frontier = max_frontier
+        self.memory_limit = memory_limit
+        # solution length / shortest solution length, at most
+        self.suboptimality_bound = np.inf
         self.possible_moves = cube.get_possible_moves() # possible moves are constant
 
         # lets remove rotational moves from the possible moves
         self.possible_moves = [move for move in self.possible_moves if not (("x" in move) or ("y" in move) or ("z" in move))]
+        # indices of the moves worth trying after every move, the last list is for the first move
+        self.successor_moves = get_successor_moves(tuple(self.possible_moves))
+        move_table = get_move_table(cube.size)
+        self.permutations = np.stack([move_table[move] for move in self.possible_moves])
+        # counters of the last search, replace it for progress reports, see `stats.SearchStats`
+        self.stats = SearchStats()
+        # solutions of states seen before, see `cache.SolutionCache`
+        self.cache: Optional[SolutionCache] = None
+        # checked periodically during a search, the search is cancelled when it returns True
+        self.should_stop: Optional[Callable[[], bool]] = None
+
+        # state with the smallest heuristic value of the last search, kept for anytime results
+        self.best_value = np.inf
+        self.best_state: Optional[Cube] = None
+        self.best_path: tuple = ()
+        # False when the last search returned the path to its best state instead of a solution
+        self.solved = False
+
+    @property
+    def nodes_expanded(self) -> int:
+        return self.stats.nodes_expanded
+
+    @property
+    def nodes_generated(self) -> int:
+        return self.stats.nodes_generated
     
     def make_str(self, combinations: np.array) -> str:
         """Make a string from the combinations.
@@ -53,52 +300,741 @@ class AStarSolver():
         return "".join(["".join(x_row) for face in combinations for x_row in face])
 
 
-    def solve(self) -> str:
+    def evaluate(self, state: np.array) -> float:
+        """Evaluate the heuristic on an encoded state.
+
+        Args:
+            state (np.array): Flat uint8 encoded state. shape: (6*n*n,)
+
+        Returns:
+            float: Value of the heuristic.
+        """
+        return self.evaluate_many(state[None])[0]
+
+    def evaluate_many(self, states: np.array) -> np.array:
+        """Evaluate the heuristic on encoded states, in one call if it supports batches.
+
+        Args:
+            states (np.array): Flat uint8 encoded states. shape: (N, 6*n*n)
+
+        Returns:
+            np.array: Value of the heuristic for every state. shape: (N,)
+        """
+        with self.stats.timer("heuristic"):
+            return evaluate_batch(self.heuristic, states.reshape(-1, 6, self.cube.size, self.cube.size))
+
+    @staticmethod
+    def is_solved_state(state: np.array) -> bool:
+        """Check if a flat encoded state is solved."""
+        faces = state.reshape(6, -1)
+        return bool(np.all(faces == faces[:, :1]))
+
+    def _cached_search(self, search: Callable, *args) -> tuple:
+        """Run `search(*args)` with `self.stats` running, through `self.cache` if there is one.
+
+        A cached cube is answered without searching, and the solution of a
+        search is added to the cache. The path returned by a search that
+        stopped early is not a solution and is not cached.
+        """
+        self.stats.start()
+        self.solved = True
+        try:
+            solution = None if self.cache is None else self.cache.get(self.cube)
+            if solution is None:
+                solution = search(*args)
+                if self.cache is not None and self.solved:
+                    self.cache.put(self.cube, solution)
+            return solution
+        finally:
+            self.stats.stop()
+
+    def _cached_child(self, child_states: np.array) -> Optional[Tuple[int, tuple]]:
+        """The child with the shortest cached solution, as (row, solution), if any is cached."""
+        if self.cache is None:
+            return None
+        with self.stats.timer("hashing"):
+            solutions = self.cache.get_states(child_states)
+        found = [(len(solution), row, solution) for row, solution in enumerate(solutions) if solution is not None]
+        if not found:
+            return None
+        _, row, solution = min(found)
+        return row, solution
+
+    @staticmethod
+    def reconstruct_path(parents: Dict[bytes, Tuple[Optional[bytes], Optional[str]]], key: bytes) -> tuple:
+        """Follow the parent pointers back to the initial state.
+
+        Args:
+            parents (dict): Maps a state key to its (parent key, move) pair.
+            key (bytes): Key of the last state of the path.
+
+        Returns:
+            tuple: The moves from the initial state to `key`.
+        """
+        path = []
+        parent_key, move = parents[key]
+        while parent_key is not None:
+            path.append(move)
+            parent_key, move = parents[parent_key]
+        return tuple(reversed(path))
+
+    def solve(self, time_limit: Optional[float] = None, max_nodes: Optional[int] = None, anytime: bool = False) -> tuple:
         """Solve the cube.
 
+        The open list is a binary heap ordered by (f, insertion order), so ties
+        are broken the same way as the original sorted queue. Stale heap entries
+        are skipped when popped instead of being removed (lazy deletion). States
+        are keyed by their 3 bit packed encoding (`encoding.pack_state`) in a
+        hashed closed set, the heap only holds packed states and a state is
+        unpacked again when it is expanded. Paths are rebuilt from parent
+        pointers only once a solution is found. With a `symmetry` the closed
+        set is keyed on canonical keys instead, the states in the heap are
+        not canonicalized so the moves of the path stay in the orientation of
+        the original cube.
+
+        Every expansion is O(log n) in the size of the frontier, no list is
+        re-sorted and no visited state is scanned.
+
+        Progress is reported through `self.stats`, the frontier is the heap
+        and the closed set is the expanded states.
+
+        With a `self.cache`, a cached cube is not searched at all, and the
+        search stops at the first expanded node with a cached child. The
+        solution is then the path to the child followed by its cached
+        solution, which is not necessarily the shortest.
+
+        The search stops early when the time or node budget runs out or when
+        `self.should_stop` returns True, they are checked before every
+        expansion. The expanded state with the smallest heuristic value is
+        kept in `best_state`, `best_value` and `best_path`, and `solved` tells
+        whether the result is a solution.
+
+        Args:
+            time_limit (float, optional): Seconds to search.
+            max_nodes (int, optional): Number of nodes to expand.
+            anytime (bool): Return the path to the best state found instead of
+                raising when the search stops early.
+
         Returns:
-            str: The solution.
+            tuple: The solution, or the path to the best state found with `anytime`.
         """
+        return self._cached_search(self._search, time_limit, max_nodes, anytime)
+
+    def _search(self, time_limit: Optional[float], max_nodes: Optional[int], anytime: bool) -> tuple:
+        stats = self.stats
+        self.best_value = np.inf
+        self.best_state = None
+        self.best_path = ()
+        self.suboptimality_bound = np.inf
         if self.cube.is_solved():
-            print("Cube is already solved!")
-            return ""
+            stats.improve(0)
+            self.best_value = 0
+            self.best_state = self.cube
+            self.suboptimality_bound = 1.0
+            return ()
+
+        deadline = None if time_limit is None else time.perf_counter() + time_limit
+        first_move = len(self.possible_moves)
+        weight = self.weight
 
         # current combinations of the cube
-        initial_combinations = self.cube.combinations.copy()
+        initial_state = encode_combinations(self.cube.combinations).reshape(-1)
+        initial_packed = pack_state(initial_state)
+        initial_key = initial_packed if self.symmetry is None else self.symmetry.canonical(initial_state)[0]
+        initial_value = self.evaluate(initial_state)
+
+        parents = {initial_key: (None, None)}
+        g_scores = {initial_key: 0}
+        closed = set()
+        counter = itertools.count()
+        # heap elements in the form of (f, insertion order, g, h, key, packed state, last move)
+        open_heap = [(weight * initial_value, next(counter), 0, initial_value, initial_key, initial_packed, first_move)]
+        best_key, best_packed = initial_key, initial_packed
+        self.best_value = initial_value
+        stats.improve(initial_value)
+        # smallest g + h of the pruned nodes, a lower bound of solutions through them
+        pruned_bound = np.inf
 
-        visited = [str(initial_combinations)]
-        queue = [(initial_combinations, (), self.heuristic(initial_combinations))]
-        # queue elements in the form of (combinations, path, value)
+        def finish(path: tuple) -> tuple:
+            # a solution not through a pruned node is at most `weight` times the shortest
+            self.suboptimality_bound = max(weight, len(path) / pruned_bound)
+            return path
 
-        print("current best cube value: ", queue[0][2])
+        while open_heap:
+            _, _, g, h, key, packed, last_move = heapq.heappop(open_heap)
+            # lazy deletion, a better path to this state was pushed later
+            if key in closed or g > g_scores[key]:
+                continue
+            if (max_nodes is not None and stats.nodes_expanded >= max_nodes) or self._interrupted(deadline):
+                break
+            closed.add(key)
+            stats.nodes_expanded += 1
+            if h < self.best_value:
+                self.best_value = h
+                best_key, best_packed = key, packed
+                stats.improve(h)
+            stats.tick(len(open_heap), len(closed))
+            with stats.timer("hashing"):
+                state = unpack_state(packed, self.cube.size)
 
+            if self.is_solved_state(state):
+                return finish(self.reconstruct_path(parents, key))
 
-        while queue:
-            # sort the queue by the value of the elements
-            
-            queue = sorted(queue, key=lambda x: len(x[1])+ x[2]) # length of the path + evaluation value
+            child_g = g + 1
+            successors = self.successor_moves[last_move]
+            with stats.timer("moves"):
+                child_states = state[self.permutations[successors]]
+            cached = self._cached_child(child_states)
+            if cached is not None:
+                row, solution = cached
+                # nothing is known about the cached part
+                return self.reconstruct_path(parents, key) + (self.possible_moves[successors[row]],) + solution
+            with stats.timer("hashing"):
+                child_packs = [pack_state(child_state) for child_state in child_states]
+                if self.symmetry is None:
+                    child_keys = child_packs
+                else:
+                    child_keys = [self.symmetry.canonical(child_state)[0] for child_state in child_states]
+            children = []
+            for row, (move_index, child_state, child_packed, child_key) in enumerate(
+                zip(successors, child_states, child_packs, child_keys)
+            ):
+                if child_key in closed or child_g >= g_scores.get(child_key, child_g + 1):
+                    continue
+                g_scores[child_key] = child_g
+                parents[child_key] = (key, self.possible_moves[move_index])
+                stats.nodes_generated += 1
 
-            # get the element with the lowest value
-            combinations, path, value = queue.pop(0)
+                if self.is_solved_state(child_state):
+                    return finish(self.reconstruct_path(parents, child_key))
+                children.append((row, child_key, child_packed, move_index))
 
-            # check if the cube is solved
-            new_cube = Cube.from_combinations(combinations)
+            # all new children are scored with a single call of the heuristic
+            if children:
+                child_values = self.evaluate_many(child_states[[row for row, _, _, _ in children]])
+                for (_, child_key, child_packed, move_index), child_value in zip(children, child_values):
+                    heapq.heappush(
+                        open_heap,
+                        (child_g + weight * child_value, next(counter), child_g, child_value, child_key, child_packed, move_index),
+                    )
+
+            if self._over_budget(len(open_heap), len(closed)):
+                open_heap, bound = self._prune(open_heap, closed, g_scores, parents)
+                pruned_bound = min(pruned_bound, bound)
+                if not open_heap:
+                    # the expanded states alone are over the budget
+                    break
+        else:
+            raise ValueError("Invalid cube!")
+
+        # the search stopped early
+        self.best_path = self.reconstruct_path(parents, best_key)
+        self.best_state = Cube(self.cube.size)
+        self.best_state.combinations = decode_combinations(unpack_state(best_packed, self.cube.size)).reshape(
+            6, self.cube.size, self.cube.size
+        )
+        self.solved = False
+        if anytime:
+            return self.best_path
+        raise ValueError("No solution found within the budget.")
+
+    def _over_budget(self, frontier_size: int, closed_size: int) -> bool:
+        """Whether the frontier or the estimated memory of the search is over its limit."""
+        if self.max_frontier is not None and frontier_size > self.max_frontier:
+            return True
+        if self.memory_limit is not None:
+            return frontier_size * _FRONTIER_NODE_BYTES + closed_size * _CLOSED_NODE_BYTES > self.memory_limit
+        return False
+
+    def _prune(self, open_heap: list, closed: set, g_scores: dict, parents: dict) -> Tuple[list, float]:
+        """Drop the worse half of the frontier, or as much of it as the memory limit needs.
+
+        Returns:
+            tuple: The new heap and the smallest g + h of the dropped nodes.
+        """
+        keep = len(open_heap) // 2
+        if self.memory_limit is not None:
+            room = (self.memory_limit - len(closed) * _CLOSED_NODE_BYTES) // _FRONTIER_NODE_BYTES
+            keep = max(0, min(keep, room // 2))
+        # a sorted list is a heap
+        open_heap.sort()
+        kept, dropped = open_heap[:keep], open_heap[keep:]
+        kept_keys = {entry[4] for entry in kept}
+        for _, _, _, _, key, _, _ in dropped:
+            # frontier states are nobody's parent, so they can be forgotten
+            if key not in kept_keys and key not in closed:
+                g_scores.pop(key, None)
+                parents.pop(key, None)
+        self.stats.nodes_pruned += len(dropped)
+        return kept, min(g + h for _, _, g, h, _, _, _ in dropped)
+
+    def _interrupted(self, deadline: Optional[float]) -> bool:
+        """Whether the time is up or the search was cancelled."""
+        return (deadline is not None and time.perf_counter() > deadline) or (
+            self.should_stop is not None and self.should_stop()
+        )
+
+
+class AnytimeAStarSolver(AStarSolver):
+    def __init__(
+        self,
+        cube: Cube,
+        heuristic: Callable,
+        symmetry: Optional[Symmetry] = None,
+        weights: Sequence[float] = (3.0, 2.0, 1.5, 1.25, 1.0),
+    ):
+        """Anytime repairing A* (ARA*): weighted A* searches with shrinking weights.
+
+        The first search uses the largest weight and finds a solution fast,
+        every following search uses the next weight and continues from the
+        states of the previous one instead of starting over. States whose
+        path got shorter after they were expanded are kept aside and put back
+        on the frontier before the next search. Every solution is at most
+        `suboptimality_bound` times longer than the shortest, the bound is
+        min(weight, length / smallest g + h of the frontier), so it can be
+        smaller than the weight. The search ends when the bound reaches 1.
+
+        Args:
+            cube (Cube): The cube to solve.
+            heuristic (Callable): Heuristic function, the bounds are only valid
+                for admissible ones.
+            symmetry (Symmetry, optional): See `AStarSolver`.
+            weights (list): Weights of the searches, decreasing and at least 1.
+        """
+        assert len(weights) > 0 and all(
+            weight >= next_weight >= 1 for weight, next_weight in zip(weights, [*weights[1:], 1])
+        ), "Weights should decrease and be at least 1."
+        super().__init__(cube, heuristic, symmetry, weight=weights[0])
+        self.weights = tuple(weights)
+        # (seconds, solution, bound) for every solution found by the last search
+        self.solutions: List[Tuple[float, tuple, float]] = []
+
+    def solve(self, time_limit: Optional[float] = None, max_nodes: Optional[int] = None, anytime: bool = False) -> tuple:
+        """Solve the cube, improving the solution until the budget runs out.
+
+        Args:
+            time_limit (float, optional): Seconds to search.
+            max_nodes (int, optional): Number of nodes to expand.
+            anytime (bool): When no solution was found in the budget, return
+                the path to the best state found instead of raising.
+
+        Returns:
+            tuple: The best solution found, see `solutions` and
+                `suboptimality_bound`.
+        """
+        return self._cached_search(self._improve, time_limit, max_nodes, anytime)
+
+    def _improve(self, time_limit: Optional[float], max_nodes: Optional[int], anytime: bool) -> tuple:
+        stats = self.stats
+        self.solutions = []
+        self.best_value = np.inf
+        self.best_state = None
+        self.best_path = ()
+        self.suboptimality_bound = np.inf
+        if self.cube.is_solved():
+            stats.improve(0)
+            self.best_value = 0
+            self.best_state = self.cube
+            self.suboptimality_bound = 1.0
+            return ()
+
+        deadline = None if time_limit is None else time.perf_counter() + time_limit
+        initial_state = encode_combinations(self.cube.combinations).reshape(-1)
+        initial_packed = pack_state(initial_state)
+        initial_key = initial_packed if self.symmetry is None else self.symmetry.canonical(initial_state)[0]
+        initial_value = self.evaluate(initial_state)
+
+        # every state seen: g, h, packed state and the last move of its path
+        g_scores = {initial_key: 0}
+        values = {initial_key: initial_value}
+        packed_states = {initial_key: initial_packed}
+        last_moves = {initial_key: len(self.possible_moves)}
+        parents = {initial_key: (None, None)}
+        # f of the states on the frontier, heap entries with another f are stale
+        frontier = {initial_key: None}
+        inconsistent = set()
+        counter = itertools.count()
+        best_key = initial_key
+        self.best_value = initial_value
+        stats.improve(initial_value)
+        goal_key, goal_g = None, np.inf
+        interrupted = False
+
+        for weight in self.weights:
+            self.weight = weight
+            # the frontier is ordered by the new weight, with the states that got shorter paths
+            for key in inconsistent:
+                frontier[key] = None
+            inconsistent = set()
+            for key in frontier:
+                frontier[key] = g_scores[key] + weight * values[key]
+            open_heap = [(f, next(counter), key) for key, f in frontier.items()]
+            heapq.heapify(open_heap)
+            closed = set()
+
+            while open_heap:
+                f, _, key = open_heap[0]
+                if frontier.get(key) != f:
+                    heapq.heappop(open_heap)
+                    continue
+                # nothing on the frontier can lead to a shorter solution at this weight
+                if goal_g <= f:
+                    break
+                if (max_nodes is not None and stats.nodes_expanded >= max_nodes) or self._interrupted(deadline):
+                    interrupted = True
+                    break
+                heapq.heappop(open_heap)
+                del frontier[key]
+                closed.add(key)
+                stats.nodes_expanded += 1
+                if values[key] < self.best_value:
+                    self.best_value = values[key]
+                    best_key = key
+                    stats.improve(values[key])
+                stats.tick(len(frontier), len(closed))
+
+                with stats.timer("hashing"):
+                    state = unpack_state(packed_states[key], self.cube.size)
+                child_g = g_scores[key] + 1
+                successors = self.successor_moves[last_moves[key]]
+                with stats.timer("moves"):
+                    child_states = state[self.permutations[successors]]
+                with stats.timer("hashing"):
+                    child_packs = [pack_state(child_state) for child_state in child_states]
+                    if self.symmetry is None:
+                        child_keys = child_packs
+                    else:
+                        child_keys = [self.symmetry.canonical(child_state)[0] for child_state in child_states]
+                unscored = []
+                for row, (move_index, child_state, child_packed, child_key) in enumerate(
+                    zip(successors, child_states, child_packs, child_keys)
+                ):
+                    if child_g >= g_scores.get(child_key, np.inf):
+                        continue
+                    g_scores[child_key] = child_g
+                    packed_states[child_key] = child_packed
+                    last_moves[child_key] = move_index
+                    parents[child_key] = (key, self.possible_moves[move_index])
+                    stats.nodes_generated += 1
+                    if self.is_solved_state(child_state):
+                        goal_key, goal_g = child_key, child_g
+                    elif child_key in closed:
+                        inconsistent.add(child_key)
+                    elif child_key in values:
+                        frontier[child_key] = child_g + weight * values[child_key]
+                        heapq.heappush(open_heap, (frontier[child_key], next(counter), child_key))
+                    else:
+                        unscored.append((row, child_key))
+
+                # new states are scored with a single call of the heuristic
+                if unscored:
+                    child_values = self.evaluate_many(child_states[[row for row, _ in unscored]])
+                    for (_, child_key), child_value in zip(unscored, child_values):
+                        values[child_key] = child_value
+                        frontier[child_key] = child_g + weight * child_value
+                        heapq.heappush(open_heap, (frontier[child_key], next(counter), child_key))
+
+            if goal_key is not None:
+                # the shortest solution goes through a state on the frontier or kept aside,
+                # and the weight only bounds the solution of a finished search
+                lower = min((g_scores[key] + values[key] for key in (*frontier, *inconsistent)), default=goal_g)
+                bound = min(self.suboptimality_bound, goal_g / lower if lower > 0 else np.inf)
+                if not interrupted:
+                    bound = min(bound, weight)
+                bound = max(float(bound), 1.0)
+                if not self.solutions or goal_g < len(self.solutions[-1][1]) or bound < self.solutions[-1][2]:
+                    self.solutions.append((stats.seconds, self.reconstruct_path(parents, goal_key), bound))
+                self.suboptimality_bound = bound
+                if self.suboptimality_bound <= 1:
+                    break
+            elif not open_heap and not interrupted:
+                raise ValueError("Invalid cube!")
+            if interrupted:
+                break
+
+        if self.solutions:
+            return self.solutions[-1][1]
+        self.best_path = self.reconstruct_path(parents, best_key)
+        self.best_state = Cube(self.cube.size)
+        self.best_state.combinations = decode_combinations(unpack_state(packed_states[best_key], self.cube.size)).reshape(
+            6, self.cube.size, self.cube.size
+        )
+        self.solved = False
+        if anytime:
+            return self.best_path
+        raise ValueError("No solution found within the budget.")
+
+
+class _SearchCancelled(Exception):
+    pass
+
+
+class IDAStarSolver(AStarSolver):
+    def __init__(self, cube: Cube, heuristic: Callable):
+        """Initialize the solver.
+
+        Iterative deepening A*: a series of depth-first searches bounded by
+        f = g + h, raising the bound to the smallest f that exceeded it after
+        every iteration. Only the current path is kept, so memory grows
+        linearly with the solution depth instead of with the number of states.
+
+        Args:
+            cube (Cube): The cube to solve.
+            heuristic (Callable): Heuristic function, same as for `AStarSolver`.
+        """
+        super().__init__(cube, heuristic)
+        # (threshold, nodes expanded) for every finished iteration
+        self.iterations = []
+
+    def search(self, state: np.array, path: list, g: int, threshold: float, last_move: int, value: float) -> float:
+        """Depth-first search bounded by `threshold`.
+
+        All children of a node are made with one gather and scored with one
+        call of the heuristic, children above the threshold are not entered.
+
+        Args:
+            state (np.array): Flat encoded state.
+            path (list): Indices of the moves made so far, the moves of the
+                solution are appended to it.
+            g (int): Number of moves made so far.
+            threshold (float): Bound of f = g + h.
+            last_move (int): Index of the last move, len(possible_moves) for none.
+            value (float): Value of the heuristic of `state`.
+
+        Returns:
+            float: -1 if a solution was found, the smallest f above the
+                threshold otherwise.
+        """
+        f = g + value
+        if f > threshold:
+            return f
+        if self.is_solved_state(state):
+            return -1
+        stats = self.stats
+        stats.nodes_expanded += 1
+        if value < stats.best_value:
+            stats.improve(value)
+        # the frontier of a depth-first search is the current path
+        stats.tick(g, 0)
+        if self.should_stop is not None and stats.nodes_expanded % 4096 == 0 and self.should_stop():
+            raise _SearchCancelled()
+
+        next_threshold = np.inf
+        # moves of the same layer and commuting moves in the wrong order are pruned
+        successors = self.successor_moves[last_move]
+        with stats.timer("moves"):
+            children = state[self.permutations[successors]]
+        cached = self._cached_child(children)
+        if cached is not None:
+            row, self._cached_suffix = cached
+            path.append(successors[row])
+            return -1
+        child_values = self.evaluate_many(children)
+        for move_index, child, child_value in zip(successors, children, child_values):
+            stats.nodes_generated += 1
+            if g + 1 + child_value > threshold:
+                next_threshold = min(next_threshold, g + 1 + child_value)
+                continue
+            path.append(move_index)
+            result = self.search(child, path, g + 1, threshold, move_index, child_value)
+            if result == -1:
+                return -1
+            path.pop()
+            next_threshold = min(next_threshold, result)
+        return next_threshold
+
+    def solve(self, max_iterations: Optional[int] = None) -> tuple:
+        """Solve the cube.
+
+        Progress is reported through `self.stats`, finished iterations are
+        also in `self.iterations`. With a `self.cache` the search stops at
+        the first node with a cached child, like `AStarSolver.solve`.
+
+        Args:
+            max_iterations (int, optional): Stop after this many thresholds.
+
+        Returns:
+            tuple: The solution.
+        """
+        self.iterations = []
+        return self._cached_search(self._iterate, max_iterations)
+
+    def _iterate(self, max_iterations: Optional[int]) -> tuple:
+        if self.cube.is_solved():
+            self.stats.improve(0)
+            return ()
+
+        state = encode_combinations(self.cube.combinations).reshape(-1)
+        # moves after the path when it ends at a cached state
+        self._cached_suffix = ()
+        path = []
+        value = self.evaluate(state)
+        threshold = value
+        while max_iterations is None or len(self.iterations) < max_iterations:
+            nodes_before = self.nodes_expanded
+            result = self.search(state, path, 0, threshold, len(self.possible_moves), value)
+            self.iterations.append((threshold, self.nodes_expanded - nodes_before))
+            if result == -1:
+                return tuple(self.possible_moves[move_index] for move_index in path) + self._cached_suffix
+            if result == np.inf:
+                raise ValueError("Invalid cube!")
+            threshold = result
+
+        raise ValueError(f"No solution found in {max_iterations} iterations.")
+
+
+# state of a worker process of ParallelIDAStarSolver, set once by _init_search_worker
+_search_worker = {}
+
+
+def _init_search_worker(solver: IDAStarSolver, first_solution):
+    solver.should_stop = lambda: first_solution.value < _search_worker["task"]
+    _search_worker["solver"] = solver
+    _search_worker["first_solution"] = first_solution
+
+
+def _search_task(task: int, prefix: Tuple[int, ...], threshold: float) -> Tuple[int, float, tuple, int, int]:
+    """Search the subtree below the moves of `prefix`, in a worker.
+
+    Returns:
+        tuple: The task, the result of `IDAStarSolver.search`, the moves of the
+            solution after the prefix, and the nodes expanded and generated.
+    """
+    solver = _search_worker["solver"]
+    first_solution = _search_worker["first_solution"]
+    _search_worker["task"] = task
+    solver.stats.start()
+    path = []
+    # a task after the first one that found a solution can not change the result
+    if first_solution.value < task:
+        return task, np.inf, (), 0, 0
+
+    state = encode_combinations(solver.cube.combinations).reshape(-1)
+    for move_index in prefix:
+        state = state[solver.permutations[move_index]]
+    last_move = prefix[-1] if prefix else len(solver.possible_moves)
+    try:
+        result = solver.search(state, path, len(prefix), threshold, last_move, solver.evaluate(state))
+    except _SearchCancelled:
+        result, path = np.inf, []
+    if result == -1:
+        with first_solution.get_lock():
+            first_solution.value = min(first_solution.value, task)
+    return task, result, tuple(path), solver.nodes_expanded, solver.nodes_generated
+
+
+class ParallelIDAStarSolver(IDAStarSolver):
+    def __init__(self, cube: Cube, heuristic: Callable, workers: Optional[int] = None, split_depth: int = 2):
+        """IDA* with the subtrees below the first moves searched on a pool of processes.
+
+        Every iteration the tree is expanded to `split_depth` in this
+        process, in the same order as `IDAStarSolver`, and every node at
+        that depth becomes a task. Tasks are searched in parallel, and when
+        one finds a solution the tasks after it are cancelled. Tasks before
+        it still finish, and the solution of the first task that has one is
+        returned, so the solution is the same as the serial solver's.
+
+        Args:
+            cube (Cube): The cube to solve.
+            heuristic (Callable): Heuristic function, it is sent to the
+                workers so it has to be picklable (no lambdas).
+            workers (int, optional): Number of processes, all cores by default.
+            split_depth (int): Depth of the tasks. With 2 there are a few
+                hundred tasks on a 3x3, enough to keep 16 cores busy.
+        """
+        super().__init__(cube, heuristic)
+        self.workers = workers or os.cpu_count() or 1
+        self.split_depth = split_depth
+
+    def _split(self, state: np.array, prefix: tuple, threshold: float, items: list) -> float:
+        """Collect the tasks below `state` in depth-first order.
+
+        Items are ("task", prefix) for nodes at `split_depth` and
+        ("solution", prefix) for solved nodes above it.
+
+        Returns:
+            float: Smallest f above the threshold of the nodes above `split_depth`.
+        """
+        if len(prefix) == self.split_depth:
+            items.append(("task", prefix))
+            return np.inf
+        f = len(prefix) + self.evaluate(state)
+        if f > threshold:
+            return f
+        if self.is_solved_state(state):
+            items.append(("solution", prefix))
+            return np.inf
+        self.stats.nodes_expanded += 1
+
+        next_threshold = np.inf
+        last_move = prefix[-1] if prefix else len(self.possible_moves)
+        for move_index in self.successor_moves[last_move]:
+            self.stats.nodes_generated += 1
+            child = state[self.permutations[move_index]]
+            next_threshold = min(next_threshold, self._split(child, prefix + (move_index,), threshold, items))
+        return next_threshold
+
+    def solve(self, max_iterations: Optional[int] = None) -> tuple:
+        """Solve the cube.
+
+        The counters of the workers are added to `self.stats` after every
+        task, the callback is called between tasks and iterations. The time
+        split and the best value only cover the work in this process. A
+        `self.cache` answers cached cubes and stores new solutions, the
+        workers do not look up the states they reach.
+
+        Args:
+            max_iterations (int, optional): Stop after this many thresholds.
+
+        Returns:
+            tuple: The solution.
+        """
+        self.iterations = []
+        return self._cached_search(self._iterate, max_iterations)
+
+    def _iterate(self, max_iterations: Optional[int]) -> tuple:
+        if self.cube.is_solved():
+            self.stats.improve(0)
+            return ()
 
-            if new_cube.is_solved():
-                return path
+        state = encode_combinations(self.cube.combinations).reshape(-1)
+        threshold = self.evaluate(state)
+        self.stats.improve(threshold)
+        # index of the first task that found a solution, shared with the workers
+        first_solution = multiprocessing.Value("q", 0)
+        with ProcessPoolExecutor(
+            max_workers=self.workers,
+            initializer=_init_search_worker,
+            initargs=(IDAStarSolver(self.cube, self.heuristic), first_solution),
+        ) as executor:
+            while max_iterations is None or len(self.iterations) < max_iterations:
+                nodes_before = self.nodes_expanded
+                items = []
+                next_threshold = self._split(state, (), threshold, items)
+                solutions = [i for i, (kind, _) in enumerate(items) if kind == "solution"]
+                first_solution.value = solutions[0] if solutions else len(items)
 
-            for move in self.possible_moves:
-                child_cube = Cube.from_combinations(combinations.copy())
-                child_cube.make_move(move)
-                new_combinations = child_cube.combinations
-                # check if the new combinations are already visited
-                if str(new_combinations) not in visited:
-                    visited.append(str(new_combinations))
-                    queue_element = (new_combinations.copy(), (*path, move), self.heuristic(new_combinations))
-                    queue.append(queue_element)
-                    
-                    if child_cube.is_solved():
-                        return queue_element[1]
+                futures = [
+                    executor.submit(_search_task, i, prefix, threshold)
+                    for i, (kind, prefix) in enumerate(items[: first_solution.value])
+                    if kind == "task"
+                ]
+                found = {i: items[i][1] for i in solutions}
+                for future in as_completed(futures):
+                    task, result, path, expanded, generated = future.result()
+                    self.stats.nodes_expanded += expanded
+                    self.stats.nodes_generated += generated
+                    self.stats.tick(len(futures), 0)
+                    if result == -1:
+                        found[task] = items[task][1] + path
+                    else:
+                        next_threshold = min(next_threshold, result)
 
-        raise ValueError("Invalid cube!")
+                self.iterations.append((threshold, self.nodes_expanded - nodes_before))
+                if found:
+                    return tuple(self.possible_moves[move_index] for move_index in found[min(found)])
+                if next_threshold == np.inf:
+                    raise ValueError("Invalid cube!")
+                threshold = next_threshold
 
+        raise ValueError(f"No solution found in {max_iterations} iterations.")
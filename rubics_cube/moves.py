@@ -0,0 +1,210 @@
+import re
+import numpy as np
+from functools import lru_cache
+from typing import Iterable, List, Tuple, Union
+
+from .cube import FACES, get_move_table
+
+# whole cube rotations have no double turn in the notation
+_MOVE_PATTERN = re.compile(r"^(m[1-9][0-9]*[FRU]|[ULFRBD]|[xyz](?!2))(2|')?$")
+# layers turning around the same axis commute with each other
+_AXES = {"U": "U", "D": "U", "y": "U", "L": "R", "R": "R", "x": "R", "F": "F", "B": "F", "z": "F"}
+_TURNS = {"": 1, "2": 2, "'": 3}
+_SUFFIXES = {1: "", 2: "2", 3: "'"}
+
+
+@lru_cache(maxsize=None)
+def _parse_move(move: str) -> Tuple[str, int]:
+    """Split a move into its layer and its number of clockwise quarter turns."""
+    match = _MOVE_PATTERN.match(move)
+    assert match is not None, f"Move {move} is invalid."
+    return match.group(1), _TURNS[match.group(2) or ""]
+
+
+def _axis(layer: str) -> str:
+    # slices are named after the face they are parallel to
+    return _AXES[layer[-1]]
+
+
+def _layer_order(layer: str) -> Tuple[int, int]:
+    """Order of the layers of the same axis in a simplified sequence: faces, slices, rotation."""
+    if layer in FACES:
+        return (0, FACES.index(layer))
+    if layer[0] == "m":
+        return (1, int(layer[1:-1]))
+    return (2, 0)
+
+
+def _format_move(layer: str, turns: int) -> List[str]:
+    # the notation has no double whole cube rotations
+    if turns == 2 and layer in "xyz":
+        return [layer, layer]
+    return [layer + _SUFFIXES[turns]]
+
+
+class MoveSequence:
+    def __init__(self, moves: Union[str, Iterable[str]] = ()):
+        """A sequence of moves in the notation of `Cube.get_possible_moves()`.
+
+        Args:
+            moves (str | list): Moves separated by whitespace, or a list of moves.
+        """
+        if isinstance(moves, str):
+            moves = moves.split()
+        self.moves = tuple(moves)
+        for move in self.moves:
+            _parse_move(move)
+        self._simplified = None
+
+    def __str__(self) -> str:
+        return " ".join(self.moves)
+
+    def __repr__(self) -> str:
+        return f"MoveSequence({str(self)!r})"
+
+    def __len__(self) -> int:
+        return len(self.moves)
+
+    def __iter__(self):
+        return iter(self.moves)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return MoveSequence(self.moves[index])
+        return self.moves[index]
+
+    def __add__(self, other: Union["MoveSequence", str, Iterable[str]]) -> "MoveSequence":
+        if not isinstance(other, MoveSequence):
+            other = MoveSequence(other)
+        return MoveSequence(self.moves + other.moves)
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, MoveSequence) and self.moves == other.moves
+
+    def __hash__(self) -> int:
+        return hash(self.moves)
+
+    def simplify(self) -> "MoveSequence":
+        """Cancel and merge moves of the same layer.
+
+        Moves of layers around the same axis commute, so a run of them is
+        merged layer by layer (`R L R'` becomes `L`) and written in a fixed
+        order. The result turns the cube the same way and is the normalized
+        text used to cache compiled sequences.
+        """
+        if self._simplified is not None:
+            return self._simplified
+        # runs of moves around the same axis, as (axis, {layer: quarter turns})
+        runs = []
+        for move in self.moves:
+            layer, turns = _parse_move(move)
+            axis = _axis(layer)
+            if not runs or runs[-1][0] != axis:
+                runs.append((axis, {}))
+            layers = runs[-1][1]
+            layers[layer] = (layers.get(layer, 0) + turns) % 4
+            if layers[layer] == 0:
+                del layers[layer]
+                # the moves around it may merge now
+                if not layers:
+                    runs.pop()
+
+        moves = []
+        for _, layers in runs:
+            for layer in sorted(layers, key=_layer_order):
+                moves.extend(_format_move(layer, layers[layer]))
+        self._simplified = MoveSequence(moves)
+        # simplifying twice gives the same sequence
+        self._simplified._simplified = self._simplified
+        return self._simplified
+
+    def inverse(self) -> "MoveSequence":
+        """The moves that undo this sequence."""
+        moves = []
+        for move in reversed(self.moves):
+            layer, turns = _parse_move(move)
+            moves.extend(_format_move(layer, 4 - turns))
+        return MoveSequence(moves)
+
+    def permutation(self, size: int) -> np.ndarray:
+        """The whole sequence as a single flat sticker permutation.
+
+        Compiled sequences are cached by their simplified text, so replaying
+        the same algorithm again costs a single gather.
+
+        Args:
+            size (int): Size of the cube.
+
+        Returns:
+            np.array: Read only permutation, same convention as `get_move_table`.
+        """
+        return compile_moves(str(self.simplify()), size)
+
+    def apply(self, state: np.ndarray, size: int) -> np.ndarray:
+        """State after the sequence, for a flat state (6*n*n,) or a batch (N, 6*n*n)."""
+        return state[..., self.permutation(size)]
+
+    def is_identity(self, size: int) -> bool:
+        """Check if the sequence moves every sticker back to where it was."""
+        permutation = self.permutation(size)
+        return bool(np.all(permutation == np.arange(permutation.size)))
+
+
+@lru_cache(maxsize=1024)
+def parse_moves(text: str) -> MoveSequence:
+    """Parse moves separated by whitespace, repeated texts reuse the same simplified sequence."""
+    return MoveSequence(text)
+
+
+@lru_cache(maxsize=1024)
+def compile_moves(text: str, size: int) -> np.ndarray:
+    """Compose moves separated by whitespace into one flat sticker permutation.
+
+    Args:
+        text (str): The moves.
+        size (int): Size of the cube.
+
+    Returns:
+        np.array: Read only permutation, same convention as `get_move_table`.
+    """
+    move_table = get_move_table(size)
+    permutation = np.arange(6 * size * size, dtype=np.intp)
+    for move in text.split():
+        assert move in move_table, f"Move {move} is invalid."
+        # applying p and then q is the same as applying p[q]
+        permutation = permutation[move_table[move]]
+    permutation.setflags(write=False)
+    return permutation
+
+
+@lru_cache(maxsize=None)
+def get_move_pruning(moves: Tuple[str, ...]) -> np.ndarray:
+    """Which moves may follow which in a search, for any cube size.
+
+    A move never follows a move of the same layer, they merge into one move
+    or cancel. Moves of layers around the same axis commute, so they are
+    only allowed in the order of `MoveSequence.simplify` (`L R` but not
+    `R L`). Inside a run around one axis every layer then appears at most
+    once, so the last move is enough history and every state is still
+    reached by a sequence that is at most as long as before.
+
+    Args:
+        moves (tuple): The moves the search uses.
+
+    Returns:
+        np.array: allowed[last move, next move], boolean of shape (M + 1, M).
+            The last row is for the first move, where everything is allowed.
+    """
+    layers = [_parse_move(move)[0] for move in moves]
+    allowed = np.ones((len(moves) + 1, len(moves)), dtype=bool)
+    for last, last_layer in enumerate(layers):
+        for following, layer in enumerate(layers):
+            if _axis(layer) == _axis(last_layer):
+                allowed[last, following] = _layer_order(layer) > _layer_order(last_layer)
+    allowed.setflags(write=False)
+    return allowed
+
+
+def get_successor_moves(moves: Tuple[str, ...]) -> List[List[int]]:
+    """`get_move_pruning` as lists of the indices of the allowed next moves, the last list is for the first move."""
+    return [list(np.flatnonzero(row)) for row in get_move_pruning(tuple(moves))]
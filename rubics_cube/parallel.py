@@ -0,0 +1,149 @@
+import os
+import time
+import signal
+import itertools
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .cube import Cube
+from .heuristics import AStarSolver, IDAStarSolver, MaxHeuristic, default_heuristic
+from .beam import BeamSearchSolver
+from .bidirectional import BidirectionalSolver
+from .reduction import ReductionSolver
+from .two_phase import TwoPhaseSolver
+from .pattern_database import load_pattern_databases
+from .cache import SolutionCache
+
+SOLVERS: Dict[str, Callable] = {
+    "astar": AStarSolver,
+    "idastar": IDAStarSolver,
+    "beam": BeamSearchSolver,
+    "bidirectional": lambda cube, heuristic: BidirectionalSolver(cube),
+    "two-phase": lambda cube, heuristic: TwoPhaseSolver(cube),
+    "reduction": lambda cube, heuristic: ReductionSolver(cube),
+}
+
+# state of a worker process, set once by _init_worker
+_worker = {}
+
+
+class JobTimeout(Exception):
+    pass
+
+
+def _raise_timeout(signum, frame):
+    raise JobTimeout()
+
+
+def _init_worker(
+    size: int, solver: str, pattern_directory: Optional[str], timeout: Optional[float], cache_path: Optional[str]
+):
+    """Load the heuristic once per worker, pattern databases are memory mapped and shared between workers."""
+    _worker["size"] = size
+    _worker["solver"] = SOLVERS[solver]
+    _worker["heuristic"] = default_heuristic(size)
+    if pattern_directory is not None:
+        _worker["heuristic"] = MaxHeuristic(_worker["heuristic"], load_pattern_databases(pattern_directory))
+    _worker["timeout"] = timeout
+    # every worker has its own memory cache in front of the shared database
+    _worker["cache"] = None if cache_path is None else SolutionCache(size, path=cache_path)
+    if timeout is not None and hasattr(signal, "SIGALRM"):
+        signal.signal(signal.SIGALRM, _raise_timeout)
+
+
+def _solve_one(index: int, scramble: str) -> dict:
+    result = {"index": index, "scramble": scramble}
+    start = time.perf_counter()
+    timeout = _worker["timeout"]
+    # per job timeouts use an alarm, so they are only available where SIGALRM is
+    alarm = timeout is not None and hasattr(signal, "SIGALRM")
+    try:
+        cube = Cube(_worker["size"])
+        cube.make_moves(scramble)
+        if alarm:
+            signal.setitimer(signal.ITIMER_REAL, timeout)
+        solver = _worker["solver"](cube, _worker["heuristic"])
+        cache = _worker["cache"]
+        if cache is not None and hasattr(solver, "cache"):
+            # the solver also looks up the states it reaches
+            solver.cache = cache
+            solution = solver.solve()
+        elif cache is not None:
+            solution = cache.solve(cube, solver)
+        else:
+            solution = solver.solve()
+        if alarm:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+        result["solution"] = " ".join(solution)
+        result["length"] = len(solution)
+    except JobTimeout:
+        result["error"] = "timeout"
+    except (AssertionError, ValueError) as error:
+        result["error"] = str(error)
+    finally:
+        if alarm:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+    result["seconds"] = round(time.perf_counter() - start, 6)
+    return result
+
+
+def _solve_chunk(jobs: List[Tuple[int, str]]) -> List[dict]:
+    return [_solve_one(index, scramble) for index, scramble in jobs]
+
+
+def solve_many(
+    scrambles: Iterable[str],
+    size: int = 3,
+    solver: str = "two-phase",
+    pattern_directory: Optional[str] = None,
+    workers: Optional[int] = None,
+    timeout: Optional[float] = None,
+    chunk_size: int = 1,
+    cache_path: Optional[str] = None,
+) -> Iterator[dict]:
+    """Solve many scrambles on a pool of processes.
+
+    Scrambles are read lazily and only a few chunks per worker are queued
+    at a time, so the input can be a file or a stream of any length.
+    Results are yielded in the order they finish.
+
+    Args:
+        scrambles (Iterable[str]): Moves separated by whitespace, blank
+            scrambles are skipped but still counted in the index.
+        size (int): Size of the cubes.
+        solver (str): One of `SOLVERS`.
+        pattern_directory (str, optional): Pattern databases of the 3x3, see
+            `load_pattern_databases`. The heuristic is the maximum of them and
+            `default_heuristic(size)`, which is used alone without them.
+        workers (int, optional): Number of processes, all cores by default.
+        timeout (float, optional): Seconds to solve a single scramble.
+        chunk_size (int): Scrambles sent to a worker at once.
+        cache_path (str, optional): Sqlite database of solutions shared by
+            the workers and later runs, see `cache.SolutionCache`. Repeated
+            and rotated scrambles are answered from it.
+
+    Yields:
+        dict: "index" (position in `scrambles`), "scramble", "seconds" and
+            either "solution" and "length" or "error".
+    """
+    assert solver in SOLVERS, f"Solver {solver} is invalid."
+    assert pattern_directory is None or size == 3, "Pattern databases only support the 3x3 cube."
+    workers = workers or os.cpu_count() or 1
+    jobs = ((index, scramble.strip()) for index, scramble in enumerate(scrambles) if scramble.strip())
+    chunks = iter(lambda: list(itertools.islice(jobs, chunk_size)), [])
+
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=_init_worker,
+        initargs=(size, solver, pattern_directory, timeout, cache_path),
+    ) as executor:
+        pending = set()
+        for chunk in itertools.islice(chunks, 2 * workers):
+            pending.add(executor.submit(_solve_chunk, chunk))
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield from future.result()
+                chunk = next(chunks, None)
+                if chunk is not None:
+                    pending.add(executor.submit(_solve_chunk, chunk))
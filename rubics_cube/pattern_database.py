@@ -0,0 +1,302 @@
+import os
+import struct
+import numpy as np
+from math import factorial
+from typing import Dict, Iterable, Optional, Sequence, Tuple
+
+from .cube import get_move_table, encode_combinations, _possible_moves
+from .cubie import CORNERS, EDGES, read_cubies, get_cubie_moves
+
+# Korf's split: all corners and two groups of six edges
+DEFAULT_PATTERNS = {
+    "corners": ("corners", tuple(range(8))),
+    "edges_a": ("edges", tuple(range(6))),
+    "edges_b": ("edges", tuple(range(6, 12))),
+}
+
+_MAGIC = b"RCUBEPDB"
+_VERSION = 1
+# magic, version, kind, number of pieces, pieces, number of entries, padding to 64 bytes
+_HEADER = struct.Struct("<8sHBB12sQ32x")
+_KINDS = ("corners", "edges")
+_UNVISITED = 255
+_CHUNK_SIZE = 1 << 20
+
+
+class PatternDatabase:
+    def __init__(self, kind: str, pieces: Sequence[int], table: np.ndarray, path: Optional[str] = None):
+        """Distances from a subset of the pieces of a 3x3 to the solved cube.
+
+        The state of the pattern is the position and orientation of the
+        tracked pieces only, so its distance is a lower bound of the number of
+        moves needed to solve the cube. Distances are stored nibble packed,
+        two entries per byte.
+
+        Args:
+            kind (str): "corners" or "edges".
+            pieces (list): Indices of the tracked pieces in `cubie.CORNERS` or `cubie.EDGES`.
+            table (np.array): Packed distances, usually a `np.memmap`.
+            path (str, optional): File the table was loaded from.
+        """
+        assert kind in _KINDS, f"Kind {kind} is invalid."
+        self.kind = kind
+        self.pieces = tuple(int(piece) for piece in pieces)
+        self.table = table
+        self.path = path
+
+        self.num_positions = len(CORNERS) if kind == "corners" else len(EDGES)
+        self.orientation_base = 3 if kind == "corners" else 2
+        assert 0 < len(self.pieces) <= self.num_positions, "Invalid number of pieces."
+        assert len(set(self.pieces)) == len(self.pieces), "Pieces should be unique."
+        # the orientation of the last piece follows from the others when every piece is tracked
+        tracks_all = len(self.pieces) == self.num_positions
+        self.orientation_digits = len(self.pieces) - 1 if tracks_all else len(self.pieces)
+        self.num_orientations = self.orientation_base**self.orientation_digits
+        num_permutations = factorial(self.num_positions) // factorial(self.num_positions - len(self.pieces))
+        self.num_entries = num_permutations * self.num_orientations
+
+    def __reduce__(self):
+        # a memory mapped table is opened again instead of copied to other processes
+        if self.path is not None:
+            return (PatternDatabase.load, (self.path,))
+        return (PatternDatabase, (self.kind, self.pieces, np.asarray(self.table)))
+
+    def encode(self, positions: np.ndarray, orientations: np.ndarray) -> np.ndarray:
+        """Index of pattern states.
+
+        Args:
+            positions (np.array): Position of every tracked piece. shape: (N, k)
+            orientations (np.array): Orientation of every tracked piece. shape: (N, k)
+
+        Returns:
+            np.array: Indices into the table. shape: (N,)
+        """
+        positions = positions.astype(np.int64)
+        num_pieces = positions.shape[1]
+        # rank of the partial permutation in a mixed radix system
+        index = np.zeros(positions.shape[0], dtype=np.int64)
+        for i in range(num_pieces):
+            smaller_before = np.sum(positions[:, :i] < positions[:, i : i + 1], axis=1)
+            index = index * (self.num_positions - i) + positions[:, i] - smaller_before
+        for i in range(self.orientation_digits):
+            index = index * self.orientation_base + orientations[:, i]
+        return index
+
+    def decode(self, index: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Inverse of `encode`."""
+        index = index.astype(np.int64)
+        num_pieces = len(self.pieces)
+        orientations = np.zeros((index.shape[0], num_pieces), dtype=np.int64)
+        for i in reversed(range(self.orientation_digits)):
+            orientations[:, i] = index % self.orientation_base
+            index = index // self.orientation_base
+        if self.orientation_digits < num_pieces:
+            orientations[:, -1] = -orientations[:, :-1].sum(axis=1) % self.orientation_base
+
+        digits = np.zeros((index.shape[0], num_pieces), dtype=np.int64)
+        for i in reversed(range(num_pieces)):
+            digits[:, i] = index % (self.num_positions - i)
+            index = index // (self.num_positions - i)
+
+        positions = np.zeros_like(digits)
+        free = np.ones((index.shape[0], self.num_positions), dtype=bool)
+        rows = np.arange(index.shape[0])
+        for i in range(num_pieces):
+            # the digit is the rank of the position among the free positions
+            positions[:, i] = np.argmax(np.cumsum(free, axis=1) > digits[:, i : i + 1], axis=1)
+            free[rows, positions[:, i]] = False
+        return positions, orientations
+
+    def index_of(self, states: np.ndarray) -> np.ndarray:
+        """Table indices of encoded 3x3 states. shape: (N, 54) -> (N,)"""
+        corner_permutation, corner_orientation, edge_permutation, edge_orientation = read_cubies(states)
+        if self.kind == "corners":
+            permutation, orientation = corner_permutation, corner_orientation
+        else:
+            permutation, orientation = edge_permutation, edge_orientation
+        # where every piece is, instead of which piece is where
+        location = np.argsort(permutation, axis=1)[:, self.pieces]
+        return self.encode(location, np.take_along_axis(orientation, location, axis=1))
+
+    def lookup(self, index: np.ndarray) -> np.ndarray:
+        """Distances stored at the given indices."""
+        packed = self.table[index >> 1]
+        return (packed >> ((index & 1) << 2).astype(np.uint8)) & 0xF
+
+    def distance(self, states: np.ndarray) -> np.ndarray:
+        """Lower bound of the distance of encoded 3x3 states. shape: (N, 54) -> (N,)"""
+        return self.lookup(self.index_of(states))
+
+    @classmethod
+    def build(cls, kind: str, pieces: Sequence[int], verbose: bool = False) -> "PatternDatabase":
+        """Build a table with a breadth first search from the solved cube.
+
+        Every move of `Cube.get_possible_moves()` except whole cube rotations
+        counts as one move, and the 24 rotations of the solved cube are all
+        distance zero. The frontier is expanded in chunks, so apart from the
+        byte per entry used while building, memory stays bounded.
+
+        Args:
+            kind (str): "corners" or "edges".
+            pieces (list): Indices of the tracked pieces.
+            verbose (bool): Print the number of states found at every depth.
+
+        Returns:
+            PatternDatabase: The database, kept in memory.
+        """
+        database = cls(kind, pieces, np.zeros(0, dtype=np.uint8))
+        cubie_moves = get_cubie_moves()
+        moves = [move for move in _possible_moves(3) if move[0] not in "xyz"]
+        offset = 0 if kind == "corners" else 2
+        # piece at position p goes to new_positions[m, p] and gains orientation_deltas[m, new position]
+        new_positions = np.stack([np.argsort(cubie_moves[move][offset]) for move in moves])
+        orientation_deltas = np.stack([cubie_moves[move][offset + 1] for move in moves]).astype(np.int64)
+
+        distances = np.full(database.num_entries, _UNVISITED, dtype=np.uint8)
+        distances[database.index_of(_solved_rotations())] = 0
+        depth = 0
+        while True:
+            found = 0
+            for start in range(0, database.num_entries, _CHUNK_SIZE):
+                frontier = start + np.flatnonzero(distances[start : start + _CHUNK_SIZE] == depth)
+                if frontier.size == 0:
+                    continue
+                positions, orientations = database.decode(frontier)
+                for new_position, orientation_delta in zip(new_positions, orientation_deltas):
+                    moved = new_position[positions]
+                    turned = (orientations + orientation_delta[moved]) % database.orientation_base
+                    children = database.encode(moved, turned)
+                    children = children[distances[children] == _UNVISITED]
+                    distances[children] = depth + 1
+                    found += np.unique(children).size
+            if verbose:
+                print("depth:", depth + 1, "new states:", found)
+            if found == 0:
+                break
+            depth += 1
+        assert depth < 16, "Distances do not fit in a nibble."
+
+        if distances.size % 2:
+            distances = np.append(distances, np.uint8(0))
+        database.table = distances[0::2] | (distances[1::2] << 4)
+        return database
+
+    def save(self, path: str):
+        """Write the table to a file that `load` can memory map."""
+        header = _HEADER.pack(
+            _MAGIC,
+            _VERSION,
+            _KINDS.index(self.kind),
+            len(self.pieces),
+            bytes(self.pieces).ljust(12, b"\0"),
+            self.num_entries,
+        )
+        with open(path, "wb") as file:
+            file.write(header)
+            np.asarray(self.table, dtype=np.uint8).tofile(file)
+
+    @classmethod
+    def load(cls, path: str) -> "PatternDatabase":
+        """Memory map a table written by `save`.
+
+        The table is opened read only, so every process that loads the same
+        file shares one copy through the page cache.
+        """
+        with open(path, "rb") as file:
+            magic, version, kind, num_pieces, pieces, num_entries = _HEADER.unpack(file.read(_HEADER.size))
+        assert magic == _MAGIC, f"{path} is not a pattern database."
+        assert version == _VERSION, f"Unsupported pattern database version {version}."
+        table = np.memmap(path, dtype=np.uint8, mode="r", offset=_HEADER.size)
+        database = cls(_KINDS[kind], tuple(pieces[:num_pieces]), table, path=path)
+        assert database.num_entries == num_entries, f"{path} does not match its header."
+        return database
+
+
+def _solved_rotations() -> np.ndarray:
+    """The 24 whole cube rotations of the solved 3x3, encoded. shape: (24, 54)"""
+    move_table = get_move_table(3)
+    states = {np.repeat(np.arange(6, dtype=np.uint8), 9).tobytes()}
+    frontier = list(states)
+    while frontier:
+        key = frontier.pop()
+        state = np.frombuffer(key, dtype=np.uint8)
+        for move in ("x", "y"):
+            child = state[move_table[move]].tobytes()
+            if child not in states:
+                states.add(child)
+                frontier.append(child)
+    return np.stack([np.frombuffer(key, dtype=np.uint8) for key in sorted(states)])
+
+
+class PatternDatabaseHeuristic:
+    # solvers pass all children of a node at once
+    supports_batches = True
+
+    def __init__(self, databases: Iterable[PatternDatabase]):
+        """Maximum of several pattern databases, usable as a solver heuristic.
+
+        The maximum of admissible heuristics is admissible, so with this
+        heuristic `AStarSolver` and `IDAStarSolver` return optimal solutions.
+
+        Args:
+            databases (list): Pattern databases of the 3x3.
+        """
+        self.databases = list(databases)
+
+    def __call__(self, combinations: np.array):
+        """Evaluate a state (6, 3, 3) or a batch of states (N, 6, 3, 3).
+
+        Args:
+            combinations (np.array): Color letters or encoded colors.
+
+        Returns:
+            int | np.array: Lower bound of the number of moves to solve the cube.
+        """
+        codes = encode_combinations(combinations)
+        assert codes.shape[-3:] == (6, 3, 3), "Pattern databases only support the 3x3 cube."
+        states = codes.reshape(-1, 54)
+        value = np.max([database.distance(states) for database in self.databases], axis=0)
+        if codes.ndim == 3:
+            return int(value[0])
+        return value
+
+
+def build_pattern_databases(
+    directory: str,
+    patterns: Dict[str, Tuple[str, Sequence[int]]] = DEFAULT_PATTERNS,
+    verbose: bool = False,
+):
+    """Build pattern databases and write them to `directory` as `<name>.pdb`.
+
+    Building the default corner and edge databases takes tens of minutes and
+    needs about a byte per entry (around 90 MB for the corners) while it
+    runs, it only has to be done once.
+
+    Args:
+        directory (str): Output directory, created if needed.
+        patterns (dict): Maps a name to a (kind, pieces) pair.
+        verbose (bool): Print the progress of the searches.
+    """
+    os.makedirs(directory, exist_ok=True)
+    for name, (kind, pieces) in patterns.items():
+        if verbose:
+            print("building", name)
+        PatternDatabase.build(kind, pieces, verbose=verbose).save(os.path.join(directory, f"{name}.pdb"))
+
+
+def load_pattern_databases(
+    directory: str,
+    patterns: Iterable[str] = tuple(DEFAULT_PATTERNS),
+) -> PatternDatabaseHeuristic:
+    """Memory map pattern databases written by `build_pattern_databases`.
+
+    Args:
+        directory (str): Directory of the `.pdb` files.
+        patterns (list): Names of the databases to load.
+
+    Returns:
+        PatternDatabaseHeuristic: Heuristic using all of the loaded databases.
+    """
+    return PatternDatabaseHeuristic(
+        PatternDatabase.load(os.path.join(directory, f"{name}.pdb")) for name in patterns
+    )
@@ -0,0 +1,469 @@
+import numpy as np
+from typing import Dict, List, Optional, Tuple
+
+from .cube import Cube, get_move_table, encode_combinations, decode_combinations
+from .cubie import CubieCube, sticker_positions, _parity
+from .moves import MoveSequence
+from .two_phase import TwoPhaseSolver
+
+
+class _Orbit:
+    def __init__(self, pieces: np.ndarray, permutations: Dict[str, np.ndarray], destinations: Dict[str, np.ndarray]):
+        """Pieces that the moves only permute among themselves, e.g. the 24 x-centers of a big cube.
+
+        Every piece can be sent to every other position of the orbit, in a
+        single orientation, so a piece is fully described by its position.
+        Pieces are cycled with pure 3-cycles: a commutator that moves three
+        pieces of the orbit and nothing else, conjugated by setup moves that
+        bring any three positions to the ones it cycles.
+
+        Args:
+            pieces (np.array): Sticker indices of every piece, ordered so that a
+                move sends the i-th sticker of a piece to the i-th sticker of
+                another piece. shape: (P, stickers per piece)
+            permutations (dict): Flat sticker permutation of every move.
+            destinations (dict): Where a move sends the sticker at every index.
+        """
+        self.pieces = pieces
+        self.permutations = permutations
+        count = len(pieces)
+        position = np.full(len(next(iter(destinations.values()))), -1, dtype=np.intp)
+        position[pieces[:, 0]] = np.arange(count)
+        self.position = position
+        self.stickers = np.zeros(len(position), dtype=bool)
+        self.stickers[pieces.reshape(-1)] = True
+        # actions[move][p] is the position the piece at p is moved to, for the moves that move the orbit
+        self.actions = {}
+        for move, destination in destinations.items():
+            action = position[destination[pieces[:, 0]]]
+            if np.any(action != np.arange(count)):
+                self.actions[move] = action
+        self._setups = None
+
+    def _commutator(self) -> Tuple[MoveSequence, Tuple[int, int, int]]:
+        """A commutator [A, f X f'] that cycles exactly three pieces of the orbit.
+
+        A is a slice turn through the orbit and f X f' a quarter turn
+        conjugated by a face turn, their supports then usually share a single
+        piece. The candidates are checked on the sticker permutations.
+
+        Returns:
+            tuple: The moves and the cycle (a, b, c), the piece at a moves to b,
+                b to c and c to a.
+        """
+        quarter_turns = [move for move in self.actions if move[-1] not in "2'"]
+        slices = [move for move in quarter_turns if move[0] == "m"]
+        faces = [move for move in self.permutations if move[0] in "ULFRBD" and move[-1] != "2"]
+        identity = np.arange(len(self.position))
+        for first in slices:
+            for face in faces:
+                for middle in quarter_turns:
+                    if middle.rstrip("'") == face.rstrip("'"):
+                        continue
+                    conjugate = MoveSequence([face, middle]) + MoveSequence([face]).inverse()
+                    moves = MoveSequence([first]) + conjugate + MoveSequence([first]).inverse() + conjugate.inverse()
+                    permutation = identity
+                    for move in moves:
+                        permutation = permutation[self.permutations[move]]
+                    support = np.flatnonzero(permutation != identity)
+                    if len(support) != 3 * self.pieces.shape[1] or not np.all(self.stickers[support]):
+                        continue
+                    destination = np.argsort(permutation)
+                    start = int(self.position[support[0]])
+                    second = int(self.position[destination[self.pieces[start, 0]]])
+                    third = int(self.position[destination[self.pieces[second, 0]]])
+                    return moves, (start, second, third)
+        raise ValueError("No 3-cycle found for an orbit.")
+
+    def _build_setups(self):
+        """Breadth first search for the shortest setup of every ordered triple of positions.
+
+        Setup s of the triple (a, b, c) moves the pieces at a, b and c to the
+        cycle of the commutator, or of its inverse, so s, the commutator and
+        the inverse of s together move a to b, b to c and c to a.
+        """
+        count = len(self.pieces)
+        moves = list(self.actions)
+        inverse_actions = [np.argsort(self.actions[move]) for move in moves]
+        self._commutator_moves, (a, b, c) = self._commutator()
+        self._setup_moves = moves
+        self._distance = np.full(count ** 3, -1, dtype=np.int16)
+        self._first_move = np.zeros(count ** 3, dtype=np.int16)
+        self._next = np.zeros(count ** 3, dtype=np.int32)
+        self._inverse = np.zeros(count ** 3, dtype=bool)
+
+        # the cycle of the commutator and of its inverse, from every start
+        starts = np.array([
+            (a * count + b) * count + c, (b * count + c) * count + a, (c * count + a) * count + b,
+            (a * count + c) * count + b, (c * count + b) * count + a, (b * count + a) * count + c,
+        ])
+        self._distance[starts] = 0
+        self._inverse[starts[3:]] = True
+        frontier = starts
+        distance = 0
+        while frontier.size:
+            distance += 1
+            first, second, third = frontier // (count * count), frontier // count % count, frontier % count
+            found = []
+            for index, inverse_action in enumerate(inverse_actions):
+                # the triples this move sends to the frontier
+                codes = (inverse_action[first] * count + inverse_action[second]) * count + inverse_action[third]
+                new = self._distance[codes] == -1
+                codes, rows = np.unique(codes[new], return_index=True)
+                self._distance[codes] = distance
+                self._first_move[codes] = index
+                self._next[codes] = frontier[new][rows]
+                self._inverse[codes] = self._inverse[frontier[new][rows]]
+                found.append(codes)
+            frontier = np.concatenate(found)
+        self._setups = True
+
+    def distances(self, a: int, b: int, others: np.ndarray) -> np.ndarray:
+        """Length of the setups cycling a, b and every position of `others`, -1 where there is none."""
+        if self._setups is None:
+            self._build_setups()
+        count = len(self.pieces)
+        return self._distance[(a * count + b) * count + others]
+
+    def cycle(self, state: np.ndarray, a: int, b: int, c: int) -> MoveSequence:
+        """Move the piece at a to b, b to c and c to a, in place on the flat state.
+
+        Returns:
+            MoveSequence: The moves of the 3-cycle.
+        """
+        if self._setups is None:
+            self._build_setups()
+        count = len(self.pieces)
+        code = (a * count + b) * count + c
+        assert self._distance[code] >= 0, "The positions can not be cycled."
+        commutator = self._commutator_moves.inverse() if self._inverse[code] else self._commutator_moves
+        setup = []
+        while self._distance[code] > 0:
+            setup.append(self._setup_moves[self._first_move[code]])
+            code = self._next[code]
+        setup = MoveSequence(setup)
+
+        pieces = self.pieces
+        state[pieces[b]], state[pieces[c]], state[pieces[a]] = state[pieces[a]], state[pieces[b]], state[pieces[c]]
+        return setup + commutator + setup.inverse()
+
+
+class ReductionSolver:
+    def __init__(self, cube: Cube, two_phase_timeout: Optional[float] = 1.0):
+        """Solve a cube of any size by reducing it to a 3x3.
+
+        First the centers of every face are given a single color, then the
+        edge pieces along every edge of the cube are paired into one big
+        edge, after which only the outer layers matter and the cube is
+        solved like a 3x3 with `TwoPhaseSolver`, turning outer faces only.
+
+        Centers and edge pieces fall into orbits of 24 pieces the moves only
+        permute among themselves. Inside an orbit every piece is placed with
+        pure 3-cycles found once per orbit, so nothing outside the three
+        pieces is disturbed. There are O(n^2) orbits with a bounded number of
+        cycles each, so the solution length and the runtime grow
+        polynomially with n.
+
+        A 3-cycle is an even permutation, so an orbit of edge pieces needing
+        an odd one is fixed with a single slice turn before the centers are
+        solved. On even cubes the big edges are chosen so that the reduced
+        3x3 is solvable, which takes care of the OLL and PLL parities of
+        the usual reduction method.
+
+        Args:
+            cube (Cube): The cube to solve, of size 3 or more.
+            two_phase_timeout (float, optional): Seconds `TwoPhaseSolver` may
+                search for a shorter 3x3 stage, it stops earlier once it found
+                one of at most 22 moves.
+        """
+        assert cube.size >= 3, "The reduction solver needs a cube with edges and centers."
+        self.cube = cube
+        self.size = cube.size
+        self.two_phase_timeout = two_phase_timeout
+        # length of the simplified solution after each stage of the last solve
+        self.stage_lengths: Dict[str, int] = {}
+
+        move_table = get_move_table(self.size)
+        self.permutations = {move: move_table[move] for move in cube.get_possible_moves() if move[0] not in "xyz"}
+        self.destinations = {move: np.argsort(permutation) for move, permutation in self.permutations.items()}
+        self._find_orbits()
+
+    def _find_orbits(self):
+        """Group the center and edge pieces into orbits, corners are left to the 3x3 stage."""
+        size = self.size
+        positions = sticker_positions(size)
+        _, piece_of = np.unique(positions, axis=0, return_inverse=True)
+        piece_of = piece_of.reshape(-1)
+        num_pieces = piece_of.max() + 1
+        stickers = [[] for _ in range(num_pieces)]
+        for sticker, piece in enumerate(piece_of):
+            stickers[piece].append(sticker)
+        first_sticker = np.array([piece[0] for piece in stickers])
+
+        # connected components of the pieces, a move connects a piece to where it goes
+        piece_moves = [piece_of[destination[first_sticker]] for destination in self.destinations.values()]
+        labels = np.arange(num_pieces)
+        while True:
+            previous = labels
+            for piece_move in piece_moves:
+                labels = np.minimum(labels, labels[piece_move])
+                labels = np.minimum(labels, labels[np.argsort(piece_move)])
+            if np.array_equal(labels, previous):
+                break
+
+        border = np.sum((positions == 0) | (positions == size - 1), axis=1)
+        self.center_orbits: List[_Orbit] = []
+        self.edge_orbits: List[_Orbit] = []
+        self.fixed_centers = None
+        self.middle_edges = None
+        for label in np.unique(labels):
+            members = np.flatnonzero(labels == label)
+            kind = border[first_sticker[members[0]]]
+            if kind == 1 and len(members) == 6:
+                # the centers of the faces of odd cubes, only the middle slices move them
+                self.fixed_centers = first_sticker[members]
+            elif kind == 1:
+                self.center_orbits.append(
+                    _Orbit(first_sticker[members][:, None], self.permutations, self.destinations)
+                )
+            elif kind == 2 and len(members) == 12:
+                # the edges in the middle of odd cubes can flip, they are solved by the 3x3 stage
+                self.middle_edges = np.array([stickers[piece] for piece in members])
+            elif kind == 2:
+                self.edge_orbits.append(
+                    _Orbit(self._oriented(members, stickers, piece_of), self.permutations, self.destinations)
+                )
+
+    def _oriented(self, members: np.ndarray, stickers: List[List[int]], piece_of: np.ndarray) -> np.ndarray:
+        """Order the stickers of the edge pieces of an orbit the way the moves carry them."""
+        index = {piece: row for row, piece in enumerate(members)}
+        oriented = np.full((len(members), 2), -1, dtype=np.intp)
+        oriented[0] = stickers[members[0]]
+        while np.any(oriented[:, 0] == -1):
+            for destination in self.destinations.values():
+                known = np.flatnonzero(oriented[:, 0] != -1)
+                moved = destination[oriented[known]]
+                rows = np.array([index[piece] for piece in piece_of[moved[:, 0]]])
+                unknown = oriented[rows, 0] == -1
+                oriented[rows[unknown]] = moved[unknown]
+        return oriented
+
+    def _reduced_facelets(self) -> np.ndarray:
+        """Flat indices of the NxN stickers standing in for the 54 stickers of the reduced 3x3."""
+        size = self.size
+        rows = np.array([0, size // 2 if size % 2 else 1, size - 1])
+        faces, row, column = np.meshgrid(np.arange(6), rows, rows, indexing="ij")
+        return ((faces * size + row) * size + column).reshape(-1)
+
+    def _align_fixed_centers(self, state: np.ndarray) -> List[str]:
+        """Bring the centers of the faces of an odd cube home with middle slice turns."""
+        solved = self.fixed_centers // (self.size * self.size)
+        middle = [move for move in self.permutations if move.startswith(f"m{self.size // 2}")]
+        paths = {state[self.fixed_centers].tobytes(): []}
+        frontier = [state]
+        while frontier:
+            next_frontier = []
+            for current in frontier:
+                path = paths[current[self.fixed_centers].tobytes()]
+                if np.array_equal(current[self.fixed_centers], solved):
+                    state[:] = current
+                    return path
+                for move in middle:
+                    child = current[self.permutations[move]]
+                    key = child[self.fixed_centers].tobytes()
+                    if key not in paths:
+                        paths[key] = path + [move]
+                        next_frontier.append(child)
+            frontier = next_frontier
+        raise ValueError("Invalid cube!")
+
+    def _edge_colors(self, state: np.ndarray) -> np.ndarray:
+        """Color every edge sticker should have once the big edges are paired.
+
+        Odd cubes pair around the edges in the middle. On even cubes the
+        colors next to the corners are taken where they are not used yet,
+        and one big edge is flipped or two are swapped if the reduced 3x3
+        would not be solvable.
+        """
+        size = self.size
+        positions = sticker_positions(size)
+        border = (positions == 0) | (positions == size - 1)
+        faces = np.arange(6 * size * size) // (size * size)
+        edge_stickers = np.flatnonzero(border.sum(axis=1) == 2)
+        # the edge every sticker is on, the coordinate along the edge is dropped
+        slots = np.where(border[edge_stickers], positions[edge_stickers], -1)
+        slot_keys, slot_of = np.unique(slots, axis=0, return_inverse=True)
+        slot_of = slot_of.reshape(-1)
+        slot_faces = [np.unique(faces[edge_stickers[slot_of == slot]]) for slot in range(len(slot_keys))]
+
+        def color_table(choice: Dict[int, Tuple[int, int]]) -> np.ndarray:
+            # colors[slot, face]
+            colors = np.full((len(slot_keys), 6), -1, dtype=np.intp)
+            for slot, (first, second) in choice.items():
+                colors[slot, slot_faces[slot]] = (first, second)
+            return colors
+
+        if size % 2:
+            colors = np.full((len(slot_keys), 6), -1, dtype=np.intp)
+            for stickers in self.middle_edges:
+                for sticker in stickers:
+                    colors[slot_of[np.searchsorted(edge_stickers, sticker)], faces[sticker]] = state[sticker]
+        else:
+            choice = {}
+            used = set()
+            for slot in range(len(slot_keys)):
+                slot_stickers = edge_stickers[slot_of == slot]
+                along = positions[slot_stickers, np.flatnonzero(slot_keys[slot] == -1)[0]]
+                # the edge pieces next to the corners
+                for end in (1, size - 2):
+                    piece = slot_stickers[along == end]
+                    pair = tuple(int(state[piece[faces[piece] == face][0]]) for face in slot_faces[slot])
+                    if frozenset(pair) not in used:
+                        choice[slot] = pair
+                        used.add(frozenset(pair))
+                        break
+            # the pairs left over go to the edges left over
+            all_pairs = {frozenset(map(int, faces_of_slot)) for faces_of_slot in slot_faces}
+            left_over = sorted(tuple(sorted(pair)) for pair in all_pairs - used)
+            for slot in range(len(slot_keys)):
+                if slot not in choice:
+                    choice[slot] = left_over.pop()
+
+            colors = None
+            for flip in (False, True):
+                for swap in (False, True):
+                    candidate = dict(choice)
+                    if flip:
+                        candidate[0] = candidate[0][::-1]
+                    if swap:
+                        candidate[0], candidate[1] = candidate[1], candidate[0]
+                    table = color_table(candidate)
+                    if self._is_solvable(state, table, edge_stickers, slot_of):
+                        colors = table
+                        break
+                if colors is not None:
+                    break
+            if colors is None:
+                raise ValueError("Invalid cube!")
+
+        wanted = np.full(6 * size * size, -1, dtype=np.intp)
+        wanted[edge_stickers] = colors[slot_of, faces[edge_stickers]]
+        return wanted
+
+    def _is_solvable(self, state: np.ndarray, colors: np.ndarray, edge_stickers: np.ndarray, slot_of: np.ndarray) -> bool:
+        """Check if the 3x3 with the corners of the state, solved centers and the given big edges is solvable."""
+        size = self.size
+        reduced = state.copy()
+        faces = np.arange(6 * size * size) // (size * size)
+        reduced[edge_stickers] = colors[slot_of, faces[edge_stickers]]
+        reduced = reduced[self._reduced_facelets()]
+        reduced[4::9] = np.arange(6)
+        return CubieCube.from_combinations(reduced.reshape(6, 3, 3)).is_solvable()
+
+    def _solve_centers(self, state: np.ndarray, orbit: _Orbit) -> List[MoveSequence]:
+        """Give the centers of an orbit the color of their face."""
+        solved = orbit.pieces[:, 0] // (self.size * self.size)
+        positions = np.arange(len(orbit.pieces))
+        sequences = []
+        while True:
+            colors = state[orbit.pieces[:, 0]]
+            wrong = colors != solved
+            if not wrong.any():
+                return sequences
+            target = int(np.flatnonzero(wrong)[0])
+            # a misplaced center of the color the target needs
+            source = int(np.flatnonzero(wrong & (colors == solved[target]))[0])
+            # the center at `third` goes to `source` and the one at `target` to `third`
+            others = positions[(positions != target) & (positions != source)]
+            score = (
+                (colors[others] == solved[source]).astype(int)
+                + (colors[target] == solved[others]).astype(int)
+                - (~wrong[others]).astype(int)
+            )
+            distances = orbit.distances(source, target, others)
+            score = np.where(distances >= 0, score * 64 - distances, -(1 << 30))
+            third = int(others[np.argmax(score)])
+            sequences.append(orbit.cycle(state, source, target, third))
+
+    def _pair_edges(self, state: np.ndarray, orbit: _Orbit, wanted: np.ndarray) -> List[MoveSequence]:
+        """Move every edge piece of an orbit next to the colors of its big edge."""
+        current, target = self._edge_pieces(state, orbit, wanted)
+        sequences = []
+        while True:
+            wrong = np.flatnonzero(current != target)
+            if not wrong.size:
+                return sequences
+            goal = int(wrong[0])
+            source = int(np.flatnonzero(current == target[goal])[0])
+            others = wrong[(wrong != goal) & (wrong != source)]
+            # prefer the piece that belongs where the source is
+            distances = orbit.distances(source, goal, others)
+            score = np.where(distances >= 0, (current[others] == target[source]) * 64 - distances, -(1 << 30))
+            third = int(others[np.argmax(score)])
+            sequences.append(orbit.cycle(state, source, goal, third))
+            current[goal], current[third], current[source] = current[source], current[goal], current[third]
+
+    def _edge_pieces(self, state: np.ndarray, orbit: _Orbit, wanted: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """The piece at every position of an edge orbit and the piece it should hold.
+
+        Pieces are named after their position in the solved cube, where their
+        stickers have the colors of their faces.
+        """
+        faces = orbit.pieces // (self.size * self.size)
+        home = {(int(first), int(second)): piece for piece, (first, second) in enumerate(faces)}
+        current = np.array([home.get((int(first), int(second)), -1) for first, second in state[orbit.pieces]])
+        target = np.array([home.get((int(first), int(second)), -1) for first, second in wanted[orbit.pieces]])
+        count = len(orbit.pieces)
+        if sorted(current.tolist()) != list(range(count)) or sorted(target.tolist()) != list(range(count)):
+            raise ValueError("Invalid cube!")
+        return current, target
+
+    def solve(self) -> tuple:
+        """Solve the cube.
+
+        The length of the solution after the centers, the edges and the 3x3
+        stage is kept in `stage_lengths`.
+
+        Returns:
+            tuple: The solution, face and slice moves in the notation of
+                `Cube.get_possible_moves()`.
+        """
+        self.stage_lengths = {}
+        if self.cube.is_solved():
+            return ()
+
+        state = encode_combinations(self.cube.combinations).reshape(-1).astype(np.intp)
+        solution = MoveSequence()
+        if self.fixed_centers is not None:
+            solution += self._align_fixed_centers(state)
+
+        # 3-cycles only make even permutations, a slice turn fixes the other ones
+        wanted = self._edge_colors(state)
+        for orbit in self.edge_orbits:
+            current, target = self._edge_pieces(state, orbit, wanted)
+            where = np.argsort(target)
+            if _parity(where[current]):
+                move = next(move for move in orbit.actions if move[0] == "m" and move[-1] not in "2'")
+                state[:] = state[self.permutations[move]]
+                solution += [move]
+
+        for orbit in self.center_orbits:
+            for sequence in self._solve_centers(state, orbit):
+                solution += sequence
+        self.stage_lengths["centers"] = len(solution.simplify())
+        for orbit in self.edge_orbits:
+            for sequence in self._pair_edges(state, orbit, wanted):
+                solution += sequence
+        self.stage_lengths["edges"] = len(solution.simplify())
+
+        reduced = Cube.from_combinations(decode_combinations(state[self._reduced_facelets()]).reshape(6, 3, 3))
+        solution += TwoPhaseSolver(reduced, max_length=22, timeout=self.two_phase_timeout).solve()
+        solution = tuple(solution.simplify())
+        self.stage_lengths["3x3"] = len(solution)
+
+        check = Cube(self.size)
+        check.combinations = self.cube.combinations.copy()
+        check.make_moves(list(solution))
+        if not check.is_solved():
+            raise ValueError("Invalid cube!")
+        return solution
@@ -0,0 +1,118 @@
+import struct
+import numpy as np
+from typing import Iterable, Optional, Union
+
+from .cube import Cube, encode_combinations, decode_combinations
+from .batch import CubeBatch
+from .encoding import BITS_PER_STICKER, pack_states, packed_length, unpack_states
+
+_MAGIC = b"RCUBESTS"
+_VERSION = 1
+# magic, version, bits per sticker, size of the cubes, number of states, padding to 64 bytes
+_HEADER = struct.Struct("<8sHBxIQ40x")
+_CHUNK_SIZE = 1 << 16
+
+
+class PackedStates:
+    def __init__(self, size: int, packed: np.ndarray, path: Optional[str] = None):
+        """A collection of states packed with `encoding.pack_states`.
+
+        Only the packed bytes are kept, a 3x3 takes 21 bytes instead of 216
+        for a (6, 3, 3) array of color letters. States are unpacked when they
+        are indexed, so a memory mapped file is never read as a whole.
+
+        Args:
+            size (int): Size of the cubes.
+            packed (np.array): Packed states, usually a `np.memmap`. shape: (N, packed_length(size))
+            path (str, optional): File the states were loaded from.
+        """
+        assert packed.ndim == 2 and packed.shape[1] == packed_length(size), "Packed states do not match the size."
+        self.size = size
+        self.packed = packed
+        self.path = path
+
+    def __reduce__(self):
+        # a memory mapped file is opened again instead of copied to other processes
+        if self.path is not None:
+            return (load_states, (self.path,))
+        return (PackedStates, (self.size, np.asarray(self.packed)))
+
+    def __len__(self) -> int:
+        return self.packed.shape[0]
+
+    def __getitem__(self, index) -> np.ndarray:
+        """Encoded states, (6, n, n) for an integer index and (N, 6, n, n) for slices and arrays."""
+        packed = self.packed[index]
+        return unpack_states(packed, self.size).reshape(*packed.shape[:-1], 6, self.size, self.size)
+
+    def cube(self, index: int) -> Cube:
+        """The state at `index` as a `Cube`, it was validated when it was saved."""
+        cube = Cube(self.size)
+        cube.combinations = decode_combinations(self[index])
+        return cube
+
+    def to_batch(self) -> CubeBatch:
+        """All states as a `CubeBatch`, this reads the whole file."""
+        batch = CubeBatch(self.size, count=0)
+        batch.states = self[:]
+        return batch
+
+
+def _as_states(states: Union[Cube, CubeBatch, np.ndarray, Iterable[Cube]]) -> np.ndarray:
+    """Encoded states (N, 6, n, n) of a cube, a batch, a list of cubes or an array."""
+    if isinstance(states, Cube):
+        return encode_combinations(states.combinations)[None]
+    if isinstance(states, CubeBatch):
+        return states.states
+    if not isinstance(states, np.ndarray):
+        return encode_combinations(np.stack([cube.combinations for cube in states]))
+    codes = encode_combinations(states)
+    return codes[None] if codes.ndim == 3 else codes
+
+
+def save_states(path: str, states: Union[Cube, CubeBatch, np.ndarray, Iterable[Cube]]):
+    """Write states to a file that `load_states` can memory map.
+
+    The file is a 64 byte header with the size of the cubes and the number
+    of states, followed by the states packed into 3 bits per sticker, one
+    row of `packed_length(size)` bytes per state.
+
+    Args:
+        path (str): The file.
+        states (Cube | CubeBatch | np.array | list): A single cube, a batch,
+            a list of cubes, or color letters or encoded colors of shape
+            (6, n, n) or (N, 6, n, n).
+    """
+    states = _as_states(states)
+    assert states.shape[1] == 6 and states.shape[2] == states.shape[3], "States should have the shape (N, 6, n, n)."
+    assert np.all(states < 6), "Every element should be in [w, o, g, r, b, y]."
+    size = states.shape[2]
+    header = _HEADER.pack(_MAGIC, _VERSION, BITS_PER_STICKER, size, len(states))
+    with open(path, "wb") as file:
+        file.write(header)
+        for start in range(0, len(states), _CHUNK_SIZE):
+            pack_states(states[start : start + _CHUNK_SIZE]).tofile(file)
+
+
+def load_states(path: str, mmap: bool = True) -> PackedStates:
+    """Open a file written by `save_states`.
+
+    Args:
+        path (str): The file.
+        mmap (bool): Memory map the states, they are only read from disk
+            when they are indexed. Otherwise the packed bytes are read at once.
+
+    Returns:
+        PackedStates: The states.
+    """
+    with open(path, "rb") as file:
+        magic, version, bits, size, count = _HEADER.unpack(file.read(_HEADER.size))
+    assert magic == _MAGIC, f"{path} is not a file of cube states."
+    assert version == _VERSION, f"Unsupported cube state file version {version}."
+    assert bits == BITS_PER_STICKER, f"{path} does not match its header."
+    shape = (count, packed_length(size))
+    if mmap and count:
+        packed = np.memmap(path, dtype=np.uint8, mode="r", offset=_HEADER.size, shape=shape)
+    else:
+        packed = np.fromfile(path, dtype=np.uint8, offset=_HEADER.size).reshape(shape)
+    return PackedStates(size, packed, path if mmap else None)
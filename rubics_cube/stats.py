@@ -0,0 +1,163 @@
+import sys
+import time
+import contextlib
+import tracemalloc
+import numpy as np
+from typing import Callable, Dict, List, Optional, Tuple
+
+# parts of a search that are timed with `SearchStats(timing=True)`
+TIMED_PARTS = ("heuristic", "moves", "hashing")
+
+_NO_TIMER = contextlib.nullcontext()
+
+
+class _Timer:
+    __slots__ = ("times", "part", "start")
+
+    def __init__(self, times: Dict[str, float], part: str):
+        self.times = times
+        self.part = part
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exception):
+        self.times[self.part] += time.perf_counter() - self.start
+
+
+class SearchStats:
+    def __init__(
+        self,
+        callback: Optional[Callable[["SearchStats"], None]] = None,
+        interval: float = 1.0,
+        timing: bool = False,
+        trace_memory: bool = False,
+    ):
+        """Counters of a search and an optional progress callback.
+
+        Every search solver has one in `solver.stats`, replace it to get
+        progress reports or the timing of the search. The counters are always
+        kept, they cost about as much as the old attributes of the solvers.
+        Timing the parts of the search and tracing memory are off by default
+        since they slow the search down: timing by a few percent, tracing
+        memory by a lot more.
+
+        Args:
+            callback (Callable, optional): Called with the stats every
+                `interval` seconds while the search runs and once when it ends.
+            interval (float): Seconds between calls of `callback`.
+            timing (bool): Split the time between the heuristic, making moves
+                and hashing states, see `times`.
+            trace_memory (bool): Measure the peak memory of the search with
+                `tracemalloc`.
+        """
+        self.callback = callback
+        self.interval = interval
+        self.timing = timing
+        self.trace_memory = trace_memory
+        # whether tracemalloc was started by this object
+        self._tracing = False
+        self._reset()
+
+    def _reset(self):
+        self.nodes_expanded = 0
+        self.nodes_generated = 0
+        # states dropped from the frontier of a memory bounded search
+        self.nodes_pruned = 0
+        self.frontier_size = 0
+        self.closed_size = 0
+        self.best_value = np.inf
+        # (seconds since the start, value) every time the best heuristic value improved
+        self.best_values: List[Tuple[float, float]] = []
+        self.times = dict.fromkeys(TIMED_PARTS, 0.0)
+        self._timers = {part: _Timer(self.times, part) for part in TIMED_PARTS}
+        self.peak_memory_bytes: Optional[int] = None
+        self.finished = False
+        self._start = time.perf_counter()
+        self._end = None
+        self._next_report = self._start + self.interval
+
+    def start(self):
+        """Reset the counters, solvers call this when a search starts."""
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._tracing = True
+        elif self.trace_memory:
+            # somebody else traces or a search was not stopped, only the peak from now on is ours
+            tracemalloc.reset_peak()
+        self._reset()
+
+    def stop(self):
+        """Stop the clock and memory tracing, and make the last report."""
+        if self.finished:
+            return
+        self._end = time.perf_counter()
+        self.finished = True
+        if self.trace_memory:
+            self.peak_memory_bytes = tracemalloc.get_traced_memory()[1]
+        if self._tracing:
+            tracemalloc.stop()
+            self._tracing = False
+        if self.callback is not None:
+            self.callback(self)
+
+    @property
+    def seconds(self) -> float:
+        """Time since the start of the search, or the duration of a finished search."""
+        return (self._end or time.perf_counter()) - self._start
+
+    @property
+    def nodes_per_second(self) -> float:
+        """Expanded nodes per second."""
+        seconds = self.seconds
+        return self.nodes_expanded / seconds if seconds > 0 else 0.0
+
+    def timer(self, part: str):
+        """Context manager adding its time to `times[part]`, does nothing without `timing`."""
+        return self._timers[part] if self.timing else _NO_TIMER
+
+    def improve(self, value: float):
+        """Record a heuristic value, kept if it is the best one so far."""
+        if value < self.best_value:
+            self.best_value = value
+            self.best_values.append((self.seconds, value))
+
+    def tick(self, frontier_size: int, closed_size: int):
+        """Called by the solvers for every expanded node, calls the callback when it is due."""
+        if self.callback is not None and time.perf_counter() >= self._next_report:
+            self.frontier_size = frontier_size
+            self.closed_size = closed_size
+            if self.trace_memory:
+                self.peak_memory_bytes = tracemalloc.get_traced_memory()[1]
+            self.callback(self)
+            self._next_report = time.perf_counter() + self.interval
+
+    def as_dict(self) -> dict:
+        """The counters as a dict that can be written as JSON."""
+        return {
+            "seconds": round(self.seconds, 6),
+            "nodes_expanded": self.nodes_expanded,
+            "nodes_generated": self.nodes_generated,
+            "nodes_pruned": self.nodes_pruned,
+            "nodes_per_second": round(self.nodes_per_second, 1),
+            "frontier_size": self.frontier_size,
+            "closed_size": self.closed_size,
+            "best_value": None if self.best_value == np.inf else float(self.best_value),
+            "best_values": [(round(seconds, 6), float(value)) for seconds, value in self.best_values],
+            "times": {part: round(seconds, 6) for part, seconds in self.times.items()} if self.timing else None,
+            "peak_memory_bytes": self.peak_memory_bytes,
+        }
+
+
+def print_progress(stats: SearchStats):
+    """A callback that writes a line of progress to stderr."""
+    line = (
+        f"{stats.seconds:.1f}s expanded: {stats.nodes_expanded} generated: {stats.nodes_generated} "
+        f"({stats.nodes_per_second:.0f} nodes/s) frontier: {stats.frontier_size} closed: {stats.closed_size} "
+        f"best value: {stats.best_value}"
+    )
+    if stats.timing:
+        line += " " + " ".join(f"{part}: {seconds:.2f}s" for part, seconds in stats.times.items())
+    if stats.peak_memory_bytes is not None:
+        line += f" peak memory: {stats.peak_memory_bytes / 2 ** 20:.1f} MiB"
+    print(line, file=sys.stderr)
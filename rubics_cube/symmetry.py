@@ -0,0 +1,163 @@
+import numpy as np
+from functools import lru_cache
+from typing import Dict, Sequence, Tuple
+
+from .cube import FACE_TO_INDEX, get_move_table, _possible_moves
+from .cubie import sticker_positions
+from .encoding import pack_states
+
+# reflecting through the plane between L and R swaps these two faces
+_MIRROR_FACES = np.array([FACE_TO_INDEX[face] for face in "URFLBD"], dtype=np.uint8)
+
+
+@lru_cache(maxsize=None)
+def _rotation_permutations(size: int) -> np.ndarray:
+    """The 24 whole cube rotations as sticker permutations, identity first. shape: (24, 6*n*n)"""
+    move_table = get_move_table(size)
+    identity = np.arange(6 * size * size)
+    permutations = {identity.tobytes(): identity}
+    frontier = [identity]
+    while frontier:
+        permutation = frontier.pop()
+        for move in ("x", "y"):
+            child = permutation[move_table[move]]
+            if child.tobytes() not in permutations:
+                permutations[child.tobytes()] = child
+                frontier.append(child)
+    assert len(permutations) == 24, "Rotations should form a group of 24 elements."
+    return np.stack(list(permutations.values()))
+
+
+@lru_cache(maxsize=None)
+def _mirror_permutation(size: int) -> np.ndarray:
+    """Sticker permutation of the reflection that swaps the L and R sides."""
+    positions = sticker_positions(size)
+    sticker_faces = np.repeat(np.arange(6), size * size)
+    index = {(face, *position): i for i, (face, position) in enumerate(zip(sticker_faces, map(tuple, positions)))}
+    last = size - 1
+    return np.array(
+        [index[(_MIRROR_FACES[face], last - x, y, z)] for face, (x, y, z) in zip(sticker_faces, positions)],
+        dtype=np.intp,
+    )
+
+
+def _relabel(states: np.ndarray) -> np.ndarray:
+    """Rename the colors of every state in the order they first appear. shape: (N, L) -> (N, L)"""
+    appears = states[:, :, None] == np.arange(6, dtype=np.uint8)
+    first = np.where(appears.any(axis=1), appears.argmax(axis=1), appears.shape[1])
+    names = np.argsort(np.argsort(first, axis=1), axis=1).astype(np.uint8)
+    return np.take_along_axis(names, states.astype(np.intp), axis=1)
+
+
+# 6**24 < 2**63, so 24 stickers fit in one int64 as base 6 digits
+_STICKERS_PER_KEY = 24
+_KEY_WEIGHTS = 6 ** np.arange(_STICKERS_PER_KEY - 1, -1, -1, dtype=np.int64)
+
+
+def _sort_keys(states: np.ndarray) -> np.ndarray:
+    """Integers in the same lexicographic order as encoded flat states, 24 stickers each. shape: (..., L) -> (..., k)"""
+    padding = -states.shape[-1] % _STICKERS_PER_KEY
+    if padding:
+        states = np.concatenate([states, np.zeros((*states.shape[:-1], padding), dtype=states.dtype)], axis=-1)
+    return states.reshape(*states.shape[:-1], -1, _STICKERS_PER_KEY).astype(np.int64) @ _KEY_WEIGHTS
+
+
+class Symmetry:
+    def __init__(self, size: int, mirror: bool = False, recolor: bool = False):
+        """Canonical representatives of cube states under symmetries.
+
+        Every symmetry maps a state to a state with the same distance to a
+        solved cube, so a search only has to visit one state of each class.
+        The symmetries are the 24 whole cube rotations, optionally the 24
+        mirrored rotations (the reflection also swaps the orange and red
+        colors so the state stays reachable), and optionally any renaming of
+        the colors. Renamed states are still solved by the same moves but can
+        use a different color scheme, so only use `recolor` with heuristics
+        that do not depend on the colors, like `same_color_amount`.
+
+        Args:
+            size (int): Size of the cube.
+            mirror (bool): Also use the mirror symmetries.
+            recolor (bool): Also treat states that only differ in the names
+                of the colors as the same.
+        """
+        self.size = size
+        self.mirror = mirror
+        self.recolor = recolor
+
+        rotations = _rotation_permutations(size)
+        identity_colors = np.arange(6, dtype=np.uint8)
+        if mirror:
+            # applying symmetry k is colors[k][state[permutations[k]]]
+            self.permutations = np.concatenate([rotations, _mirror_permutation(size)[rotations]])
+            self.colors = np.stack([identity_colors] * 24 + [_MIRROR_FACES] * 24)
+        else:
+            self.permutations = rotations
+            self.colors = np.stack([identity_colors] * 24)
+        self._move_maps: Dict[int, Dict[str, str]] = {}
+
+    def __len__(self) -> int:
+        return len(self.permutations)
+
+    def apply(self, state: np.ndarray, index: int) -> np.ndarray:
+        """Apply a symmetry to an encoded flat state, without renaming colors."""
+        return self.colors[index][state[self.permutations[index]]]
+
+    def canonical_states(self, states: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Canonical representatives of encoded flat states.
+
+        The representative is the packed state with the smallest bytes among
+        all symmetric states. 3 bit packing keeps the order of the stickers,
+        so it is also the lexicographically smallest state.
+
+        Args:
+            states (np.array): Encoded flat states. shape: (N, 6*n*n)
+
+        Returns:
+            tuple: Packed representatives (N, packed_length(n)) and the index
+                of the symmetry that maps every state to its representative (N,).
+        """
+        states = np.asarray(states, dtype=np.uint8)
+        # (N, S, L) every state under every symmetry
+        images = states[:, self.permutations]
+        if self.mirror:
+            images = self.colors[np.arange(len(self))[:, None], images]
+        if self.recolor:
+            images = _relabel(images.reshape(-1, images.shape[-1])).reshape(images.shape)
+        # the smallest image is found on a few integers per image, only it is packed
+        keys = _sort_keys(images)
+        # lexsort uses the last key as the primary one
+        best = np.lexsort(keys.transpose(2, 0, 1)[::-1], axis=-1)[:, 0]
+        rows = np.arange(len(states))
+        return pack_states(images[rows, best]), best
+
+    def canonical(self, state: np.ndarray) -> Tuple[bytes, int]:
+        """Canonical key of an encoded flat state and the symmetry that gives it.
+
+        The key is hashable and equal for every symmetric state, use it for
+        closed sets, caches and lookup tables instead of the raw state.
+        """
+        packed, index = self.canonical_states(state[None])
+        return packed[0].tobytes(), int(index[0])
+
+    def _move_map(self, index: int) -> Dict[str, str]:
+        """Maps a move on the symmetric state to the same move on the original state."""
+        if index not in self._move_maps:
+            move_table = get_move_table(self.size)
+            permutation = self.permutations[index]
+            inverse = np.argsort(permutation)
+            moves_by_permutation = {move_table[move].tobytes(): move for move in _possible_moves(self.size)}
+            # symmetry(state after original move) == state after the mapped move of symmetry(state)
+            self._move_maps[index] = {
+                move: moves_by_permutation[permutation[move_table[move]][inverse].tobytes()]
+                for move in _possible_moves(self.size)
+            }
+        return self._move_maps[index]
+
+    def conjugate_moves(self, moves: Sequence[str], index: int) -> Tuple[str, ...]:
+        """Translate moves made on a symmetric state back to the original state.
+
+        If `moves` solve `apply(state, index)`, the returned moves solve `state`.
+        """
+        move_map = self._move_map(index)
+        return tuple(move_map[move] for move in moves)
@@ -0,0 +1,383 @@
+import os
+import time
+import itertools
+import numpy as np
+from math import factorial
+from typing import Dict, List, Optional
+
+from .cube import Cube, encode_combinations
+from .cubie import read_cubies, get_cubie_moves, CENTER_FACELETS
+
+
+def _binomial(n: int, k: int) -> int:
+    return factorial(n) // (factorial(k) * factorial(n - k)) if 0 <= k <= n else 0
+
+
+# face moves in the order used by the tables, move // 3 is the face
+MOVES = [face + suffix for face in "URFDLB" for suffix in ("", "2", "'")]
+PHASE2_MOVES = ["U", "U2", "U'", "D", "D2", "D'", "R2", "L2", "F2", "B2"]
+_FACE_OF_MOVE = ["URFDLB".index(move[0]) for move in MOVES]
+_PHASE2_INDICES = [MOVES.index(move) for move in PHASE2_MOVES]
+
+NUM_TWISTS = 3**7
+NUM_FLIPS = 2**11
+NUM_SLICES = _binomial(12, 4)
+NUM_CORNER_PERMUTATIONS = 40320
+NUM_EDGE_PERMUTATIONS = 40320
+NUM_SLICE_PERMUTATIONS = 24
+# slice edges FR, FL, BL, BR at positions 8 to 11
+SOLVED_SLICE = NUM_SLICES - 1
+
+_TABLES_VERSION = 1
+_UNVISITED = 255
+_tables = None
+_search_tables = None
+
+
+def default_cache_directory() -> str:
+    """Directory the tables are cached in, `$RUBICS_CUBE_CACHE` or `~/.cache/rubics_cube`."""
+    return os.environ.get("RUBICS_CUBE_CACHE", os.path.join(os.path.expanduser("~"), ".cache", "rubics_cube"))
+
+
+def _twist(corner_orientation: np.ndarray) -> np.ndarray:
+    return corner_orientation[:, :7].astype(np.int64) @ (3 ** np.arange(6, -1, -1))
+
+
+def _flip(edge_orientation: np.ndarray) -> np.ndarray:
+    return edge_orientation[:, :11].astype(np.int64) @ (2 ** np.arange(10, -1, -1))
+
+
+def _slice(edge_permutation: np.ndarray) -> np.ndarray:
+    # rank of the positions of the slice edges in the combinatorial number system
+    occupied = edge_permutation >= 8
+    count = np.cumsum(occupied, axis=1)
+    binomials = np.array([[_binomial(position, k) for k in range(5)] for position in range(12)])
+    return np.sum(np.where(occupied, binomials[np.arange(12), count], 0), axis=1)
+
+
+def _permutation_rank(permutation: np.ndarray) -> np.ndarray:
+    # lexicographic rank, the same order as itertools.permutations
+    size = permutation.shape[1]
+    rank = np.zeros(permutation.shape[0], dtype=np.int64)
+    for i in range(size):
+        smaller_after = np.sum(permutation[:, i + 1 :] < permutation[:, i : i + 1], axis=1)
+        rank = rank * (size - i) + smaller_after
+    return rank
+
+
+def _all_permutations(size: int) -> np.ndarray:
+    return np.array(list(itertools.permutations(range(size))), dtype=np.int64)
+
+
+def _all_slices() -> np.ndarray:
+    # an edge permutation for every slice coordinate, the other edges fill the gaps in order
+    permutations = np.zeros((NUM_SLICES, 12), dtype=np.int64)
+    for positions in itertools.combinations(range(12), 4):
+        permutation = np.zeros(12, dtype=np.int64)
+        permutation[list(positions)] = np.arange(8, 12)
+        permutation[[i for i in range(12) if i not in positions]] = np.arange(8)
+        permutations[_slice(permutation[None])[0]] = permutation
+    return permutations
+
+
+def _move_table(states: np.ndarray, apply, encode, moves: List[int]) -> np.ndarray:
+    """Coordinate after every move for every coordinate value. shape: (num_values, len(moves))"""
+    return np.stack([encode(apply(states, move)) for move in moves], axis=1)
+
+
+def _pruning_table(first_moves: np.ndarray, second_moves: np.ndarray, solved: int) -> np.ndarray:
+    """Distances of the product of two coordinates with a breadth first search."""
+    num_second = second_moves.shape[0]
+    distances = np.full(first_moves.shape[0] * num_second, _UNVISITED, dtype=np.uint8)
+    distances[solved] = 0
+    depth = 0
+    while True:
+        frontier = np.flatnonzero(distances == depth)
+        if frontier.size == 0:
+            return distances
+        first, second = np.divmod(frontier, num_second)
+        for move in range(first_moves.shape[1]):
+            children = first_moves[first, move] * num_second + second_moves[second, move]
+            children = children[distances[children] == _UNVISITED]
+            distances[children] = depth + 1
+        depth += 1
+
+
+def _build_tables() -> Dict[str, np.ndarray]:
+    cubie_moves = get_cubie_moves()
+    move_cubies = [cubie_moves[move] for move in MOVES]
+    all_moves = list(range(len(MOVES)))
+
+    def apply_corner_orientation(orientations, move):
+        permutation, orientation = move_cubies[move][0], move_cubies[move][1]
+        return (orientations[:, permutation] + orientation) % 3
+
+    def apply_edge_orientation(orientations, move):
+        permutation, orientation = move_cubies[move][2], move_cubies[move][3]
+        return (orientations[:, permutation] + orientation) % 2
+
+    def apply_corner_permutation(permutations, move):
+        return permutations[:, move_cubies[move][0]]
+
+    def apply_edge_permutation(permutations, move):
+        return permutations[:, move_cubies[move][2]]
+
+    twists = np.arange(NUM_TWISTS)[:, None] // 3 ** np.arange(6, -1, -1) % 3
+    twists = np.hstack([twists, -twists.sum(axis=1, keepdims=True) % 3])
+    flips = np.arange(NUM_FLIPS)[:, None] // 2 ** np.arange(10, -1, -1) % 2
+    flips = np.hstack([flips, flips.sum(axis=1, keepdims=True) % 2])
+
+    tables = {
+        "twist_move": _move_table(twists, apply_corner_orientation, _twist, all_moves),
+        "flip_move": _move_table(flips, apply_edge_orientation, _flip, all_moves),
+        "slice_move": _move_table(_all_slices(), apply_edge_permutation, _slice, all_moves),
+    }
+
+    # phase 2 only uses moves that keep the cube in the subgroup
+    permutations = _all_permutations(8)
+    tables["corner_permutation_move"] = _move_table(
+        permutations, apply_corner_permutation, _permutation_rank, _PHASE2_INDICES
+    )
+    tables["edge_permutation_move"] = _move_table(
+        np.hstack([permutations, np.broadcast_to(np.arange(8, 12), (len(permutations), 4))]),
+        apply_edge_permutation,
+        lambda edges: _permutation_rank(edges[:, :8]),
+        _PHASE2_INDICES,
+    )
+    slice_permutations = _all_permutations(4) + 8
+    tables["slice_permutation_move"] = _move_table(
+        np.hstack([np.broadcast_to(np.arange(8), (len(slice_permutations), 8)), slice_permutations]),
+        apply_edge_permutation,
+        lambda edges: _permutation_rank(edges[:, 8:] - 8),
+        _PHASE2_INDICES,
+    )
+
+    tables["twist_slice_pruning"] = _pruning_table(tables["twist_move"], tables["slice_move"], SOLVED_SLICE)
+    tables["flip_slice_pruning"] = _pruning_table(tables["flip_move"], tables["slice_move"], SOLVED_SLICE)
+    tables["corner_slice_pruning"] = _pruning_table(
+        tables["corner_permutation_move"], tables["slice_permutation_move"], 0
+    )
+    tables["edge_slice_pruning"] = _pruning_table(
+        tables["edge_permutation_move"], tables["slice_permutation_move"], 0
+    )
+    return tables
+
+
+def load_tables(cache_directory: Optional[str] = None) -> Dict[str, np.ndarray]:
+    """Load the move and pruning tables, building and caching them on first use.
+
+    Building takes a few seconds, afterwards the tables are read from
+    `two_phase_tables_v{version}.npz` in the cache directory.
+
+    Args:
+        cache_directory (str, optional): Defaults to `default_cache_directory()`.
+
+    Returns:
+        dict: The tables.
+    """
+    global _tables
+    if _tables is not None:
+        return _tables
+
+    cache_directory = cache_directory or default_cache_directory()
+    path = os.path.join(cache_directory, f"two_phase_tables_v{_TABLES_VERSION}.npz")
+    if os.path.exists(path):
+        with np.load(path) as data:
+            tables = {name: data[name] for name in data.files}
+    else:
+        tables = _build_tables()
+        try:
+            os.makedirs(cache_directory, exist_ok=True)
+            # write to a temporary file first so a concurrent reader never sees half a file
+            temporary_path = f"{path}.{os.getpid()}.tmp.npz"
+            np.savez(temporary_path, **tables)
+            os.replace(temporary_path, path)
+        except OSError:
+            pass  # caching is best effort, the tables are still usable
+    _tables = tables
+    return tables
+
+
+def _get_search_tables(cache_directory: Optional[str] = None) -> Dict[str, object]:
+    """The tables as lists and bytes, indexing those is much faster than numpy scalars."""
+    global _search_tables
+    if _search_tables is None:
+        _search_tables = {
+            name: table.tobytes() if name.endswith("pruning") else table.tolist()
+            for name, table in load_tables(cache_directory).items()
+        }
+    return _search_tables
+
+
+class TwoPhaseSolver:
+    def __init__(
+        self,
+        cube: Cube,
+        max_length: Optional[int] = None,
+        timeout: Optional[float] = 1.0,
+        cache_directory: Optional[str] = None,
+    ):
+        """Kociemba's two-phase algorithm for the 3x3.
+
+        Phase 1 brings the cube into the subgroup generated by
+        <U, D, R2, L2, F2, B2> (corners and edges oriented, the four UD-slice
+        edges in the slice), phase 2 solves it using only those moves. Phase 1
+        solutions are tried from short to long, and every solution lowers the
+        bound of the phase 2 searches that follow. The search ends when no
+        longer phase 1 can give a shorter solution, which is quick for short
+        scrambles, or when the time runs out, so solutions are near optimal
+        but not optimal.
+
+        Args:
+            cube (Cube): The cube to solve, it has to be a 3x3.
+            max_length (int, optional): Stop after the phase 1 depth where a
+                solution this short is found.
+            timeout (float, optional): Seconds to search, after which the
+                shortest solution found so far is returned. Without a timeout
+                the search of a random state does not end in practice unless
+                there is a `max_length`.
+            cache_directory (str, optional): Where the tables are cached.
+        """
+        assert cube.size == 3, "The two-phase solver only supports the 3x3 cube."
+        self.cube = cube
+        self.max_length = max_length
+        self.timeout = timeout
+        self.cache_directory = cache_directory
+
+    def solve(self) -> tuple:
+        """Solve the cube.
+
+        Returns:
+            tuple: The solution, face moves in the notation of `Cube.get_possible_moves()`.
+        """
+        if self.cube.is_solved():
+            return ()
+
+        self._tables = _get_search_tables(self.cache_directory)
+
+        state = encode_combinations(self.cube.combinations).reshape(-1).astype(np.intp)
+        centers = state[CENTER_FACELETS]
+        if sorted(centers.tolist()) != list(range(6)):
+            raise ValueError("Invalid cube!")
+        # name the colors after the face their center is on, face moves do not move centers
+        face_of_color = np.argsort(centers)
+        corner_permutation, corner_orientation, edge_permutation, edge_orientation = read_cubies(
+            face_of_color[state]
+        )
+        if np.any(corner_permutation == 255) or np.any(edge_permutation == 255):
+            raise ValueError("Invalid cube!")
+        self._cubies = (corner_permutation, corner_orientation, edge_permutation, edge_orientation)
+
+        self._deadline = None if self.timeout is None else time.perf_counter() + self.timeout
+        self._best = None
+        self._phase1_path = []
+        twist = int(_twist(corner_orientation[None])[0])
+        flip = int(_flip(edge_orientation[None])[0])
+        slice_ = int(_slice(edge_permutation[None])[0])
+        for depth in range(13):
+            # no phase 1 of this depth gives a shorter solution, or a short enough one was found
+            if self._best is not None and (
+                depth >= len(self._best) or (self.max_length is not None and len(self._best) <= self.max_length)
+            ):
+                break
+            if self._phase1(twist, flip, slice_, depth) or self._out_of_time():
+                break
+
+        if self._best is None:
+            raise ValueError("Invalid cube!")
+        solution = tuple(MOVES[move] for move in self._best)
+        check = Cube.from_combinations(self.cube.combinations.copy())
+        for move in solution:
+            check.make_move(move)
+        if not check.is_solved():
+            raise ValueError("Invalid cube!")
+        return solution
+
+    def _out_of_time(self) -> bool:
+        return self._deadline is not None and self._best is not None and time.perf_counter() > self._deadline
+
+    def _phase1(self, twist: int, flip: int, slice_: int, remaining: int) -> bool:
+        """Depth-first search for phase 1 solutions, True stops the whole search."""
+        if remaining == 0:
+            if twist == 0 and flip == 0 and slice_ == SOLVED_SLICE:
+                # a phase 1 ending with a phase 2 move was already tried one level up
+                path = self._phase1_path
+                if path and MOVES[path[-1]] in PHASE2_MOVES:
+                    return False
+                self._start_phase2()
+            return False
+        if self._out_of_time():
+            return True
+
+        tables = self._tables
+        twist_move, flip_move, slice_move = tables["twist_move"], tables["flip_move"], tables["slice_move"]
+        twist_slice_pruning, flip_slice_pruning = tables["twist_slice_pruning"], tables["flip_slice_pruning"]
+        last_face = _FACE_OF_MOVE[self._phase1_path[-1]] if self._phase1_path else -1
+        for move in range(18):
+            face = _FACE_OF_MOVE[move]
+            # same face twice in a row, or opposite faces in both orders, is redundant
+            if face == last_face or face == last_face - 3:
+                continue
+            new_twist = twist_move[twist][move]
+            new_flip = flip_move[flip][move]
+            new_slice = slice_move[slice_][move]
+            distance = max(
+                twist_slice_pruning[new_twist * NUM_SLICES + new_slice],
+                flip_slice_pruning[new_flip * NUM_SLICES + new_slice],
+            )
+            if distance >= remaining:
+                continue
+            self._phase1_path.append(move)
+            done = self._phase1(new_twist, new_flip, new_slice, remaining - 1)
+            self._phase1_path.pop()
+            if done:
+                return True
+        return False
+
+    def _start_phase2(self):
+        """Run phase 2 on the state reached by the current phase 1 path, keep the solution if it is shorter."""
+        corner_permutation, _, edge_permutation, _ = self._cubies
+        cubie_moves = get_cubie_moves()
+        for move in self._phase1_path:
+            corner_permutation = corner_permutation[cubie_moves[MOVES[move]][0]]
+            edge_permutation = edge_permutation[cubie_moves[MOVES[move]][2]]
+        corner = int(_permutation_rank(corner_permutation[None])[0])
+        edge = int(_permutation_rank(edge_permutation[None, :8])[0])
+        slice_permutation = int(_permutation_rank(edge_permutation[None, 8:] - 8)[0])
+
+        # only look for solutions that are shorter than the best one so far
+        limit = (len(self._best) - 1 if self._best is not None else 30) - len(self._phase1_path)
+        last_face = _FACE_OF_MOVE[self._phase1_path[-1]] if self._phase1_path else -1
+        for depth in range(min(limit, 18) + 1):
+            path = self._phase2(corner, edge, slice_permutation, depth, last_face)
+            if path is not None:
+                self._best = self._phase1_path + path
+                return
+
+    def _phase2(self, corner: int, edge: int, slice_permutation: int, remaining: int, last_face: int):
+        """Depth-first search for a phase 2 solution of exactly `remaining` moves."""
+        if remaining == 0:
+            if corner == 0 and edge == 0 and slice_permutation == 0:
+                return []
+            return None
+        tables = self._tables
+        corner_move, edge_move = tables["corner_permutation_move"], tables["edge_permutation_move"]
+        slice_permutation_move = tables["slice_permutation_move"]
+        corner_slice_pruning, edge_slice_pruning = tables["corner_slice_pruning"], tables["edge_slice_pruning"]
+        for index, move in enumerate(_PHASE2_INDICES):
+            face = _FACE_OF_MOVE[move]
+            if face == last_face or face == last_face - 3:
+                continue
+            new_corner = corner_move[corner][index]
+            new_edge = edge_move[edge][index]
+            new_slice_permutation = slice_permutation_move[slice_permutation][index]
+            distance = max(
+                corner_slice_pruning[new_corner * NUM_SLICE_PERMUTATIONS + new_slice_permutation],
+                edge_slice_pruning[new_edge * NUM_SLICE_PERMUTATIONS + new_slice_permutation],
+            )
+            if distance >= remaining:
+                continue
+            path = self._phase2(new_corner, new_edge, new_slice_permutation, remaining - 1, face)
+            if path is not None:
+                return [move] + path
+        return None
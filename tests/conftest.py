@@ -0,0 +1,57 @@
+import random
+from typing import Sequence
+
+import pytest
+
+from rubics_cube import Cube
+from rubics_cube.cube import encode_combinations, get_move_table
+
+
+def solves(cube: Cube, solution: Sequence[str]) -> bool:
+    """Whether the moves solve the cube, the cube is left as it is."""
+    check = Cube(cube.size)
+    check.combinations = cube.combinations.copy()
+    check.make_moves(list(solution))
+    return check.is_solved()
+
+
+def scrambled(size: int, length: int, seed: int) -> Cube:
+    """A cube after `length` random face and slice moves."""
+    rng = random.Random(seed)
+    cube = Cube(size)
+    moves = [move for move in cube.get_possible_moves() if move[0] not in "xyz"]
+    cube.make_moves([rng.choice(moves) for _ in range(length)])
+    return cube
+
+
+DEPTH = 4
+
+
+@pytest.fixture(scope="session")
+def distances():
+    """Distance of every 3x3 state up to `DEPTH` moves from solved, by breadth first search."""
+    move_table = get_move_table(3)
+    possible_moves = Cube(3).get_possible_moves()
+    permutations = [move_table[move] for move in possible_moves if move[0] not in "xyz"]
+    rotations = [move_table[move] for move in possible_moves if move[0] in "xyz"]
+    # every rotation of the solved cube is solved
+    layer = [encode_combinations(Cube(3).combinations).reshape(-1)]
+    found = {layer[0].tobytes(): 0}
+    for state in layer:
+        for rotation in rotations:
+            rotated = state[rotation]
+            if rotated.tobytes() not in found:
+                found[rotated.tobytes()] = 0
+                layer.append(rotated)
+    assert len(layer) == 24
+    for depth in range(1, DEPTH + 1):
+        next_layer = []
+        for state in layer:
+            for permutation in permutations:
+                child = state[permutation]
+                key = child.tobytes()
+                if key not in found:
+                    found[key] = depth
+                    next_layer.append(child)
+        layer = next_layer
+    return found
@@ -0,0 +1,40 @@
+import numpy as np
+import pytest
+
+from rubics_cube import Cube, CubeBatch, same_color_amount
+
+
+@pytest.mark.parametrize("size", [2, 3, 4, 5])
+def test_batched_moves_match_single_cubes(size):
+    rng = np.random.default_rng(size)
+    count = 6
+    cubes = [Cube(size) for _ in range(count)]
+    batch = CubeBatch(size, count)
+    moves = batch.possible_moves
+    for step in range(30):
+        if step % 3 == 0:
+            # the same move on every cube
+            move = moves[rng.integers(len(moves))]
+            batch.make_move(move)
+            for cube in cubes:
+                cube.make_move(move)
+        else:
+            # one move per cube, as indices or as move strings
+            indices = rng.integers(len(moves), size=count)
+            batch.make_move(indices if step % 3 == 1 else [moves[index] for index in indices])
+            for cube, index in zip(cubes, indices):
+                cube.make_move(moves[index])
+    for cube, batched in zip(cubes, batch.to_cubes()):
+        assert (cube.combinations == batched.combinations).all()
+    assert batch.is_solved().tolist() == [cube.is_solved() for cube in cubes]
+
+
+def test_from_cubes_round_trip():
+    cubes = [Cube(3) for _ in range(3)]
+    cubes[1].make_moves("R U")
+    cubes[2].make_moves("F' D2")
+    batch = CubeBatch.from_cubes(cubes)
+    assert batch.is_solved().tolist() == [True, False, False]
+    assert batch.same_color_amount().tolist() == [same_color_amount(cube.combinations) for cube in cubes]
+    for cube, batched in zip(cubes, batch.to_cubes()):
+        assert (cube.combinations == batched.combinations).all()
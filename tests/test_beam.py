@@ -0,0 +1,25 @@
+import pytest
+
+from conftest import scrambled, solves
+from rubics_cube import BeamSearchSolver, SearchStats, same_color_amount
+
+
+@pytest.mark.parametrize("size, length", [(4, 4), (5, 5), (20, 2)])
+def test_solves_large_cubes_in_bounded_memory(size, length):
+    cube = scrambled(size, length, seed=0)
+    solver = BeamSearchSolver(cube, same_color_amount)
+    solver.stats = SearchStats(trace_memory=True)
+    solution = solver.solve()
+    assert solves(cube, solution)
+    assert len(solution) <= length
+    assert solver.stats.peak_memory_bytes < 64 * 2 ** 20
+
+
+def test_small_chunks_give_the_same_search():
+    cube = scrambled(3, 6, seed=1)
+    searches = []
+    for chunk_size in (7, 1000, None):
+        solver = BeamSearchSolver(cube, same_color_amount, beam_width=64, chunk_size=chunk_size)
+        solution = solver.solve(max_depth=10, anytime=True)
+        searches.append((len(solution), solver.best_value, solver.stats.nodes_expanded))
+    assert searches[0] == searches[1] == searches[2]
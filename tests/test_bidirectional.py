@@ -0,0 +1,28 @@
+import pytest
+
+from conftest import scrambled, solves
+from rubics_cube import BidirectionalSolver, IDAStarSolver, manhattan_distance
+
+
+@pytest.mark.parametrize("size, length", [(2, 6), (3, 5), (4, 3)])
+def test_solutions_solve_the_cube(size, length):
+    for seed in range(3):
+        cube = scrambled(size, length, seed)
+        solution = BidirectionalSolver(cube).solve()
+        assert solves(cube, solution)
+        assert len(solution) <= length
+
+
+def test_solutions_are_optimal():
+    for seed in range(5):
+        cube = scrambled(3, 4, seed)
+        assert len(BidirectionalSolver(cube).solve()) == len(IDAStarSolver(cube, manhattan_distance).solve())
+
+
+def test_spilled_search_solves_the_cube(tmp_path):
+    cube = scrambled(3, 5, seed=0)
+    solver = BidirectionalSolver(cube, memory_limit=1 << 12, spill_directory=str(tmp_path), chunk_size=256)
+    solution = solver.solve()
+    assert solver._spilled > 0
+    assert solves(cube, solution)
+    assert list(tmp_path.iterdir()) == []
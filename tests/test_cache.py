@@ -0,0 +1,123 @@
+import asyncio
+import random
+import sqlite3
+
+import numpy as np
+import pytest
+
+from conftest import solves
+from rubics_cube import AStarSolver, AnytimeAStarSolver, Cube, MoveSequence, SolutionCache, SolverPool, manhattan_distance
+from rubics_cube.cube import encode_combinations, get_move_table
+
+
+def scrambled(moves: str) -> Cube:
+    cube = Cube(3)
+    cube.make_moves(moves.split())
+    return cube
+
+
+def test_budget_limited_search_is_not_cached():
+    cube = scrambled("R U F'")
+    cache = SolutionCache(3)
+    solver = AStarSolver(cube, manhattan_distance)
+    solver.cache = cache
+    solver.solve(max_nodes=3, anytime=True)
+    assert not solver.solved
+    assert len(cache) == 0
+
+    solver = AStarSolver(cube, manhattan_distance)
+    solver.cache = cache
+    assert len(solver.solve()) == 3
+    assert solver.solved
+    assert cache.get(cube) == ("F", "U'", "R'")
+
+
+def test_databases_of_other_versions_are_rejected(tmp_path):
+    path = str(tmp_path / "solutions.sqlite")
+    SolutionCache(3, path=path).put(scrambled("R U F'"), ("F", "U'", "R'"))
+    assert len(SolutionCache(3, path=path)) == 3
+
+    # a database with entries and no version was written before versions were kept
+    with sqlite3.connect(path) as connection:
+        connection.execute("DELETE FROM metadata WHERE name = 'version'")
+    with pytest.raises(AssertionError):
+        SolutionCache(3, path=path)
+
+
+def test_pool_picks_the_heuristic_of_the_size():
+    cube = Cube(2)
+    cube.make_moves("R U F'")
+
+    async def solve():
+        async with SolverPool(max_workers=1) as pool:
+            return await pool.solve(cube, deadline=30)
+
+    result = asyncio.run(solve())
+    assert result["solved"]
+    assert solves(cube, result["solution"])
+
+
+def test_budget_limited_anytime_search_is_not_cached():
+    cube = scrambled("R U F' L2")
+    cache = SolutionCache(3)
+    solver = AnytimeAStarSolver(cube, manhattan_distance)
+    solver.cache = cache
+    solver.solve(max_nodes=3, anytime=True)
+    assert not solver.solved
+    assert len(cache) == 0
+
+    solver = AStarSolver(cube, manhattan_distance, max_frontier=10)
+    solver.cache = cache
+    solver.solve(max_nodes=3, anytime=True)
+    assert not solver.solved
+    assert len(cache) == 0
+
+
+@pytest.mark.parametrize("rotation", ["x", "y'", "z", "x y", "y z'", "x x z"])
+def test_rotated_state_gets_translated_moves(rotation):
+    cube = scrambled("R U F' L2 m1R D")
+    cache = SolutionCache(3)
+    cache.put(cube, ("D'", "m1R'", "L2", "F", "U'", "R'"))
+
+    rotated = scrambled("R U F' L2 m1R D " + rotation)
+    solution = cache.get(rotated)
+    assert solution is not None and len(solution) == 6
+    assert solves(rotated, solution)
+    assert cache.memory_hits == 1
+
+
+def test_states_along_the_solution_are_cached(tmp_path):
+    cube = scrambled("R U F'")
+    path = str(tmp_path / "solutions.sqlite")
+    SolutionCache(3, path=path).put(cube, ("F", "U'", "R'"))
+
+    # a new cache reads the entries back from the database
+    cache = SolutionCache(3, path=path)
+    assert len(cache) == 3
+    halfway = scrambled("R U F' F y")
+    assert solves(halfway, cache.get(halfway))
+    assert cache.disk_hits == 1
+
+
+def test_many_states_are_looked_up_in_chunks(tmp_path):
+    rng = random.Random(0)
+    moves = [rng.choice("FRUBLD") + rng.choice(["", "'"]) for _ in range(1500)]
+    cube = scrambled(" ".join(moves))
+    path = str(tmp_path / "solutions.sqlite")
+    SolutionCache(3, path=path).put(cube, MoveSequence(moves).inverse().moves)
+
+    # every state on the way back, and as many that are not cached
+    states = [encode_combinations(cube.combinations).reshape(-1)]
+    for move in MoveSequence(moves).inverse().moves[:-1]:
+        states.append(states[-1][get_move_table(3)[move]])
+    unknown = [np.array(rng.sample(list(state), len(state)), dtype=np.uint8) for state in states]
+
+    cache = SolutionCache(3, max_entries=10, path=path)
+    # the limit of old sqlite versions
+    cache._connection.setlimit(sqlite3.SQLITE_LIMIT_VARIABLE_NUMBER, 999)
+    solutions = cache.get_states(np.stack(states + unknown))
+    known = solutions[: len(states)]
+    assert all(solution is not None for solution in known)
+    assert solves(cube, known[0])
+    assert cache.disk_hits + cache.misses == len(solutions)
+    assert cache.disk_hits == sum(solution is not None for solution in solutions)
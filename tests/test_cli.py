@@ -0,0 +1,28 @@
+import io
+import json
+
+from conftest import solves
+from rubics_cube import Cube
+from rubics_cube.cli import main
+
+
+def test_solve_writes_json_lines(tmp_path):
+    scrambles = ["R U F'", "D2 L"]
+    (tmp_path / "scrambles.txt").write_text("\n".join(scrambles) + "\n", encoding="utf-8")
+    output = tmp_path / "solutions.jsonl"
+    main(["solve", str(tmp_path / "scrambles.txt"), "-o", str(output), "--solver", "idastar", "--workers", "1"])
+
+    lines = output.read_text(encoding="utf-8").splitlines()
+    results = sorted((json.loads(line) for line in lines), key=lambda result: result["index"])
+    assert [result["scramble"] for result in results] == scrambles
+    for result in results:
+        cube = Cube(3)
+        cube.make_moves(result["scramble"])
+        assert solves(cube, result["solution"].split())
+
+
+def test_solve_reads_stdin(monkeypatch, capsys):
+    monkeypatch.setattr("sys.stdin", io.StringIO("R\nU2\n"))
+    main(["solve", "--solver", "idastar", "--workers", "1"])
+    results = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    assert sorted(result["length"] for result in results) == [1, 1]
@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+
+from rubics_cube import Cube
+from rubics_cube.cube import COLORS, MAX_COMPILED_SIZE, _apply_base_move, get_move_table
+
+SIZES = range(2, 9)
+
+
+def random_cube(size: int, seed: int) -> Cube:
+    # stickers drawn at random, so that any misplaced sticker shows
+    rng = np.random.default_rng(seed)
+    cube = Cube(size)
+    cube.combinations = rng.choice(list(COLORS), size=(6, size, size))
+    return cube
+
+
+def reference(combinations: np.ndarray, move: str) -> np.ndarray:
+    combinations = combinations.copy()
+    turns = 2 if move[-1] == "2" else 3 if move[-1] == "'" else 1
+    for _ in range(turns):
+        _apply_base_move(combinations, move.rstrip("'2"))
+    return combinations
+
+
+@pytest.mark.parametrize("size", SIZES)
+def test_move_table_matches_reference(size):
+    cube = random_cube(size, seed=size)
+    for move, permutation in get_move_table(size).items():
+        moved = cube.combinations.reshape(-1)[permutation].reshape(cube.combinations.shape)
+        assert np.array_equal(moved, reference(cube.combinations, move)), move
+
+
+@pytest.mark.parametrize("size", SIZES)
+def test_make_move_matches_reference(size):
+    cube = random_cube(size, seed=size)
+    for move in cube.get_possible_moves():
+        moved = Cube(size)
+        moved.combinations = cube.combinations.copy()
+        moved.make_move(move)
+        assert np.array_equal(moved.combinations, reference(cube.combinations, move)), move
+
+
+# sizes above MAX_COMPILED_SIZE make the moves one by one
+@pytest.mark.parametrize("size", [*SIZES, MAX_COMPILED_SIZE + 1])
+def test_make_moves_matches_single_moves(size):
+    rng = np.random.default_rng(size)
+    moves = [str(move) for move in rng.choice(Cube(size).get_possible_moves(), size=50)]
+    one_by_one = random_cube(size, seed=size)
+    at_once = Cube(size)
+    at_once.combinations = one_by_one.combinations.copy()
+    for move in moves:
+        one_by_one.make_move(move)
+    at_once.make_moves(moves)
+    assert np.array_equal(at_once.combinations, one_by_one.combinations)
@@ -0,0 +1,22 @@
+import numpy as np
+import pytest
+
+from rubics_cube import Cube, CubieCube
+
+
+def test_round_trip():
+    cube = Cube(3)
+    cube.make_moves(["R", "U", "F'", "L2", "D"])
+    cubie = CubieCube.from_combinations(cube.combinations)
+    assert cubie.is_solvable()
+    assert np.array_equal(cubie.to_combinations(), cube.combinations)
+
+
+def test_from_combinations_validates_on_request():
+    combinations = Cube(3).combinations.copy()
+    # swapping two stickers of an edge flips it
+    combinations[0, 2, 1], combinations[2, 0, 1] = combinations[2, 0, 1], combinations[0, 2, 1]
+    Cube.from_combinations(combinations.copy())
+    with pytest.raises(ValueError):
+        Cube.from_combinations(combinations, validate=True)
+    Cube.from_combinations(Cube(3).combinations, validate=True)
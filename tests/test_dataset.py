@@ -0,0 +1,37 @@
+import numpy as np
+
+from conftest import DEPTH
+from rubics_cube import dataset_moves, load_shards, scramble_batches, write_dataset
+from rubics_cube.cube import get_move_table
+
+
+def shards(directory):
+    return [tuple(np.asarray(array) for array in shard) for shard in load_shards(str(directory))]
+
+
+def test_seed_decides_the_shards(tmp_path):
+    arguments = dict(num_states=1000, max_depth=8, shard_size=300, batch_size=128)
+    write_dataset(str(tmp_path / "a"), seed=1, **arguments)
+    write_dataset(str(tmp_path / "b"), seed=1, **arguments)
+    write_dataset(str(tmp_path / "c"), seed=2, **arguments)
+    first, same, other = shards(tmp_path / "a"), shards(tmp_path / "b"), shards(tmp_path / "c")
+    assert [len(states) for states, _, _ in first] == [300, 300, 300, 100]
+    for shard, shard_same, shard_other in zip(first, same, other):
+        for array, array_same, array_other in zip(shard, shard_same, shard_other):
+            assert (array == array_same).all()
+            assert not (array == array_other).all()
+
+
+def test_labels_undo_the_last_scramble_move(distances):
+    move_table = get_move_table(3)
+    moves = dataset_moves(3)
+    for avoid_cancelling in (True, False):
+        batches = scramble_batches(3, 512, DEPTH, seed=0, avoid_cancelling=avoid_cancelling, num_batches=2)
+        for states, depths, labels in batches:
+            for state, depth, label in zip(states, depths, labels):
+                undone = state[move_table[moves[label]]]
+                assert distances[state.tobytes()] <= depth
+                # one move closer, a single move scramble is solved again
+                assert distances[undone.tobytes()] <= depth - 1
+                if depth == 1:
+                    assert (undone == np.repeat(np.arange(6, dtype=np.uint8), 9)).all()
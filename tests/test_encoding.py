@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+
+from rubics_cube import Cube, ZobristHasher, pack_states, unpack_states
+from rubics_cube.cube import get_move_table
+from rubics_cube.encoding import pack_state, packed_length, unpack_state
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 4, 7])
+def test_pack_round_trip(size):
+    rng = np.random.default_rng(size)
+    states = rng.integers(0, 6, size=(5, 6 * size * size), dtype=np.uint8)
+    packed = pack_states(states)
+    assert packed.shape == (5, packed_length(size))
+    assert (unpack_states(packed, size) == states).all()
+    # states of shape (6, n, n) pack the same as flat ones
+    assert (pack_states(states.reshape(5, 6, size, size)) == packed).all()
+    assert (unpack_state(pack_state(states[0]), size) == states[0]).all()
+
+
+@pytest.mark.parametrize("size", [2, 3, 5])
+def test_zobrist_update_matches_a_full_hash(size):
+    hasher = ZobristHasher(size)
+    move_table = get_move_table(size)
+    moves = Cube(size).get_possible_moves()
+    rng = np.random.default_rng(size)
+    state = np.repeat(np.arange(6, dtype=np.uint8), size * size)
+    hash_value = hasher.hash(state)
+    for move in rng.choice(moves, size=50):
+        hash_value = hasher.update(hash_value, state, move)
+        state = state[move_table[move]]
+        assert hash_value == hasher.hash(state)
+
+
+def test_zobrist_update_states_matches_full_hashes():
+    size = 4
+    hasher = ZobristHasher(size)
+    move_table = get_move_table(size)
+    rng = np.random.default_rng(0)
+    states = rng.integers(0, 6, size=(20, 6 * size * size), dtype=np.uint8)
+    hashes = hasher.hash_states(states)
+    assert [hasher.hash(state) for state in states] == hashes.tolist()
+    for move in Cube(size).get_possible_moves():
+        moved = states[:, move_table[move]]
+        assert (hasher.update_states(hashes, states, move) == hasher.hash_states(moved)).all()
+        index = np.array([3, 0, 17])
+        assert (hasher.update_states(hashes[index], states, move, index) == hasher.hash_states(moved[index])).all()
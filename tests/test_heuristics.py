@@ -0,0 +1,79 @@
+import random
+
+import numpy as np
+import pytest
+
+from conftest import DEPTH, scrambled, solves
+from rubics_cube import AStarSolver, Cube, IDAStarSolver, ParallelIDAStarSolver, manhattan_distance
+from rubics_cube.cube import encode_combinations
+from rubics_cube.heuristics import _init_search_worker, _search_task
+
+
+def scrambles(count: int, seed: int):
+    rng = random.Random(seed)
+    moves = [move for move in Cube(3).get_possible_moves() if move[0] not in "xyz"]
+    for _ in range(count):
+        cube = Cube(3)
+        cube.make_moves([rng.choice(moves) for _ in range(rng.randint(1, DEPTH))])
+        yield cube
+
+
+def optimal_length(cube: Cube, distances) -> int:
+    return distances[encode_combinations(cube.combinations).reshape(-1).tobytes()]
+
+
+def test_astar_solutions_are_optimal(distances):
+    for cube in scrambles(10, seed=0):
+        solution = AStarSolver(cube, manhattan_distance).solve()
+        assert solves(cube, solution)
+        assert len(solution) == optimal_length(cube, distances)
+
+
+def test_idastar_solutions_are_optimal(distances):
+    for cube in scrambles(10, seed=1):
+        solution = IDAStarSolver(cube, manhattan_distance).solve()
+        assert solves(cube, solution)
+        assert len(solution) == optimal_length(cube, distances)
+
+
+def test_idastar_restores_the_cube():
+    cube = next(scrambles(1, seed=2))
+    combinations = cube.combinations.copy()
+    IDAStarSolver(cube, manhattan_distance).solve()
+    assert (cube.combinations == combinations).all()
+
+
+@pytest.mark.parametrize("split_depth", [0, 1, 2])
+def test_parallel_idastar_matches_idastar(split_depth):
+    for cube in scrambles(3, seed=3):
+        expected = IDAStarSolver(cube, manhattan_distance).solve()
+        solution = ParallelIDAStarSolver(cube, manhattan_distance, workers=2, split_depth=split_depth).solve()
+        assert solves(cube, solution)
+        assert len(solution) == len(expected)
+
+
+class _FirstSolution:
+    """Stands in for the shared value, another task finds a solution after the first `reads` reads."""
+
+    def __init__(self, reads: int):
+        self.reads = reads
+
+    @property
+    def value(self):
+        self.reads -= 1
+        return 10 if self.reads >= 0 else 0
+
+
+def test_search_task_is_cancelled_by_an_earlier_solution():
+    cube = scrambled(3, 12, seed=4)
+    solver = IDAStarSolver(cube, manhattan_distance)
+
+    # an earlier task already has a solution, the task does not start
+    _init_search_worker(solver, _FirstSolution(reads=0))
+    assert _search_task(1, (0,), 20) == (1, np.inf, (), 0, 0)
+
+    # an earlier task finds a solution while the task runs
+    _init_search_worker(solver, _FirstSolution(reads=1))
+    task, result, path, expanded, _ = _search_task(1, (), 20)
+    assert (task, result, path) == (1, np.inf, ())
+    assert 0 < expanded <= 4096
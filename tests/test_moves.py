@@ -0,0 +1,49 @@
+import pytest
+
+from rubics_cube import Cube, MoveSequence
+from rubics_cube.cube import encode_combinations, get_move_table
+from rubics_cube.moves import get_successor_moves
+
+
+def test_parses_every_possible_move():
+    for size in (2, 3, 4, 5):
+        MoveSequence(Cube(size).get_possible_moves())
+
+
+@pytest.mark.parametrize("move", ["x2", "y2", "z2", "R3", "r", "m0F"])
+def test_rejects_unknown_moves(move):
+    with pytest.raises(AssertionError):
+        MoveSequence(move)
+
+
+def test_double_rotations_are_written_as_two_moves():
+    assert MoveSequence("x x").simplify().moves == ("x", "x")
+
+
+def states_by_depth(size: int, depth: int, pruned: bool):
+    """Number of new states at every depth, searching with or without move pruning."""
+    moves = tuple(move for move in Cube(size).get_possible_moves() if move[0] not in "xyz")
+    move_table = get_move_table(size)
+    permutations = [move_table[move] for move in moves]
+    successors = get_successor_moves(moves) if pruned else [list(range(len(moves)))] * (len(moves) + 1)
+    solved = encode_combinations(Cube(size).combinations).reshape(-1)
+    seen = {solved.tobytes()}
+    # (state, last move) pairs, the history pruning depends on
+    layer = {(solved.tobytes(), len(moves)): solved}
+    counts = []
+    for _ in range(depth):
+        next_layer = {}
+        for (_, last), state in layer.items():
+            for move_index in successors[last]:
+                child = state[permutations[move_index]]
+                next_layer.setdefault((child.tobytes(), move_index), child)
+        new = {key for key, _ in next_layer} - seen
+        seen |= new
+        counts.append(len(new))
+        layer = next_layer
+    return counts
+
+
+@pytest.mark.parametrize("size, depth", [(2, 4), (3, 4), (4, 3)])
+def test_pruning_reaches_the_same_states(size, depth):
+    assert states_by_depth(size, depth, pruned=True) == states_by_depth(size, depth, pruned=False)
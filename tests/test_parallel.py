@@ -0,0 +1,49 @@
+from conftest import solves
+from rubics_cube import Cube, SolutionCache, manhattan_distance, same_color_amount, solve_many
+from rubics_cube.parallel import _init_worker, _worker
+
+# takes IDA* most of a second, the hard one much longer
+MEDIUM = "R U F' L D B"
+HARD = "R U F' L D B R' U2 F L' D2"
+
+
+def cube_of(scramble: str) -> Cube:
+    cube = Cube(3)
+    cube.make_moves(scramble)
+    return cube
+
+
+def test_every_scramble_gets_its_result():
+    scrambles = ["R U", "", "F' L2 D", "  ", "B"]
+    results = list(solve_many(scrambles, solver="idastar", workers=2, chunk_size=2))
+    # blank lines are skipped but keep their index
+    assert sorted(result["index"] for result in results) == [0, 2, 4]
+    for result in results:
+        assert result["scramble"] == scrambles[result["index"]].strip()
+        assert solves(cube_of(result["scramble"]), result["solution"].split())
+        assert result["length"] == len(result["solution"].split())
+
+
+def test_timeout_only_fails_its_scramble():
+    results = solve_many(["R U", HARD, "F"], solver="idastar", workers=1, timeout=0.3)
+    results = sorted(results, key=lambda result: result["index"])
+    assert [result.get("error") for result in results] == [None, "timeout", None]
+    assert [result.get("length") for result in results] == [2, None, 1]
+
+
+def test_cache_is_reused_by_later_runs(tmp_path):
+    path = str(tmp_path / "solutions.sqlite")
+    (first,) = solve_many([MEDIUM], solver="idastar", workers=1, cache_path=path)
+    assert SolutionCache(3, path=path).get(cube_of(MEDIUM)) is not None
+    # a rotation of the same state is answered from the cache long before the timeout
+    (second,) = solve_many([MEDIUM + " x y"], solver="idastar", workers=1, timeout=0.3, cache_path=path)
+    assert "error" not in second
+    assert second["length"] == first["length"]
+    assert solves(cube_of(MEDIUM + " x y"), second["solution"].split())
+
+
+def test_workers_default_to_the_heuristic_of_the_size():
+    _init_worker(3, "idastar", None, None, None)
+    assert _worker["heuristic"] is manhattan_distance
+    _init_worker(4, "beam", None, None, None)
+    assert _worker["heuristic"] is same_color_amount
@@ -0,0 +1,45 @@
+import numpy as np
+
+from conftest import scrambled
+from rubics_cube import PatternDatabase, build_pattern_databases, load_pattern_databases
+from rubics_cube.cube import encode_combinations
+
+# small enough to build in a moment
+PATTERNS = {
+    "corners": ("corners", (0, 3)),
+    "edges": ("edges", (1, 6, 11)),
+}
+# states indexed at a time, reading the cubies of all of them at once needs gigabytes
+CHUNK_SIZE = 1 << 16
+
+
+def test_saved_databases_are_exact_pattern_distances(tmp_path, distances):
+    build_pattern_databases(str(tmp_path), PATTERNS)
+    heuristic = load_pattern_databases(str(tmp_path), PATTERNS)
+
+    states = np.frombuffer(b"".join(distances), dtype=np.uint8).reshape(-1, 54)
+    depths = np.fromiter(distances.values(), dtype=np.int64, count=len(distances))
+    for database in heuristic.databases:
+        assert isinstance(database.table, np.memmap)
+        index = np.concatenate(
+            [database.index_of(states[start : start + CHUNK_SIZE]) for start in range(0, len(states), CHUNK_SIZE)]
+        )
+        values = database.lookup(index)
+        # admissible, and the pattern of every state is reached first at its stored distance
+        assert (values <= depths).all()
+        reached = np.full(database.num_entries, np.iinfo(np.int64).max)
+        np.minimum.at(reached, index, depths)
+        assert (reached[index] == values).all()
+
+    for seed in range(5):
+        cube = scrambled(3, 3, seed)
+        key = encode_combinations(cube.combinations).reshape(-1).tobytes()
+        assert heuristic(cube.combinations) <= distances[key]
+
+
+def test_database_survives_a_round_trip(tmp_path):
+    database = PatternDatabase.build(*PATTERNS["corners"])
+    database.save(str(tmp_path / "corners.pdb"))
+    loaded = PatternDatabase.load(str(tmp_path / "corners.pdb"))
+    assert (loaded.kind, loaded.pieces, loaded.num_entries) == (database.kind, database.pieces, database.num_entries)
+    assert (np.asarray(loaded.table) == database.table).all()
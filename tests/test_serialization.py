@@ -0,0 +1,46 @@
+import pickle
+
+import numpy as np
+import pytest
+
+from rubics_cube import Cube, CubeBatch, load_states, save_states
+from rubics_cube.cube import encode_combinations
+
+
+def random_states(size: int, count: int, seed: int) -> np.ndarray:
+    # any colors, the format does not depend on the states being reachable
+    return np.random.default_rng(seed).integers(6, size=(count, 6, size, size), dtype=np.uint8)
+
+
+@pytest.mark.parametrize("size", [2, 3, 4, 7])
+@pytest.mark.parametrize("mmap", [True, False])
+def test_round_trip(tmp_path, size, mmap):
+    states = random_states(size, 100, seed=size)
+    path = str(tmp_path / "states.rcs")
+    save_states(path, states)
+    loaded = load_states(path, mmap=mmap)
+    assert len(loaded) == len(states)
+    assert np.array_equal(loaded[:], states)
+    assert np.array_equal(loaded[7], states[7])
+    assert np.array_equal(loaded.to_batch().states, states)
+
+
+def test_round_trip_of_cubes(tmp_path):
+    cubes = [Cube(3) for _ in range(3)]
+    cubes[1].make_moves(["R", "U"])
+    cubes[2].make_moves(["F", "m1R2", "B'"])
+    path = str(tmp_path / "cubes.rcs")
+    save_states(path, CubeBatch.from_cubes(cubes))
+    loaded = load_states(path)
+    for index, cube in enumerate(cubes):
+        assert np.array_equal(loaded.cube(index).combinations, cube.combinations)
+    # a memory mapped file is opened again when pickled
+    expected = encode_combinations(np.stack([cube.combinations for cube in cubes]))
+    assert np.array_equal(pickle.loads(pickle.dumps(loaded))[:], expected)
+
+
+def test_rejects_other_files(tmp_path):
+    path = tmp_path / "other.rcs"
+    path.write_bytes(b"not a state file" * 8)
+    with pytest.raises(AssertionError):
+        load_states(str(path))
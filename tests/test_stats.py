@@ -0,0 +1,27 @@
+import tracemalloc
+
+from conftest import scrambled
+from rubics_cube import AStarSolver, SearchStats, manhattan_distance
+
+
+def test_memory_tracing_stops_with_the_search():
+    assert not tracemalloc.is_tracing()
+    solver = AStarSolver(scrambled(3, 3, seed=0), manhattan_distance)
+    solver.stats = SearchStats(trace_memory=True)
+    assert not tracemalloc.is_tracing()
+    solver.solve()
+    assert not tracemalloc.is_tracing()
+    assert solver.stats.peak_memory_bytes > 0
+
+
+def test_counters():
+    reports = []
+    solver = AStarSolver(scrambled(3, 4, seed=1), manhattan_distance)
+    solver.stats = SearchStats(callback=reports.append, interval=0.0, timing=True)
+    solver.solve()
+    stats = solver.stats.as_dict()
+    assert stats["nodes_expanded"] == solver.nodes_expanded > 0
+    assert stats["nodes_generated"] >= stats["nodes_expanded"]
+    assert stats["best_values"][-1][1] <= stats["best_values"][0][1]
+    assert set(stats["times"]) == {"heuristic", "moves", "hashing"}
+    assert reports and reports[-1].finished
@@ -0,0 +1,43 @@
+import random
+
+import pytest
+
+from conftest import scrambled, solves
+from rubics_cube import AStarSolver, BeamSearchSolver, BidirectionalSolver, Cube, IDAStarSolver, TwoPhaseSolver
+from rubics_cube import ReductionSolver, manhattan_distance
+from rubics_cube.two_phase import MOVES
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_solutions_solve_the_cube(seed):
+    cube = scrambled(3, 25, seed)
+    solution = TwoPhaseSolver(cube, max_length=22, timeout=None).solve()
+    assert len(solution) <= 22
+    assert solves(cube, solution)
+
+
+@pytest.mark.parametrize(
+    "make_solver",
+    [
+        lambda cube: AStarSolver(cube, manhattan_distance),
+        lambda cube: IDAStarSolver(cube, manhattan_distance),
+        lambda cube: BeamSearchSolver(cube, manhattan_distance),
+        BidirectionalSolver,
+        TwoPhaseSolver,
+        ReductionSolver,
+    ],
+)
+def test_solved_cube_gives_empty_tuple(make_solver):
+    assert make_solver(Cube(3)).solve() == ()
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_short_scrambles_give_short_solutions(seed):
+    # the solver turns faces only, a slice move takes two of them
+    rng = random.Random(seed)
+    length = 1 + seed % 8
+    cube = Cube(3)
+    cube.make_moves([rng.choice(MOVES) for _ in range(length)] + ["x", "y"])
+    solution = TwoPhaseSolver(cube).solve()
+    assert solves(cube, solution)
+    assert len(solution) <= length